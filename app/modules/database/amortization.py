@@ -0,0 +1,326 @@
+import numpy as np
+import pandas as pd
+
+import threading
+from collections import OrderedDict
+
+
+# Columns a credit needs to generate its schedule
+SCHEDULE_COLUMNS = ['TEM_W_IVA', 'N_Inst', 'Cap_Grant', 'D_F_Due']
+
+# Process-wide cache of unit schedules keyed by (rate, term), most recently used last
+_UNIT_CACHE_SIZE = 4096
+_unit_cache = OrderedDict()
+_unit_cache_lock = threading.Lock()
+_unit_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def _compute_unit_schedules(rates: np.ndarray, n_insts: np.ndarray) -> list:
+    """
+    Computes the schedules of a capital of 1 for many (rate, term) pairs with array operations.
+
+    Before installment k of a credit of capital 1, monthly rate r and installment value
+    PMT = r / (1 - (1 + r)^-n), the capital owed is (1 + r)^(k-1) - PMT·((1 + r)^(k-1) - 1) / r, and
+    the interest is that capital times r. A zero rate only returns capital.
+
+    Returns:
+        list: One read-only array per pair, with the interest (IVA included) of each installment in
+        the first row and the installment value in the second.
+    """
+
+    rows = np.repeat(np.arange(len(rates)), n_insts)
+    starts = np.repeat(np.cumsum(n_insts) - n_insts, n_insts)
+    nro = np.arange(len(rows)) - starts + 1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pmt = np.where(rates == 0.0, 1.0 / n_insts, rates / (1.0 - (1.0 + rates) ** -n_insts))
+
+        r, v = rates[rows], pmt[rows]
+        growth = (1.0 + r) ** (nro - 1)
+        owed = np.where(r == 0.0, 1.0 - v * (nro - 1), growth - v * (growth - 1.0) / r)
+
+    schedules = np.split(np.vstack([owed * r, v]), np.cumsum(n_insts)[:-1], axis=1)
+    for schedule in schedules:
+        schedule.flags.writeable = False
+
+    return schedules
+
+
+def _unit_schedules(pairs: list) -> dict:
+    """
+    Returns the unit schedules of the given (rate, term) pairs, computing only the ones not cached.
+    """
+
+    found, missing = {}, []
+    with _unit_cache_lock:
+        for pair in pairs:
+            if pair in _unit_cache:
+                _unit_cache.move_to_end(pair)
+                found[pair] = _unit_cache[pair]
+                _unit_cache_stats['hits'] += 1
+            else:
+                missing.append(pair)
+                _unit_cache_stats['misses'] += 1
+
+    if missing:
+        rates = np.array([pair[0] for pair in missing], dtype=float)
+        n_insts = np.array([pair[1] for pair in missing], dtype=int)
+        computed = dict(zip(missing, _compute_unit_schedules(rates, n_insts)))
+        found.update(computed)
+
+        with _unit_cache_lock:
+            _unit_cache.update(computed)
+            while len(_unit_cache) > _UNIT_CACHE_SIZE:
+                _unit_cache.popitem(last=False)
+
+    return found
+
+
+def unit_schedule(rate: float, n_inst: int) -> pd.DataFrame:
+    """
+    Returns the French-system schedule of a capital of 1 at a monthly rate (IVA included) and term.
+
+    Any credit with the same rate and term has this schedule scaled by its capital. Schedules are kept
+    in a process-wide LRU cache, shared with `amortization_schedule`; see `unit_schedule_stats`.
+
+    Parameters:
+        rate (float): Monthly rate with IVA ('TEM_W_IVA').
+        n_inst (int): Number of installments.
+
+    Returns:
+        pd.DataFrame: Indexed by 'Nro_Inst', with the 'Capital', 'Interest' (IVA included) and 'Total'
+        of each installment per unit of capital.
+
+    Example:
+        >>> unit_schedule(0.08, 12)['Total'] * 150000.0
+    """
+
+    pair = (float(rate), int(n_inst))
+    interest, total = _unit_schedules([pair])[pair]
+
+    return pd.DataFrame(
+        {'Capital': total - interest, 'Interest': interest, 'Total': total},
+        index=pd.RangeIndex(1, pair[1] + 1, name='Nro_Inst')
+    )
+
+
+def unit_schedule_stats() -> dict:
+    """
+    Returns the usage statistics of the unit schedule cache.
+
+    Returns:
+        dict: 'hits', 'misses', 'hit_rate' (hits over lookups, 0.0 before any lookup) and 'entries'
+        (cached (rate, term) pairs).
+    """
+    with _unit_cache_lock:
+        lookups = _unit_cache_stats['hits'] + _unit_cache_stats['misses']
+        hit_rate = _unit_cache_stats['hits'] / lookups if lookups else 0.0
+        return {**_unit_cache_stats, 'hit_rate': hit_rate, 'entries': len(_unit_cache)}
+
+
+def clear_unit_schedule_cache() -> None:
+    """
+    Drops every cached unit schedule and resets the statistics.
+    """
+    with _unit_cache_lock:
+        _unit_cache.clear()
+        _unit_cache_stats.update(hits=0, misses=0)
+
+
+def _due_dates(first_due: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Adds whole months to the first due dates, keeping their day of the month.
+
+    The day is clipped to the last day of shorter months (a first due on the 31st falls on the 30th
+    in April and on the 28th/29th in February).
+
+    Parameters:
+        first_due (np.ndarray): First due date of each installment's credit (datetime64).
+        offsets (np.ndarray): Months after the first due date (0 for the first installment).
+
+    Returns:
+        np.ndarray: Due dates (datetime64[ns]).
+    """
+
+    months = first_due.astype('datetime64[M]')
+    day = (first_due.astype('datetime64[D]') - months.astype('datetime64[D]')).astype(int)
+
+    due_month = months + offsets
+    month_days = ((due_month + 1).astype('datetime64[D]') - due_month.astype('datetime64[D]')).astype(int)
+
+    return (due_month.astype('datetime64[D]') + np.minimum(day, month_days - 1)).astype('datetime64[ns]')
+
+
+def amortization_schedule(credits: pd.DataFrame, id_owner: int = 1) -> pd.DataFrame:
+    """
+    Builds the installments of many credits at once with the French (constant installment) system.
+
+    Credits that share a rate and a term share their unit schedule (see `unit_schedule`), which is
+    computed once, cached, and scaled by each capital. The interest of the last installment takes the
+    floating point residue so the capital of every credit is repaid exactly. The interest is then split
+    into net interest (/1.21) and IVA (×0.21), like `create_installments` always did. Everything else is
+    computed with array operations, so the cost does not depend on Python loops over installments.
+
+    Parameters:
+        credits (pd.DataFrame): One row per credit, indexed by its ID, with 'TEM_W_IVA' (monthly rate
+            with IVA), 'N_Inst' (number of installments), 'Cap_Grant' (granted capital) and 'D_F_Due'
+            (first due date).
+        id_owner (int, optional): Owner of the new installments. Defaults to 1 (the company itself).
+
+    Returns:
+        pd.DataFrame: Installments ('ID_Op', 'Nro_Inst', 'D_Due', 'Capital', 'Interest', 'IVA', 'Total',
+        'ID_Owner') in credit order and, within a credit, by installment number, with a RangeIndex for
+        the caller to replace by the installment IDs.
+
+    Raises:
+        ValueError: If a required column is missing or a credit has no installments.
+
+    Example:
+        >>> credits = pd.DataFrame({'TEM_W_IVA': [0.08, 0.05], 'N_Inst': [12, 6], 'Cap_Grant': [100000.0, 50000.0],
+        ...                         'D_F_Due': pd.to_datetime(['2024-02-10', '2024-03-10'])}, index=[101, 102])
+        >>> amortization_schedule(credits)
+    """
+
+    missing = [column for column in SCHEDULE_COLUMNS if column not in credits.columns]
+    if missing:
+        raise ValueError(f"Missing columns to build the schedule: {', '.join(missing)}.")
+
+    n_inst = credits['N_Inst'].to_numpy(dtype=int)
+    if (n_inst < 1).any():
+        raise ValueError("Every credit needs at least one installment.")
+
+    # ✅ Step 1: Repeat every credit once per installment
+    rows = np.repeat(np.arange(len(credits)), n_inst)
+    starts = np.repeat(np.cumsum(n_inst) - n_inst, n_inst)
+    nro = np.arange(len(rows)) - starts + 1
+
+    # ✅ Step 2: Unit schedule of every (rate, term) pair, from the cache when possible
+    rate = credits['TEM_W_IVA'].to_numpy(dtype=float)
+    pairs = list(zip(rate.tolist(), n_inst.tolist()))
+    schedules = _unit_schedules(list(dict.fromkeys(pairs)))
+    unit = np.hstack([schedules[pair] for pair in pairs]) if pairs else np.empty((2, 0))
+
+    # ✅ Step 3: Scale by the capital and give the residue of each credit to its last installment
+    capital = credits['Cap_Grant'].to_numpy(dtype=float)
+    interest, v = unit[0] * capital[rows], unit[1] * capital[rows]
+    residue = np.bincount(rows, weights=v - interest, minlength=len(credits)) - capital
+    interest[nro == n_inst[rows]] += residue
+
+    # ✅ Step 4: Due dates, one month apart from the first one
+    first_due = pd.to_datetime(credits['D_F_Due']).to_numpy(dtype='datetime64[ns]')
+    d_due = _due_dates(first_due[rows], nro - 1)
+
+    return pd.DataFrame({
+        'ID_Op': credits.index.to_numpy()[rows],
+        'Nro_Inst': nro,
+        'D_Due': d_due,
+        'Capital': v - interest,
+        'Interest': interest / 1.21,
+        'IVA': interest / 1.21 * 0.21,
+        'Total': v,
+        'ID_Owner': id_owner
+    })
+
+
+def _annuity_gap(rate: np.ndarray, n_inst: np.ndarray, v_inst: np.ndarray, capital: np.ndarray) -> tuple:
+    """
+    Returns the gap between the capital and the present value of the installments at `rate`, and its
+    derivative with respect to the rate (the function `npf.rate` solves, for installments at period end).
+    """
+
+    growth = (1.0 + rate) ** n_inst
+    growth_prev = (1.0 + rate) ** (n_inst - 1)
+    gap = -capital * growth + v_inst * (growth - 1.0) / rate
+    slope = -n_inst * growth_prev * capital - v_inst * (growth - 1.0) / rate ** 2 + n_inst * v_inst * growth_prev / rate
+    return gap, slope
+
+
+def solve_rates(
+        n_inst,
+        v_inst,
+        capital,
+        guess: float = 0.1,
+        tol: float = 1e-10,
+        max_iter: int = 100) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the monthly rate of many credits at once from their term, installment value and capital.
+
+    Solves, for every credit, the same equation as `npf.rate(n_inst, v_inst, -capital)`, but over the
+    whole column with array operations: Newton steps run on the rows that have not converged yet, and
+    the rows where Newton fails (no convergence, or a step out of range) are bisected on the bracket
+    [-0.99, 10], where the gap is monotonic. Rows with no rate in the bracket (e.g. an installment value
+    that does not pay the capital back) are reported instead of silently left as NaN.
+
+    Parameters:
+        n_inst (array-like): Number of installments of each credit.
+        v_inst (array-like): Installment value of each credit.
+        capital (array-like): Granted capital of each credit.
+        guess (float, optional): Starting rate of the Newton steps. Defaults to 0.1.
+        tol (float, optional): Convergence tolerance on the rate. Defaults to 1e-10.
+        max_iter (int, optional): Maximum Newton iterations, and bisection halvings. Defaults to 100.
+
+    Returns:
+        tuple:
+            - np.ndarray: Monthly rate of each credit (NaN where it did not converge).
+            - np.ndarray: Boolean mask of the credits that did not converge.
+
+    Example:
+        >>> rates, failed = solve_rates(df['N_Inst'], df['V_Inst'], df['Cap_Grant'])
+        >>> df.index[failed]
+    """
+
+    n_inst = np.asarray(n_inst, dtype=float)
+    v_inst = np.asarray(v_inst, dtype=float)
+    capital = np.asarray(capital, dtype=float)
+
+    rate = np.full(n_inst.shape, guess, dtype=float)
+    active = np.ones(n_inst.shape, dtype=bool)
+    converged = np.zeros(n_inst.shape, dtype=bool)
+
+    # ✅ Step 1: Newton steps on the rows still moving
+    with np.errstate(all='ignore'):
+        for _ in range(max_iter):
+            if not active.any():
+                break
+            gap, slope = _annuity_gap(rate[active], n_inst[active], v_inst[active], capital[active])
+            step = gap / slope
+            new_rate = rate[active] - step
+
+            valid = np.isfinite(new_rate) & (new_rate > -0.99)
+            done = valid & (np.abs(step) < tol)
+
+            rows = np.flatnonzero(active)
+            rate[rows[valid]] = new_rate[valid]
+            converged[rows[done]] = True
+            active[rows[done | ~valid]] = False
+
+    # ✅ Step 2: Bisect the rows Newton could not solve
+    pending = ~converged
+    if pending.any():
+        n, v, p = n_inst[pending], v_inst[pending], capital[pending]
+        low, high = np.full(n.shape, -0.99), np.full(n.shape, 10.0)
+
+        with np.errstate(all='ignore'):
+            # A zero rate makes the gap 0/0, so the bracket ends are taken away from it
+            gap_low, _ = _annuity_gap(low, n, v, p)
+            gap_high, _ = _annuity_gap(high, n, v, p)
+            bracketed = np.isfinite(gap_low) & np.isfinite(gap_high) & (np.sign(gap_low) != np.sign(gap_high))
+
+            for _ in range(max_iter):
+                mid = (low + high) / 2.0
+                mid = np.where(mid == 0.0, tol, mid)
+                gap_mid, _ = _annuity_gap(mid, n, v, p)
+                same = np.sign(gap_mid) == np.sign(gap_low)
+                low, gap_low = np.where(same, mid, low), np.where(same, gap_mid, gap_low)
+                high = np.where(same, high, mid)
+                if (high - low).max(initial=0.0) < tol:
+                    break
+
+        solved = bracketed & ((high - low) < tol * 10)
+        rows = np.flatnonzero(pending)
+        rate[rows] = np.where(solved, (low + high) / 2.0, np.nan)
+        converged[rows] = solved
+
+    # ✅ Step 3: Leave NaN where no rate was found
+    rate[~converged] = np.nan
+    return rate, ~converged
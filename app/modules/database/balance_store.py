@@ -0,0 +1,281 @@
+import pandas as pd
+
+# Import your module
+from app.modules.database.connection import engine
+
+from sqlalchemy import text, inspect
+from app.modules.database.structur_databases import Base, InstallmentBalance, BalanceCheckpoint, BalanceCheckpointRow
+
+
+BALANCE_COLUMNS = ['Capital', 'Interest', 'IVA', 'Total']
+
+# Outstanding amounts of every installment, recomputed from the full collection history
+_AGGREGATED_BALANCE = """
+    SELECT i.ID AS ID_Inst,
+           i.Capital - COALESCE(c.Capital, 0) AS Capital,
+           i.Interest - COALESCE(c.Interest, 0) AS Interest,
+           i.IVA - COALESCE(c.IVA, 0) AS IVA,
+           i.Total - COALESCE(c.Total, 0) AS Total
+    FROM installments i
+    LEFT JOIN (
+        SELECT ID_Inst,
+               SUM(Capital) AS Capital, SUM(Interest) AS Interest,
+               SUM(IVA) AS IVA, SUM(Total) AS Total
+        FROM collection
+        GROUP BY ID_Inst
+    ) c ON c.ID_Inst = i.ID
+"""
+
+
+def sync_installment_balance(connection, ids: range = None) -> None:
+    """
+    Registers the installments that do not have a row in `installment_balance` yet.
+
+    New installments start with their full amounts outstanding. Only installments with an ID
+    above the highest registered one are considered, so the cost depends on the new rows.
+    Writers that insert a block of reserved IDs (see `id_reservations.reserve_ids`) pass it, since
+    a block reserved earlier may be committed after a later one.
+
+    Parameters:
+        connection (sqlalchemy.engine.Connection): Open connection inside the writer's transaction.
+        ids (range, optional): Block of installment IDs the writer inserted.
+    """
+
+    if ids is not None:
+        if len(ids):
+            connection.execute(text("""
+                INSERT INTO installment_balance (ID_Inst, Capital, Interest, IVA, Total)
+                SELECT i.ID, i.Capital, i.Interest, i.IVA, i.Total
+                FROM installments i
+                WHERE i.ID BETWEEN :first AND :last
+                  AND NOT EXISTS (SELECT 1 FROM installment_balance b WHERE b.ID_Inst = i.ID)
+            """), {'first': ids[0], 'last': ids[-1]})
+        return
+
+    connection.execute(text("""
+        INSERT INTO installment_balance (ID_Inst, Capital, Interest, IVA, Total)
+        SELECT i.ID, i.Capital, i.Interest, i.IVA, i.Total
+        FROM installments i
+        WHERE i.ID > (SELECT COALESCE(MAX(b.ID_Inst), 0) FROM installment_balance b)
+    """))
+
+
+def apply_collections(connection, collection: pd.DataFrame, reverse: bool = False) -> None:
+    """
+    Subtracts the given collection rows from `installment_balance`.
+
+    Must run on the same connection (and transaction) that inserts the collection rows, after
+    `sync_installment_balance` if the collections point to installments created in that transaction.
+
+    Parameters:
+        connection (sqlalchemy.engine.Connection): Open connection inside the writer's transaction.
+        collection (pd.DataFrame): Collection rows with 'ID_Inst' and the amount columns.
+        reverse (bool, optional): If True, adds the amounts back (used when collections are deleted).
+    """
+
+    if collection is None or collection.empty:
+        return
+
+    # ✅ Round each row like the DECIMAL(15,2) columns do, then total them per installment
+    amounts = collection[BALANCE_COLUMNS].astype(float).round(2)
+    amounts['ID_Inst'] = collection['ID_Inst'].astype(int).values
+    totals = amounts.groupby('ID_Inst')[BALANCE_COLUMNS].sum().round(2)
+
+    if reverse:
+        totals = -totals
+
+    params = [
+        {'ID_Inst': int(id_inst), **{col: float(row[col]) for col in BALANCE_COLUMNS}}
+        for id_inst, row in totals.iterrows()
+    ]
+
+    connection.execute(text("""
+        UPDATE installment_balance
+        SET Capital = Capital - :Capital,
+            Interest = Interest - :Interest,
+            IVA = IVA - :IVA,
+            Total = Total - :Total
+        WHERE ID_Inst = :ID_Inst
+    """), params)
+
+
+def rebuild_installment_balance() -> int:
+    """
+    Rebuilds `installment_balance` from the installments and the full collection history.
+
+    Creates the table if the database predates it. Use it once after upgrading, after bulk
+    loads done outside this package, or when `check_installment_balance` reports differences.
+
+    Returns:
+        int: Number of installments registered.
+    """
+
+    # ✅ Step 1: Create the table if it does not exist
+    Base.metadata.create_all(engine, tables=[InstallmentBalance.__table__])
+
+    # ✅ Step 2: Replace its content in a single transaction
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM installment_balance"))
+        result = connection.execute(text(
+            f"INSERT INTO installment_balance (ID_Inst, Capital, Interest, IVA, Total) {_AGGREGATED_BALANCE}"
+        ))
+
+    print(f"✅ Installment balance rebuilt for {result.rowcount:,} installments.")
+    return result.rowcount
+
+
+def check_installment_balance(tolerance: float = 0.005) -> pd.DataFrame:
+    """
+    Compares `installment_balance` against the balance recomputed from the collections.
+
+    Parameters:
+        tolerance (float, optional): Maximum accepted difference per amount column. Defaults to 0.005.
+
+    Returns:
+        pd.DataFrame: Installments whose stored balance is missing, orphaned or different, with the
+        stored ('_Stored') and recomputed ('_Expected') amounts. Empty if the table is consistent.
+    """
+
+    # ✅ Step 1: Load the stored and the recomputed balances
+    stored = pd.read_sql("SELECT * FROM installment_balance", engine, index_col='ID_Inst')
+    expected = pd.read_sql(_AGGREGATED_BALANCE, engine, index_col='ID_Inst')
+    stored = stored[BALANCE_COLUMNS].astype(float)
+    expected = expected[BALANCE_COLUMNS].astype(float).round(2)
+
+    # ✅ Step 2: Align both sets of installments and flag the differences
+    df = expected.join(stored, how='outer', lsuffix='_Expected', rsuffix='_Stored')
+    missing = df[[f'{col}_Expected' for col in BALANCE_COLUMNS]].isna().any(axis=1) | \
+              df[[f'{col}_Stored' for col in BALANCE_COLUMNS]].isna().any(axis=1)
+    different = pd.concat(
+        [(df[f'{col}_Expected'] - df[f'{col}_Stored']).abs() > tolerance for col in BALANCE_COLUMNS], axis=1
+    ).any(axis=1)
+
+    df = df.loc[missing | different]
+
+    if df.empty:
+        print("✅ Installment balance is consistent with the collections.")
+    else:
+        print(f"⚠️ {len(df):,} installments differ from the collections. Run rebuild_installment_balance().")
+
+    return df
+
+
+def outstanding_balance() -> pd.DataFrame:
+    """
+    Reads the installments that still have an outstanding amount.
+
+    Only rows with a non-zero 'Total' are read, so the cost grows with the open installments
+    instead of with every collection ever posted.
+
+    Returns:
+        pd.DataFrame: Outstanding 'Capital', 'Interest', 'IVA' and 'Total' indexed by installment ID.
+    """
+
+    df = pd.read_sql(
+        "SELECT * FROM installment_balance WHERE Total <> 0", engine, index_col='ID_Inst'
+    )
+    df[BALANCE_COLUMNS] = df[BALANCE_COLUMNS].astype(float)
+    df.index.name = 'ID'
+
+    return df
+
+
+def create_balance_checkpoints(until: pd.Timestamp = None) -> int:
+    """
+    Stores month-end checkpoints of the amounts collected on each installment.
+
+    A checkpoint keeps, for one month end, the collections dated up to that day that were already
+    posted (ID up to 'Max_Collection_ID'). `credits_balance(date)` starts from the nearest checkpoint
+    at or before `date` and only replays the collections posted or dated after it. Month ends that
+    already have a checkpoint are skipped, so the function can be scheduled monthly.
+
+    Parameters:
+        until (pd.Timestamp, optional): Last month end to store. Defaults to the end of the previous month.
+
+    Returns:
+        int: Number of checkpoints created.
+    """
+
+    # ✅ Step 1: Create the tables if they do not exist
+    Base.metadata.create_all(engine, tables=[BalanceCheckpoint.__table__, BalanceCheckpointRow.__table__])
+
+    # ✅ Step 2: Determine the month ends between the first collection and `until`
+    first = pd.read_sql("SELECT MIN(D_Emission) FROM collection", engine).iloc[0, 0]
+    if pd.isna(first):
+        print("⚠️ There are no collections to checkpoint.")
+        return 0
+
+    until = pd.Timestamp.now().normalize() - pd.offsets.MonthEnd(1) if until is None else pd.Timestamp(until)
+    month_ends = pd.date_range(pd.Timestamp(first).normalize() + pd.offsets.MonthEnd(0), until, freq=pd.offsets.MonthEnd())
+
+    existing = pd.read_sql("SELECT Date FROM balance_checkpoints", engine, parse_dates=['Date'])['Date']
+    month_ends = month_ends[~month_ends.isin(existing)]
+
+    # ✅ Step 3: Store each checkpoint and its rows in its own transaction
+    for month_end in month_ends:
+        with engine.begin() as connection:
+            max_id = connection.execute(text("SELECT COALESCE(MAX(ID), 0) FROM collection")).scalar()
+            id_checkpoint = connection.execute(text("""
+                INSERT INTO balance_checkpoints (Date, Max_Collection_ID, Created)
+                VALUES (:date, :max_id, :created)
+            """), {'date': month_end.to_pydatetime(), 'max_id': int(max_id),
+                   'created': pd.Timestamp.now().to_pydatetime()}).lastrowid
+            connection.execute(text("""
+                INSERT INTO balance_checkpoint_rows (ID_Checkpoint, ID_Inst, Capital, Interest, IVA, Total)
+                SELECT :id_checkpoint, ID_Inst, SUM(Capital), SUM(Interest), SUM(IVA), SUM(Total)
+                FROM collection
+                WHERE D_Emission < :end AND ID <= :max_id
+                GROUP BY ID_Inst
+            """), {'id_checkpoint': id_checkpoint, 'max_id': int(max_id),
+                   'end': (month_end + pd.Timedelta(days=1)).to_pydatetime()})
+
+    print(f"✅ {len(month_ends):,} balance checkpoints created.")
+    return len(month_ends)
+
+
+def latest_checkpoint(date: pd.Timestamp):
+    """
+    Finds the most recent checkpoint taken at or before `date`.
+
+    Parameters:
+        date (pd.Timestamp): The as-of date (day precision).
+
+    Returns:
+        pd.Series | None: 'ID', 'Date' and 'Max_Collection_ID' of the checkpoint, or None if there is
+        none (or the checkpoint tables were never created).
+    """
+
+    if not inspect(engine).has_table('balance_checkpoints'):
+        return None
+
+    df = pd.read_sql(
+        text("SELECT ID, Date, Max_Collection_ID FROM balance_checkpoints WHERE Date <= :date ORDER BY Date DESC LIMIT 1"),
+        engine, params={'date': pd.Timestamp(date).to_pydatetime()}, parse_dates=['Date']
+    )
+
+    return None if df.empty else df.iloc[0]
+
+
+def drop_checkpoints(connection, collection: pd.DataFrame) -> None:
+    """
+    Deletes the checkpoints that include any of the given collection rows.
+
+    Must run in the transaction that deletes those rows from `collection`: a checkpoint includes a
+    row when its ID is at most 'Max_Collection_ID' and it is dated on or before the checkpoint date.
+
+    Parameters:
+        connection (sqlalchemy.engine.Connection): Open connection inside the writer's transaction.
+        collection (pd.DataFrame): Deleted collection rows with 'ID' and 'D_Emission'.
+    """
+
+    if collection is None or collection.empty or not inspect(connection).has_table('balance_checkpoints'):
+        return
+
+    params = [
+        {'id': int(row['ID']), 'day': pd.Timestamp(row['D_Emission']).normalize().to_pydatetime()}
+        for _, row in collection.iterrows()
+    ]
+    affected = "SELECT ID FROM balance_checkpoints WHERE Max_Collection_ID >= :id AND Date >= :day"
+
+    connection.execute(text(f"DELETE FROM balance_checkpoint_rows WHERE ID_Checkpoint IN ({affected})"), params)
+    connection.execute(text("DELETE FROM balance_checkpoints WHERE Max_Collection_ID >= :id AND Date >= :day"), params)
@@ -1,14 +1,21 @@
 import os
+import csv
+import numpy as np
 import pandas as pd
 
 # Import your module
 from app.modules.database.connection import engine
 
 from enum import Enum
-from sqlalchemy import update
-from sqlalchemy.orm import Session, sessionmaker
+from openpyxl import load_workbook
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import update, text, bindparam
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import IntegrityError
-from app.modules.database.credit_manager import credits_balance
+from app.modules.database.credit_manager import credits_balance, BalanceEngine
+from app.modules.database.balance_store import sync_installment_balance, apply_collections, drop_checkpoints
+from app.modules.database.identifier_index import find_customer, find_credits, has_recourse
+from app.modules.database.id_reservations import reserve_ids
 from app.modules.database.structur_databases import Company, Collection
 from sqlalchemy.exc import IntegrityError as alIE, SQLAlchemyError
 from pymysql.err import IntegrityError as myIE
@@ -35,32 +42,28 @@ class TypeDataCollection(Enum):
             ValueError: Si el valor no es válido.
         """
 
-        if type in [TypeDataCollection.ID_Op, TypeDataCollection.ID_Ext]:
-            df_crs = pd.read_sql('credits', engine, index_col='ID')
-        elif type in [TypeDataCollection.CUIL, TypeDataCollection.DNI]:
-            df_cst = pd.read_sql('customers', engine, index_col='ID')
-
+        # ✅ Membership is checked on the identifier index instead of scanning the tables
         if type == TypeDataCollection.CUIL:
             if len(str(value)) != 11:
                 raise ValueError(f"CUIL debe tener exactamente 11 dígitos.")
-            elif value not in df_cst['CUIL'].values:
+            elif find_customer('CUIL', value) is None:
                 raise ValueError(f"El cliente con CUIL {value} no esta en la base de datos.")
             else:
                 return True
         elif type == TypeDataCollection.DNI:
             if len(str(value).rjust(8, "0")) != 8:
                 raise ValueError(f"DNI debe tener exactamente 8 dígitos.")
-            elif value not in df_cst['DNI'].values:
+            elif find_customer('DNI', value) is None:
                 raise ValueError(f"El cliente con DNI {value} no esta en la base de datos.")
             else:
                 return True   
         elif type == TypeDataCollection.ID_Op:
-            if value in df_crs.index:
+            if find_credits('ID_Op', value):
                 return True
             else:
                 raise ValueError(f"{value} no es un crédito de la base de datos")
         elif type == TypeDataCollection.ID_Ext:
-            if value in df_crs['ID_External'].values:
+            if find_credits('ID_External', value):
                 return True
             else:
                 raise ValueError(f"{value} no es un crédito de la base de datos")
@@ -98,19 +101,11 @@ def _get_customer_id(ident_type, identifier):
     Raises:
         ValueError: If the identifier type is invalid.
     """
-    # ✅ Load customer data
-    customers = pd.read_sql('customers', engine, index_col='ID')
-
-    # ✅ Check identifier type and filter safely
-    if ident_type == TypeDataCollection.DNI:
-        match = customers.loc[customers['DNI'] == identifier]
-    elif ident_type == TypeDataCollection.CUIL:
-        match = customers.loc[customers['CUIL'] == identifier]
-    else:
+    # ✅ Check identifier type and look the document up in the identifier index
+    if ident_type not in [TypeDataCollection.DNI, TypeDataCollection.CUIL]:
         raise ValueError(f"Invalid identifier type: {ident_type}")
 
-    # ✅ Ensure at least one match is found before accessing index[0]
-    return match.index.values[0] if not match.empty else None
+    return find_customer(ident_type.value, identifier)
 
 def _get_credits_by_identifier(ident_type, identifier, id_supplier):
     """
@@ -122,37 +117,28 @@ def _get_credits_by_identifier(ident_type, identifier, id_supplier):
         id_supplier (int, optional): Supplier ID for filtering.
 
     Returns:
-        tuple: (List of credit IDs, DataFrame of all credits).
+        tuple: (List of credit IDs, DataFrame of those credits).
 
     Raises:
         IdentifierError: If no credits are found for the given identifier.
     """
     
-    # ✅ Load credit data
-    credits = pd.read_sql('credits', engine, index_col='ID')
-    
-    # ✅ Handle customer-based identifiers (DNI, CUIL)
+    # ✅ Handle customer-based identifiers (DNI, CUIL), filtered by supplier if given
     if ident_type in {TypeDataCollection.DNI, TypeDataCollection.CUIL}:
-        id_cst = _get_customer_id(ident_type, identifier)
+        id_credits = find_credits(ident_type.value, identifier, id_supplier)
 
-        if id_supplier:
-            # ✅ Load business plan and filter by supplier
-            bp = pd.read_sql('business_plan', engine, index_col='ID')
-            bps = bp.loc[bp['ID_Company'] == id_supplier].index.values
-            id_credits = credits.loc[(credits['ID_Client'] == id_cst) & (credits['ID_BP'].isin(bps))].index.values
-        else:
-            id_credits = credits.loc[credits['ID_Client'] == id_cst].index.values
-        
-        if id_credits.size == 0:
+        if not id_credits:
             raise IdentifierError(ident_type, identifier)
 
-    # ✅ Handle direct operation ID lookup
-    elif ident_type == TypeDataCollection.ID_Op:
-        id_credits = [identifier] if identifier in credits.index else []
-
-    # ✅ Handle external ID lookup
+    # ✅ Handle direct operation ID and external ID lookups
     else:
-        id_credits = credits.loc[credits['ID_External'] == identifier].index.values
+        id_credits = find_credits(ident_type.value, identifier)
+
+    # ✅ Load only the credits found
+    credits = pd.read_sql(
+        text("SELECT * FROM credits WHERE ID IN :ids ORDER BY ID").bindparams(bindparam('ids', expanding=True)),
+        engine, params={'ids': id_credits}, index_col='ID'
+    )
 
     return list(id_credits), credits  # ✅ Ensure id_credits is always a list
 
@@ -166,18 +152,16 @@ def _prepare_balance(id_credits):
     Returns:
         pd.DataFrame: Processed balance DataFrame, sorted and with accumulated totals.
     """
-    # ✅ Retrieve credit balances
-    balance = credits_balance()
+    # ✅ Retrieve the outstanding installments of the given credits only (filtered in the database)
+    balance = credits_balance(id_credits=list(id_credits) if id_credits else [], mode=BalanceEngine.TABLE)
 
-    # ✅ Filter balance data based on credit IDs
-    if not id_credits:  # Return empty DataFrame if no credits are provided
+    # ✅ Return an empty DataFrame if no credits are provided
+    if not id_credits:
         return balance.iloc[0:0].copy()
 
-    balance = balance.loc[balance['ID_Op'].isin(id_credits)].copy()
-
-    # ✅ Ensure balance is not empty after filtering
+    # ✅ Ensure balance is not empty after filtering (fully paid credits have no outstanding rows)
     if balance.empty:
-        return balance  # Return empty DataFrame if no matching records
+        return balance.assign(Accumulated=0.0)  # Return empty DataFrame if no matching records
 
     # ✅ Sort balance data
     balance.sort_values(by=['D_Due', 'ID_Op', 'Nro_Inst'], inplace=True)
@@ -268,11 +252,15 @@ def _process_early_payment(complete_balance, amount, collection, date, early: bo
     return collection
 
 def _process_penalty(amount, credits, date, id_credits, collection, save, early: bool = False, migration: bool = False):
-    """Process a penalty if there is a remaining amount."""
+    """
+    Process a penalty if there is a remaining amount.
+
+    The IDs of the penalty installment and credit are provisional (the next ones at the time of the
+    call); `post_collections` replaces them with the ones the database assigns.
+    """
     cr_penalty = credits.iloc[0:0].copy()
-    inst = pd.read_sql('installments', engine, index_col='ID')
-    id_penalty = inst.index.max() + 1
-    inst = inst.iloc[0:0].copy()
+    id_penalty, id_credit = _provisional_ids()
+    inst = pd.DataFrame(columns=INSTALLMENT_COLUMNS)
 
     if amount <= 0.009:
         amount = 0.0
@@ -296,7 +284,7 @@ def _process_penalty(amount, credits, date, id_credits, collection, save, early:
     }
 
     inst.loc[0] = {
-        'ID_Op': pd.read_sql('credits', engine, index_col='ID').index.max() + 1,
+        'ID_Op': id_credit,
         'Nro_Inst': 1,
         'D_Due': date,
         'Capital': 0.0,
@@ -318,10 +306,9 @@ def _process_penalty(amount, credits, date, id_credits, collection, save, early:
     }
 
     if save:
-        cr_penalty.to_sql('credits', engine, index=False, if_exists='append')
-        inst.to_sql('installments', engine, index=False, if_exists='append')
+        written, cr_penalty, inst = post_collections(collection if migration else collection.iloc[0:0], cr_penalty, inst)
         if migration:
-            collection.to_sql('collection', engine, index=False, if_exists='append')
+            collection = written
         
     return collection, cr_penalty, inst
 
@@ -431,24 +418,14 @@ def filter_credits_with_resources(id_credits, ident_type, identifier):
     if not id_credits:
         return []
 
-    # ✅ Load relevant tables from the database
-    credits = pd.read_sql('credits', engine, index_col='ID')
-    pp = pd.read_sql('portfolio_purchases', engine, index_col='ID')
-
     # ✅ Ensure all requested credit IDs exist in the 'credits' table
-    valid_id_credits = [cid for cid in id_credits if cid in credits.index]
+    valid_id_credits = [cid for cid in id_credits if find_credits('ID_Op', cid)]
 
     if not valid_id_credits:
         return []  # Return empty list if none of the given credit IDs exist
 
-    # ✅ Map credits to their associated portfolio purchase IDs
-    id_pp_mapping = credits.loc[valid_id_credits, 'ID_Purch']
-
-    # ✅ Extract 'Resource' values, handling missing data safely
-    resources = pp.loc[id_pp_mapping.dropna(), 'Resource'].fillna(0)
-
-    # ✅ Filter out credits where 'Resource' is 1
-    filtered_credits = [cid for cid, resource in zip(valid_id_credits, resources) if resource != 1]
+    # ✅ Filter out credits bought with recourse
+    filtered_credits = [cid for cid in valid_id_credits if not has_recourse(cid)]
 
     # ✅ Raise error if all credits were removed and we started with valid ones
     if not filtered_credits and valid_id_credits:
@@ -456,6 +433,110 @@ def filter_credits_with_resources(id_credits, ident_type, identifier):
 
     return filtered_credits
 
+def _provisional_ids() -> tuple[int, int]:
+    """Returns the next installment and credit IDs, used to preview penalties before they are written."""
+
+    ids = pd.read_sql(
+        "SELECT (SELECT MAX(ID) FROM installments) AS Installments, (SELECT MAX(ID) FROM credits) AS Credits", engine
+    ).fillna(0).iloc[0]
+
+    return int(ids['Installments']) + 1, int(ids['Credits']) + 1
+
+
+def _sql_value(value):
+    """Converts a DataFrame value to a type the database driver accepts (NaN/NaT to NULL)."""
+
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return value
+
+
+def _insert_rows(connection, table: str, df: pd.DataFrame) -> None:
+    """Inserts every row of `df` with multi-row INSERT statements (the driver batches the executemany)."""
+
+    if df.empty:
+        return
+
+    columns = list(df.columns)
+    records = [{col: _sql_value(value) for col, value in zip(columns, row)} for row in df.itertuples(index=False)]
+
+    connection.execute(
+        text(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + col for col in columns)})"), records
+    )
+
+
+def post_collections(collection: pd.DataFrame, penalty: pd.DataFrame = None, inst: pd.DataFrame = None):
+    """
+    Writes the result of a collection (penalty credits, their installments and the collection rows)
+    in a single transaction.
+
+    The credits, installments and collection rows get blocks of IDs reserved in the same transaction
+    (see `id_reservations.reserve_ids`), so the IDs previewed with MAX(ID) + 1 are never written and
+    concurrent writers never collide. The k-th installment points to the k-th penalty credit and the
+    k-th PENALTY row to the k-th installment; every table is then written with multi-row statements.
+    `installment_balance` is updated in the same transaction.
+
+    Args:
+        collection (pd.DataFrame): Collection rows. The k-th 'PENALTY' row belongs to the k-th penalty.
+        penalty (pd.DataFrame, optional): Penalty credits, in the same order as their installments.
+        inst (pd.DataFrame, optional): One installment per penalty credit.
+
+    Returns:
+        tuple: (collection, penalty, inst) as written, indexed by their new 'ID', with the PENALTY rows
+        pointing to the new installments.
+
+    Raises:
+        ValueError: If the penalties, their installments and the PENALTY rows do not match.
+        sqlalchemy.exc.IntegrityError: If the database rejects a row; nothing is written.
+    """
+
+    start = pd.Timestamp.now()
+    collection = collection.copy()
+    penalty = pd.DataFrame() if penalty is None else penalty.copy()
+    inst = pd.DataFrame(columns=INSTALLMENT_COLUMNS) if inst is None or inst.empty else inst[INSTALLMENT_COLUMNS].copy()
+
+    is_penalty = (collection['Type_Collection'] == 'PENALTY').to_numpy() if not collection.empty else np.zeros(0, bool)
+    if len(penalty) != len(inst) or is_penalty.sum() not in [0, len(inst)]:
+        raise ValueError(
+            f"{len(penalty)} penalty credits, {len(inst)} installments and {is_penalty.sum()} PENALTY rows do not match."
+        )
+
+    # Columns left empty for every penalty keep their database defaults
+    penalty = penalty.drop(columns=['ID'], errors='ignore').dropna(axis=1, how='all')
+
+    with engine.begin() as connection:
+        # ✅ Step 1: Reserve the IDs of every row
+        credit_ids = reserve_ids('credits', len(penalty), connection)
+        inst_ids = reserve_ids('installments', len(inst), connection)
+        collection_ids = reserve_ids('collection', len(collection), connection)
+
+        # ✅ Step 2: Link the installments to the penalty credits and the PENALTY rows to the installments
+        penalty.index = pd.Index(credit_ids, name='ID')
+        inst.index = pd.Index(inst_ids, name='ID')
+        inst['ID_Op'] = list(credit_ids)
+        collection.index = pd.Index(collection_ids, name='ID')
+        if is_penalty.any():
+            collection.loc[is_penalty, 'ID_Inst'] = list(inst_ids)
+
+        # ✅ Step 3: Write every table with multi-row inserts and update the balance
+        _insert_rows(connection, 'credits', penalty.reset_index())
+        _insert_rows(connection, 'installments', inst.reset_index())
+        sync_installment_balance(connection, inst_ids)
+        _insert_rows(connection, 'collection', collection[COLLECTION_COLUMNS].reset_index())
+        apply_collections(connection, collection)
+
+    rows = len(penalty) + len(inst) + len(collection)
+    seconds = max((pd.Timestamp.now() - start).total_seconds(), 1e-6)
+    print(f"✅ {rows:,} rows written in {seconds:.2f}s ({rows / seconds:,.0f} rows/s).")
+
+    return collection, penalty, inst
+
+
 def charging(
     ident_type: TypeDataCollection,
     identifier: int,
@@ -515,10 +596,7 @@ def charging(
     # ✅ Save results if requested
     if save:
         try:
-            if not (cr_penalty.empty or inst.empty):
-                cr_penalty.to_sql('credits', engine, index=False, if_exists='append')
-                inst.to_sql('installments', engine, index=False, if_exists='append')
-            collection.to_sql('collection', engine, index=False, if_exists='append')
+            collection, cr_penalty, inst = post_collections(collection, cr_penalty, inst)
             print(collection)
         except (alIE, myIE) as e:
             print(f"Database Integrity Error: {e}\nID: {identifier}\nPenalty: {cr_penalty}\nInstallment: {inst}\nCollections: {collection}")
@@ -566,45 +644,29 @@ def _process_early_settlement(collection, early, date, collection_type, amount):
     return collection
 
 
-def collection_w_early_cancel(
-        ident_type: TypeDataCollection,
-        identifier: int,
-        amount: float,
-        id_supplier: int,
-        date: pd.Timestamp = pd.Timestamp.now(),
-        save: bool = False):
+def _early_cancel(balance, amount, date):
     """
-    Processes a collection operation with early cancellation handling.
+    Applies an early cancellation payment to the balance of one identifier, without database access.
 
-    This function manages the collection process, differentiating between regular 
-    collections and early cancellations. It adjusts balances for early settlements, 
-    applies bonuses for early cancellation, and optionally saves the results to the database.
+    Due installments are collected first (COMUN), then future installments are cancelled by their
+    capital (CAN. ANT.) with their interest and IVA bonified (BON. CAN. ANT.), the rest goes to the
+    first installment not collected, and whatever is left becomes a PENALTY row. The PENALTY row
+    points to installment 0; the caller assigns the ID of the penalty installment.
 
     Args:
-        ident_type (TypeDataCollection): The type of identifier (e.g., DNI, CUIL, ID_Op, ID_External).
-        identifier (int): The specific identifier value for the collection.
-        amount (float): The total amount to be collected.
-        id_supplier (int): ID of the supplier for business plans (optional).
-        date (pd.Timestamp): The date of the collection (defaults to the current date).
-        save (bool): Whether to save the collection records to the database (default is False).
+        balance (pd.DataFrame): Balance as returned by `_prepare_balance` (sorted, with 'Accumulated').
+        amount (float): Amount paid.
+        date (pd.Timestamp): Collection date.
 
     Returns:
-        tuple: (collection DataFrame, penalty DataFrame, installment DataFrame)
+        tuple: (collection DataFrame, amount left for the penalty)
     """
 
-    # ✅ Validate identifier
-    TypeDataCollection.validate(identifier, ident_type)
-
-    # ✅ Return empty DataFrame if amount is not positive
-    if amount <= 0.0:
-        return pd.DataFrame(columns=['ID_Inst', 'D_Emission', 'Type_Collection', 'Capital', 'Interest', 'IVA', 'Total'])
-
-    # ✅ Retrieve and filter credits
-    id_credits, credits = _get_credits_by_identifier(ident_type, identifier, id_supplier)
-    id_credits = filter_credits_with_resources(id_credits, ident_type, identifier)
+    pristine = balance.copy()
+    balance = balance.copy()
 
-    # ✅ Prepare balance
-    balance = _prepare_balance(id_credits)
+    # ✅ Compare accumulated amounts in cents, so paying exactly a quoted payoff settles every installment
+    balance['Accumulated'] = balance['Accumulated'].round(2)
 
     # ✅ Separate due and future installments
     common = balance.query("D_Due <= @date").copy()  # Due installments
@@ -619,8 +681,9 @@ def collection_w_early_cancel(
     early[['Interest', 'IVA']] = 0.0
     early['Total'] = early['Capital']
     early.sort_values(by=['D_Due', 'ID_Op', 'Nro_Inst'], inplace=True)
-    early['Accumulated'] = early['Total'].cumsum()
-    early = early.query("Accumulated <= @amount")
+    early['Accumulated'] = early['Total'].cumsum().round(2)
+    cents = round(amount, 2)
+    early = early.query("Accumulated <= @cents")
     esd = esd.loc[esd.index.isin(early.index)]
 
     collection = _process_early_settlement(collection, early, date, 'CAN. ANT.', amount)
@@ -635,25 +698,111 @@ def collection_w_early_cancel(
     collected_totals = collection.groupby('ID_Inst')[['Capital', 'Interest', 'IVA', 'Total']].sum()
     balance.loc[balance.index.isin(collected_totals.index), ['Capital', 'Interest', 'IVA', 'Total']] -= collected_totals
 
-    # ✅ Process remaining amount for penalties or adjustments
-    collection, penalties, installments = _process_remaining_amount(amount, collection, balance, credits, date, id_credits, False, True)
-    amount -= collection.query("Type_Collection == 'PENALTY'")['Total'].sum()
+    # ✅ The rest goes to the first installment not collected
+    if amount > 0.0 and not balance.loc[~balance.index.isin(collection['ID_Inst'].values)].empty:
+        collection = _process_early_payment(balance, amount, collection, date, True)
+        amount -= collection.iloc[-1]['Total']
+
+    # ✅ What is left over is a penalty
+    if amount > 0.009:
+        n = collection.index.max() + 1 if not collection.empty else 0
+        collection.loc[n] = {
+            'ID_Inst': 0,
+            'D_Emission': date,
+            'Type_Collection': 'PENALTY',
+            'Capital': 0.0,
+            'Interest': amount / 1.21,
+            'IVA': amount / 1.21 * 0.21,
+            'Total': amount
+        }
 
     # ✅ Final cleanup and rounding
     collection = collection.loc[collection['Total'] != 0].copy()
     collection[['Capital', 'Interest', 'IVA', 'Total']] = collection[['Capital', 'Interest', 'IVA', 'Total']].round(2)
 
-    # ✅ Solve rounding issues
-    collection = _solve_rounding(collection, balance, date, True, id_credits)
+    # ✅ Solve rounding issues against the balance before the payment
+    collection = _solve_rounding(collection, pristine, date)
+
+    return collection, amount if amount > 0.009 else 0.0
+
+
+def collection_w_early_cancel(
+        ident_type: TypeDataCollection,
+        identifier: int,
+        amount: float,
+        id_supplier: int,
+        date: pd.Timestamp = pd.Timestamp.now(),
+        save: bool = False):
+    """
+    Processes a collection operation with early cancellation handling.
+
+    This function manages the collection process, differentiating between regular 
+    collections and early cancellations. It adjusts balances for early settlements, 
+    applies bonuses for early cancellation, and optionally saves the results to the database.
+
+    Args:
+        ident_type (TypeDataCollection): The type of identifier (e.g., DNI, CUIL, ID_Op, ID_External).
+        identifier (int): The specific identifier value for the collection.
+        amount (float): The total amount to be collected.
+        id_supplier (int): ID of the supplier for business plans (optional).
+        date (pd.Timestamp): The date of the collection (defaults to the current date).
+        save (bool): Whether to save the collection records to the database (default is False).
+
+    Returns:
+        tuple: (collection DataFrame, penalty DataFrame, installment DataFrame)
+    """
+
+    # ✅ Validate identifier
+    TypeDataCollection.validate(identifier, ident_type)
+
+    # ✅ Return empty DataFrame if amount is not positive
+    if amount <= 0.0:
+        return pd.DataFrame(columns=['ID_Inst', 'D_Emission', 'Type_Collection', 'Capital', 'Interest', 'IVA', 'Total'])
+
+    # ✅ Retrieve and filter credits
+    id_credits, credits = _get_credits_by_identifier(ident_type, identifier, id_supplier)
+    id_credits = filter_credits_with_resources(id_credits, ident_type, identifier)
+
+    # ✅ Prepare balance
+    balance = _prepare_balance(id_credits)
+
+    # ✅ Apply the payment on the balance read from the database
+    collection, left = _early_cancel(balance, amount, date)
+
+    # ✅ Turn the leftover into a penalty credit of the customer
+    if left > 0.009:
+        id_penalty, id_credit = _provisional_ids()
+        collection.loc[collection['Type_Collection'] == 'PENALTY', 'ID_Inst'] = id_penalty
+
+        penalties = credits.iloc[0:0].copy()
+        penalties.loc[0] = {
+            'ID_Client': credits.loc[credits.index.isin(id_credits), 'ID_Client'].values[0],
+            'Date_Settlement': date,
+            'ID_BP': 1,
+            'Cap_Requested': 0.0,
+            'Cap_Grant': 0.0,
+            'N_Inst': 1,
+            'TEM_W_IVA': 0.0,
+            'V_Inst': left,
+            'D_F_Due': date,
+        }
+        installments = pd.DataFrame([{
+            'ID_Op': id_credit,
+            'Nro_Inst': 1,
+            'D_Due': date,
+            'Capital': 0.0,
+            'Interest': left / 1.21,
+            'IVA': left / 1.21 * 0.21,
+            'Total': left,
+            'ID_Owner': 1
+        }], columns=INSTALLMENT_COLUMNS)
+    else:
+        penalties, installments = pd.DataFrame(), pd.DataFrame()
 
     # ✅ Save results if requested
     if save:
         try:
-            if not penalties.empty:
-                penalties.to_sql('credits', engine, index=False, if_exists='append')
-            if not installments.empty:
-                installments.to_sql('installments', engine, index=False, if_exists='append')
-            collection.to_sql('collection', engine, index=False, if_exists='append')
+            collection, penalties, installments = post_collections(collection, penalties, installments)
             print(collection)
         except (alIE, myIE) as e:
             print(f"⚠️ Database Error: {e}")
@@ -675,6 +824,11 @@ def reverse(
     the balance of the associated credits and installments. It adjusts the collection 
     amounts accordingly and optionally saves the reversed transactions to the database.
 
+    Installments are walked from the latest due date backwards. Each installment with collections
+    is reversed in full while the amount covers what was collected on it (up to 10 cents short
+    for a fully collected one); the first one the amount does not cover is reversed in part,
+    capital first and the rest as interest plus IVA. Nothing is reversed after it.
+
     Args:
         ident_type (TypeDataCollection): The type of identifier (e.g., DNI, CUIL, ID_Op, ID_External).
         identifier (int): The specific identifier value for the reversal operation.
@@ -685,106 +839,185 @@ def reverse(
 
     Returns:
         pd.DataFrame: A DataFrame containing the reversed collection records.
+
+    Raises:
+        ValueError: If the amount reaches an installment whose balance is negative or above its amount.
     """
     # Validate the identifier type and value
     TypeDataCollection.validate(identifier, ident_type)
 
     # Retrieve credits based on the identifier type
-    id_credits, credits = _get_credits_by_identifier(ident_type, identifier, id_supplier)
+    id_credits, _ = _get_credits_by_identifier(ident_type, identifier, id_supplier)
 
-    # Retrieve and prepare the balance for the credits
-    balance = _prepare_balance(id_credits)
+    # Reverse the amount over the installments of the credits, latest due first
+    assigned = pd.DataFrame({'Pos': 0, 'ID_Op': pd.Series(id_credits, dtype=int)})
+    collection, _, errors = _reverse_partition(
+        pd.Series([float(amount)]), assigned, _reversal_balance(id_credits), date
+    )
 
-    # Retrieve the installment data for the credits and sort for reversal processing
-    installments = pd.read_sql('installments', engine, index_col='ID')
-    installments = installments.loc[
-        installments.index.isin(balance.index)
-    ].sort_values(by=['D_Due', 'ID_Op', 'Nro_Inst'], ascending=False)
+    # Raise an error for unhandled scenarios (balances above the installment or negative)
+    if not errors.empty:
+        raise ValueError(errors.iloc[0])
 
-    # Initialize an empty DataFrame to store the reversed collection records
-    collection = pd.read_sql('collection', engine, index_col='ID').iloc[0:0]
+    collection = collection.assign(D_Emission=date)[COLLECTION_COLUMNS].reset_index(drop=True)
 
-    # Iterate through the installments to process reversals
-    for n, i in enumerate(installments.index):
-        # Case 1: No adjustment needed if the balance matches the installment
-        if balance.loc[i, 'Total'] == installments.loc[i, 'Total']:
-            pass
+    # Save the reversed collection records if required
+    if save:
+        collection, _, _ = post_collections(collection)
 
-        # Case 2: Partial reversal when there is an outstanding balance
-        elif (balance.loc[i, 'Total'] > 0.0) & (balance.loc[i, 'Total'] < installments.loc[i, 'Total']) & \
-             (amount >= installments.loc[i, 'Total'] - balance.loc[i, 'Total'].sum()):
-            collection.loc[n] = {
-                'ID_Inst': i,
-                'D_Emission': date,
-                'Type_Collection': 'REVERSA',
-                'Capital': -(installments.loc[i, 'Capital'] - balance.loc[i, 'Capital']),
-                'Interest': -(installments.loc[i, 'Interest'] - balance.loc[i, 'Interest']),
-                'IVA': -(installments.loc[i, 'IVA'] - balance.loc[i, 'IVA']),
-                'Total': -(installments.loc[i, 'Total'] - balance.loc[i, 'Total'])
-            }
-            amount -= (installments.loc[i, 'Total'] - balance.loc[i, 'Total'])
+    return collection
 
-        # Case 3: Full reversal of an unpaid installment
-        elif (balance.loc[i, 'Total'] == 0.0) & (amount - installments.loc[i, 'Total'] >= -0.1):
-            collection.loc[n] = {
-                'ID_Inst': i,
-                'D_Emission': date,
-                'Type_Collection': 'REVERSA',
-                'Capital': -installments.loc[i, 'Capital'],
-                'Interest': -installments.loc[i, 'Interest'],
-                'IVA': -installments.loc[i, 'IVA'],
-                'Total': -installments.loc[i, 'Total']
-            }
-            amount -= installments.loc[i, 'Total']
 
-        # Case 4: Partial installment reversal due to insufficient amount
-        elif amount < installments.loc[i, 'Total'] - balance.loc[i, 'Total']:
-            capital = installments.loc[i, 'Capital'] - balance.loc[i, 'Capital']
-            capital = capital if amount >= capital else amount
-            amount -= capital
+# Files above this size are read in streaming mode by default
+_STREAM_MIN_BYTES = 64 * 1024 ** 2
 
-            interest = (installments.loc[i, 'Interest'] - balance.loc[i, 'Interest']) / 1.21
-            iva = interest * 0.21
-            interest = interest if amount >= interest else amount / 1.21
-            amount -= interest
+# Rows read per chunk in streaming mode
+_STREAM_CHUNK_ROWS = 100_000
 
-            iva = iva if amount >= iva else interest * 0.21
 
-            collection.loc[n] = {
-                'ID_Inst': i,
-                'D_Emission': date,
-                'Type_Collection': 'REVERSA',
-                'Capital': -capital,
-                'Interest': -interest,
-                'IVA': -iva,
-                'Total': -(capital + interest + iva)
-            }
-            amount -= capital + interest + iva
+def _sniff_delimiter(path: str, sample_bytes: int = 64 * 1024) -> csv.Dialect:
+    """
+    Detects the dialect of a CSV file from its first lines only.
+
+    Returns:
+        csv.Dialect: The sniffed dialect; comma separated if the sample is not conclusive.
+    """
 
-        # Case 5: Stop processing if the amount is nearly zero
-        elif abs(amount) < 0.1:
-            pass
+    with open(path, newline='', encoding='utf-8', errors='replace') as file:
+        sample = file.read(sample_bytes)
 
-        # Case 6: Raise an error for unhandled scenarios
-        else:
-            raise ValueError(f'amount: $ {amount:,.2f}\n{balance.loc[i]}')
+    # Cut the sample at the last full line
+    if len(sample) == sample_bytes and '\n' in sample:
+        sample = sample[:sample.rindex('\n') + 1]
 
-    # Save the reversed collection records if required
-    if save:
-        collection.to_sql('collection', engine, index=False, if_exists='append')
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t|')
+    except csv.Error:
+        return csv.excel
 
-    return collection
+
+def _identifier_keys(values: pd.Series, type_data: TypeDataCollection) -> pd.Series:
+    """
+    Converts the identifiers of a chunk to the strings the non-streaming reader groups by.
+
+    Numeric identifiers (ID_Op, DNI, CUIL) and numeric 'ID_External' Excel cells are written
+    without decimals; other values are kept as read. Missing identifiers become 'nan'.
+    """
+
+    numbers = pd.to_numeric(values, errors='coerce')
+    integral = numbers.notna() & np.isfinite(numbers) & (numbers == np.floor(numbers))
+    if type_data == TypeDataCollection.ID_Ext:
+        # Text read from a CSV is kept as is; only numeric Excel cells are converted
+        integral &= values.map(lambda value: not isinstance(value, str))
+
+    keys = values.astype(object).where(values.notna(), 'nan').astype(str)
+    keys.loc[integral] = numbers.loc[integral].astype('int64').astype(str)
+
+    return keys
+
+
+def _accumulate(state: dict, keys: pd.Series, amounts: pd.Series) -> None:
+    """
+    Adds the amounts of a chunk to the running total of each identifier.
+
+    Uses compensated (Kahan) summation in file order, the same that `groupby().sum()` applies, so
+    the totals are identical to summing the whole file at once.
+    """
+
+    # ✅ Step 1: Give a position to the identifiers seen for the first time
+    inverse, uniques = pd.factorize(keys)
+    known = state['codes']
+    codes = np.array([known.setdefault(key, len(known)) for key in uniques], dtype=np.int64)[inverse]
+    if len(known) > len(state['sums']):
+        grow = len(known) - len(state['sums'])
+        state['sums'] = np.concatenate([state['sums'], np.zeros(grow)])
+        state['comps'] = np.concatenate([state['comps'], np.zeros(grow)])
+
+    values = amounts.to_numpy(dtype=float)
+
+    # ✅ Step 2: Add the n-th payment of every identifier at once, in file order
+    rank = pd.Series(codes).groupby(codes).cumcount().to_numpy()
+    sums, comps = state['sums'], state['comps']
+    for n in range(rank.max() + 1 if len(rank) else 0):
+        layer = rank == n
+        c, v = codes[layer], values[layer]
+        y = v - comps[c]
+        t = sums[c] + y
+        comp = t - sums[c] - y
+        comps[c] = np.where(np.isnan(comp), 0.0, comp)
+        sums[c] = t
+
+
+def _stream_chunks(path: str, extension: str):
+    """Yields the identifier and amount columns of a CSV or XLSX file in chunks of `_STREAM_CHUNK_ROWS` rows."""
+
+    if extension == '.csv':
+        dialect = _sniff_delimiter(path)
+        reader = pd.read_csv(
+            path, sep=dialect.delimiter, quotechar=dialect.quotechar, header=None, dtype=str,
+            engine='c', chunksize=_STREAM_CHUNK_ROWS
+        )
+        with reader:
+            for chunk in reader:
+                yield chunk
+    else:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = []
+            # The first sheet, like `pd.read_excel`
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                if all(value is None for value in row):
+                    continue
+                rows.append(row)
+                if len(rows) == _STREAM_CHUNK_ROWS:
+                    yield pd.DataFrame(rows, dtype=object)
+                    rows = []
+            if rows:
+                yield pd.DataFrame(rows, dtype=object)
+        finally:
+            workbook.close()
+
+
+def _read_collection_stream(path: str, extension: str, index: str, type_data: TypeDataCollection) -> pd.DataFrame:
+    """
+    Reads a collection file chunk by chunk, keeping only the running total of each identifier.
+
+    Memory depends on the chunk size and the number of distinct identifiers, not on the file size.
+    """
+
+    state = {'codes': {}, 'sums': np.zeros(0), 'comps': np.zeros(0)}
+
+    for chunk in _stream_chunks(path, extension):
+        if chunk.shape[1] != 2:
+            raise ValueError(f"❌ Expected 2 columns (identifier and amount), found {chunk.shape[1]}.")
+
+        amounts = pd.to_numeric(chunk[1], errors='coerce')
+        valid = amounts.notna()
+        _accumulate(state, _identifier_keys(chunk.loc[valid, 0], type_data), amounts.loc[valid])
+
+    # ✅ Sorted by identifier, like the grouped output of the non-streaming reader
+    keys = np.array(list(state['codes']), dtype=object)
+    order = np.argsort(keys, kind='stable')
+
+    return pd.DataFrame({index: keys[order], 'Amount': state['sums'][order]})
 
 
 def read_collection_file(
         path: str,
-        type_data: TypeDataCollection) -> pd.DataFrame:
+        type_data: TypeDataCollection,
+        stream: bool = None) -> pd.DataFrame:
     """
     Reads a collection file (CSV or Excel) and processes the data based on the provided type.
 
+    In streaming mode the CSV delimiter is sniffed on the first lines, CSV files are read with the
+    C engine in chunks and XLSX files row by row (openpyxl read-only), adding up the amounts of each
+    identifier as the chunks arrive.
+
     Args:
         path (str): The file path of the collection file to read.
         type_data (TypeDataCollection): The type of data to read (ID_Op, ID_Ext, DNI, CUIL).
+        stream (bool, optional): Read in streaming mode. Defaults to None, which streams files
+            larger than `_STREAM_MIN_BYTES`.
 
     Returns:
         pd.DataFrame: A DataFrame grouped by the identifier with the summed 'Amount' values.
@@ -815,6 +1048,15 @@ def read_collection_file(
     _, extension = os.path.splitext(path)
     extension = extension.lower()
 
+    if extension not in ['.csv', '.xlsx']:
+        raise ValueError(f"❌ Unsupported file type: '{extension}'. Only CSV and Excel files are allowed.")
+
+    # ✅ Large files are aggregated chunk by chunk
+    if stream is None:
+        stream = os.path.getsize(path) > _STREAM_MIN_BYTES
+    if stream:
+        return _read_collection_stream(path, extension, index, type_data)
+
     # ✅ Read the file based on its extension
     if extension == '.csv':
         df = pd.read_csv(path, sep=None, engine='python', header=None)  # Auto-detect delimiter
@@ -845,129 +1087,778 @@ def read_collection_file(
     return df
 
 
-def massive_collection(
-        path: str,
-        id_supplier: int,
-        type_data: TypeDataCollection,
-        date: pd.Timestamp = pd.Timestamp.now(),
-        save: bool = False):
-    
-    '''
-    Description:
-        Processes a file containing financial records, groups the data
-        by a specific type of identifier, and generates a summarized 
-        collection report by interacting with the `charging` function.
+# Columns of the rows written to the 'collection' table
+COLLECTION_COLUMNS = ['ID_Inst', 'D_Emission', 'Type_Collection', 'Capital', 'Interest', 'IVA', 'Total']
 
-    Parameters:
-        path (str): 
-            The file path to the input data file (.csv or .xlsx).
-        id_supplier (int): 
-            The identifier of the supplier.
-        type_data (TypeDataCollection): 
-            The type of data used to group records. It could be one of:
-            - TypeDataCollection.ID_Op
-            - TypeDataCollection.ID_Ext
-            - TypeDataCollection.DNI
-            - TypeDataCollection.CUIL
-        date (pd.Timestamp, optional): 
-            The date for the collection process (default is current date).
-        save (bool, optional): 
-            Flag to determine whether to save results (default is False).
+# Columns of the rows written to the 'installments' table (the ID comes from a block reserved at write time)
+INSTALLMENT_COLUMNS = ['ID_Op', 'Nro_Inst', 'D_Due', 'Capital', 'Interest', 'IVA', 'Total', 'ID_Owner']
 
-    Returns:
-        tuple:
-            - df (pd.DataFrame): The grouped and summarized input data.
-            - collection (pd.DataFrame): The collection report.
+# Payments each worker process must get at least; smaller files are charged in the calling process
+_PARALLEL_MIN_PAYMENTS = 5000
 
-    Raises:
-        FileNotFoundError: If the file does not exist at the specified path.
-        ValueError: If the file type is unsupported or type_data is invalid.
-    '''
 
-    df = read_collection_file(path, type_data)
+def load_collection_snapshot() -> dict:
+    """
+    Loads once the tables the batch collection engine needs to resolve identifiers.
 
-    # Initialize empty lists to collect the DataFrame results
-    collection_list = []
-    penalty_list = []
-    inst_list = []
+    The balance is not part of the snapshot: `batch_charging` reads it afterwards, only for the
+    credits of the identifiers in the file.
 
-    # Initialize error DataFrame
-    error = pd.DataFrame(columns=['Amount'])
-    error.index.name = df.index.name
+    Returns:
+        dict: 'credits', 'customers', 'business_plan' and 'portfolio_purchases' DataFrames, plus
+        'max_inst_id' and 'max_credit_id' (the highest IDs before posting).
+    """
 
-    # Iterate over each group in the DataFrame
-    for i in df.index:
-        print(f"Processing ID: {i}")  # Debugging output to track progress
+    snapshot = {
+        'credits': pd.read_sql('credits', engine, index_col='ID'),
+        'customers': pd.read_sql("SELECT ID, CUIL, DNI FROM customers", engine, index_col='ID'),
+        'business_plan': pd.read_sql("SELECT ID, ID_Company FROM business_plan", engine, index_col='ID'),
+        'portfolio_purchases': pd.read_sql("SELECT ID, Resource FROM portfolio_purchases", engine, index_col='ID'),
+    }
 
-        # Call the charging function to process each group
-        try:
-            result = charging(type_data, i, df.loc[i, 'Amount'], id_supplier, date)
-            new_penalty = result[1]
-            new_inst    = result[2]
-            collection  = result[0]
-                    
-            # Append valid results to the corresponding lists
-            if collection is not None and not collection.empty:
-                collection_list.append(collection)
-
-            if new_penalty is not None and not new_penalty.empty:
-                penalty_list.append(new_penalty)
-
-            if new_inst is not None and not new_inst.empty:
-                inst_list.append(new_inst)
-
-        except IdentifierError or ResourceError:
-            # In case of an error, log the Amount in the error DataFrame
-            error.loc[i] = {'Amount': df.loc[i, 'Amount']}
-            continue
+    max_ids = pd.read_sql(
+        "SELECT (SELECT MAX(ID) FROM installments) AS Installments, (SELECT MAX(ID) FROM credits) AS Credits", engine
+    ).iloc[0]
+    snapshot['max_inst_id'] = 0 if pd.isna(max_ids['Installments']) else int(max_ids['Installments'])
+    snapshot['max_credit_id'] = 0 if pd.isna(max_ids['Credits']) else int(max_ids['Credits'])
 
-    # Convert the lists into DataFrames after the loop
-    collection = pd.concat(collection_list, ignore_index=True) if collection_list else pd.DataFrame(columns=['ID_Inst', 'D_Emission', 'Type_Collection', 'Capital', 'Interest', 'IVA', 'Total'])
-    penalty = pd.concat(penalty_list, ignore_index=True) if penalty_list else pd.DataFrame()
-    inst = pd.concat(inst_list, ignore_index=True) if inst_list else pd.DataFrame()
-    if not inst.empty:
-        new_penalty = collection.loc[collection['Type_Collection'] == 'PENALTY', 'ID_Inst'].copy()
-        collection.loc[collection['Type_Collection'] == 'PENALTY', 'ID_Inst'] = [new_penalty.max() + i for i in range(len(new_penalty))]
-        inst['ID_Op'] = [pd.read_sql('credits', engine, index_col='ID').index.max() + i + 1 for i in range(len(inst))]
+    return snapshot
 
-    # Set index names after creation
-    collection.index.name = 'ID'
-    penalty.index.name = 'ID'
-    inst.index.name = 'ID'
 
-    if save:
-        try:
-            if (penalty.empty) and (inst.empty):
-                collection.to_sql('collection', engine, index=False, if_exists='append')
-            else:
-                penalty.to_sql('credits', engine, index=False, if_exists='append')
-                inst.to_sql('installments', engine, index=False, if_exists='append')
-                collection.to_sql('collection', engine, index=False, if_exists='append')
+def _normalize_identifier(value, type_data: TypeDataCollection):
+    """
+    Converts an identifier read from a file to the type stored in the database.
 
-        except IntegrityError:
-            print(f"IntegrityError.\n Check the error Dataframe.")
-            return df, collection, error, penalty, inst
+    'ID_External' is a VARCHAR column, so it stays a string; the other identifiers are integers.
+    """
 
+    if type_data == TypeDataCollection.ID_Ext:
+        return str(value).strip()
 
-    # Return the grouped input data and the final collection report
-    return df, collection, error, penalty, inst
+    return int(float(value))
 
 
-def massive_early_collection(
-        path: str,
-        id_supplier: int,
-        type_data: TypeDataCollection,
-        date: pd.Timestamp = pd.Timestamp.now(),
-        save: bool = False):
+def _resolve_identifiers(identifiers: pd.Series, type_data: TypeDataCollection, id_supplier: int, snapshot: dict,
+                         recourse: bool = False):
     """
-    Processes a file for massive early collections and updates related data structures.
+    Maps every identifier of a file to the credits a payment is applied to.
+
+    Applies the same checks as `TypeDataCollection.validate`, `_get_credits_by_identifier` and
+    `filter_credits_with_resources`, but on the snapshot, so no query is run per identifier.
 
     Args:
-        path (str): Path to the input file containing collection data.
-        id_supplier (int): ID of the supplier associated with the collections.
-        type_data (TypeDataCollection): Type of data used to process the collections (e.g., ID_Op, ID_Ext, DNI, CUIL).
+        identifiers (pd.Series): Identifiers indexed by their position in the file.
+        type_data (TypeDataCollection): Type of the identifiers.
+        id_supplier (int): Supplier ID used to filter the credits of DNI/CUIL identifiers.
+        snapshot (dict): Snapshot returned by `load_collection_snapshot`.
+        recourse (bool, optional): If True, keeps the credits bought with recourse (used by reversals).
+
+    Returns:
+        tuple:
+            - pd.DataFrame: One row per (position, credit) with 'Pos', 'ID_Op' and 'ID_Client'.
+            - pd.Series: Error message of every identifier that cannot be charged, indexed by position.
+    """
+
+    credits = snapshot['credits']
+    customers = snapshot['customers']
+    bp = snapshot['business_plan']
+
+    # ✅ Step 1: Precompute the lookups once
+    resource = credits['ID_Purch'].map(snapshot['portfolio_purchases']['Resource']).fillna(0)
+
+    if type_data in [TypeDataCollection.DNI, TypeDataCollection.CUIL]:
+        # The first customer with the document, like `_get_customer_id`
+        first_customer = customers.reset_index().drop_duplicates(type_data.value).set_index(type_data.value)['ID']
+        eligible = credits
+        if id_supplier:
+            eligible = credits.loc[credits['ID_BP'].isin(bp.loc[bp['ID_Company'] == id_supplier].index)]
+        by_customer = eligible.groupby('ID_Client').groups
+    elif type_data == TypeDataCollection.ID_Ext:
+        by_external = credits.groupby(credits['ID_External'].astype(str)).groups
+
+    # ✅ Step 2: Resolve each identifier to its credits
+    assigned, errors = [], {}
+
+    for pos, value in identifiers.items():
+        try:
+            key = _normalize_identifier(value, type_data)
+        except (TypeError, ValueError):
+            errors[pos] = f"Invalid {type_data.name}: {value}."
+            continue
+
+        if type_data == TypeDataCollection.CUIL and len(str(key)) != 11:
+            errors[pos] = "CUIL debe tener exactamente 11 dígitos."
+        elif type_data == TypeDataCollection.DNI and len(str(key).rjust(8, "0")) != 8:
+            errors[pos] = "DNI debe tener exactamente 8 dígitos."
+        elif type_data in [TypeDataCollection.DNI, TypeDataCollection.CUIL] and key not in first_customer.index:
+            errors[pos] = f"El cliente con {type_data.name} {key} no esta en la base de datos."
+        elif type_data == TypeDataCollection.ID_Op and key not in credits.index:
+            errors[pos] = f"{key} no es un crédito de la base de datos"
+        elif type_data == TypeDataCollection.ID_Ext and key not in by_external:
+            errors[pos] = f"{key} no es un crédito de la base de datos"
+        if pos in errors:
+            continue
+
+        if type_data in [TypeDataCollection.DNI, TypeDataCollection.CUIL]:
+            id_credits = list(by_customer.get(first_customer[key], []))
+            if not id_credits:
+                errors[pos] = str(IdentifierError(type_data, key))
+                continue
+        elif type_data == TypeDataCollection.ID_Op:
+            id_credits = [key]
+        else:
+            id_credits = list(by_external[key])
+
+        # Credits bought with recourse are collected through `resource_collection`
+        if not recourse:
+            id_credits = [cid for cid in id_credits if resource[cid] != 1]
+        if not id_credits:
+            errors[pos] = str(ResourceError(type_data, key))
+            continue
+
+        assigned.extend((pos, cid) for cid in id_credits)
+
+    # ✅ Step 3: Attach the customer of each credit
+    assigned = pd.DataFrame(assigned, columns=['Pos', 'ID_Op'])
+    assigned['ID_Client'] = credits.loc[assigned['ID_Op'], 'ID_Client'].values
+
+    return assigned, pd.Series(errors, dtype=object)
+
+
+def _sequential_sums(df: pd.DataFrame, column: str) -> pd.Series:
+    """
+    Sums `column` for each contiguous block of 'Pos' with `numpy.sum`.
+
+    This is the summation `Series.sum` uses, so the totals are identical (bit for bit) to the ones
+    `charging` computes for a single identifier; a grouped sum would add them in another order.
+    """
+
+    if df.empty:
+        return pd.Series(dtype=float)
+
+    keys = df['Pos'].to_numpy()
+    values = df[column].to_numpy(dtype=float)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+
+    return pd.Series([values[s:e].sum() for s, e in zip(starts, ends)], index=keys[starts])
+
+
+def _sequential_cumsum(df: pd.DataFrame, column: str) -> np.ndarray:
+    """
+    Accumulates `column` within each contiguous block of 'Pos', adding in row order.
+
+    The blocks are laid out as the rows of a zero-padded matrix and accumulated along them, which
+    adds the values exactly like `Series.cumsum` does for a single identifier. A grouped cumsum
+    uses compensated summation and can differ in the last digit, which matters when comparing
+    the accumulated total against the paid amount.
+    """
+
+    if df.empty:
+        return np.zeros(0)
+
+    groups = pd.factorize(df['Pos'])[0]
+    steps = df.groupby('Pos', sort=False).cumcount().to_numpy()
+
+    matrix = np.zeros((groups.max() + 1, steps.max() + 1))
+    matrix[groups, steps] = df[column].to_numpy(dtype=float)
+
+    return np.cumsum(matrix, axis=1)[groups, steps]
+
+
+def _charge_partition(amounts: pd.Series, assigned: pd.DataFrame, balance: pd.DataFrame, date: pd.Timestamp):
+    """
+    Applies the `charging` rules to the payments of one partition.
+
+    Runs without database access, so it can run on a worker process. The PENALTY rows point to
+    installment 0: the IDs are assigned when the partitions are merged.
+
+    Args:
+        amounts (pd.Series): Paid amount of each payment, indexed by its position in the file.
+        assigned (pd.DataFrame): 'Pos' and 'ID_Op' of the credits each payment is applied to.
+        balance (pd.DataFrame): Balance of the involved credits, indexed by installment ID.
+        date (pd.Timestamp): Collection date.
+
+    Returns:
+        tuple:
+            - pd.DataFrame: Collection rows with 'Pos', 'Step' and 'Seq' to merge them in order.
+            - pd.Series: Amount left for a penalty, indexed by the position of the payment.
+            - pd.Series: Error message of the payments that could not be charged.
+    """
+
+    numeric_cols = ['Capital', 'Interest', 'IVA', 'Total']
+    valid = pd.Index(assigned['Pos'].unique()).sort_values()
+
+    # ✅ Step 1: Lay out the balance of each payment in charging order
+    rows = assigned[['Pos', 'ID_Op']].merge(balance.reset_index(), on='ID_Op', how='inner')
+    rows = rows.sort_values(['Pos', 'D_Due', 'ID_Op', 'Nro_Inst'], kind='stable').reset_index(drop=True)
+    rows['Amount'] = amounts.loc[rows['Pos']].values
+    rows['Accumulated'] = _sequential_cumsum(rows, 'Total')
+
+    # ✅ Step 2: COMUN - installments whose accumulated total fits in the payment
+    comun = rows['Accumulated'] <= rows['Amount']
+    remaining = amounts.loc[valid] - _sequential_sums(rows.loc[comun], 'Total').reindex(valid, fill_value=0.0)
+
+    # ✅ Step 3: ANTICIPADA - the rest goes to the first installment not fully collected
+    first = rows.loc[~comun & rows['Pos'].isin(remaining.index[remaining > 0.0])]
+    first = first.groupby('Pos', sort=False).head(1).set_index('Pos')
+    paid = remaining.loc[first.index].values
+    due = (first['Interest'] + first['IVA']).values
+
+    interest = np.where(due >= paid, paid / 1.21, first['Interest'].values)
+    iva = np.where(due >= paid, paid / 1.21 * 0.21, first['IVA'].values)
+    capital = np.where(due < paid, paid - (interest + iva), 0.0)
+    total = capital + interest + iva
+
+    early = pd.DataFrame({
+        'Pos': first.index,
+        'ID_Inst': first['ID'].values,
+        'Type_Collection': np.where(first['Total'].values - total > 0.1, 'ANTICIPADA', 'COMÚN'),
+        'Capital': np.where(capital > 0, capital, 0.0),
+        'Interest': np.where(interest > 0, interest, 0.0),
+        'IVA': np.where(iva > 0.0, iva, 0.0),
+        'Total': np.where(total > 0, total, 0.0),
+    })
+    remaining.loc[first.index] = paid - early['Total'].values
+
+    # ✅ Step 4: PENALTY - what is left over becomes a penalty
+    left = remaining.loc[remaining > 0.009]
+
+    penalty_rows = pd.DataFrame({
+        'Pos': left.index,
+        'ID_Inst': 0,
+        'Type_Collection': 'PENALTY',
+        'Capital': 0.0,
+        'Interest': left.values / 1.21,
+        'IVA': left.values / 1.21 * 0.21,
+        'Total': left.values,
+    })
+
+    # ✅ Step 5: Merge the rows per identifier, drop empty ones and round them
+    comun_rows = rows.loc[comun, ['Pos', 'ID'] + numeric_cols].rename(columns={'ID': 'ID_Inst'})
+    comun_rows['Type_Collection'] = 'COMUN'
+
+    collection = pd.concat([
+        comun_rows.assign(Step=0, Seq=np.arange(len(comun_rows))),
+        early.assign(Step=1, Seq=0),
+        penalty_rows.assign(Step=2, Seq=0)
+    ], ignore_index=True)
+    collection = collection.loc[collection['Total'] != 0].copy()
+    collection[numeric_cols] = collection[numeric_cols].round(2)
+
+    # ✅ Step 6: REDONDEO - settle the cents left on the installments that were just collected
+    touched = rows.merge(collection.loc[collection['Step'] < 2, ['Pos', 'ID_Inst'] + numeric_cols],
+                         left_on=['Pos', 'ID'], right_on=['Pos', 'ID_Inst'], suffixes=('', '_Collected'))
+    for col in numeric_cols:
+        touched[col] = touched[col] - touched[f'{col}_Collected']
+    rounding = touched.loc[(touched['Total'] != 0.0) & (touched['Total'] < 0.1)]
+
+    collection = pd.concat([
+        collection,
+        rounding[['Pos', 'ID_Inst'] + numeric_cols].assign(Type_Collection='REDONDEO', Step=3, Seq=rounding.index)
+    ], ignore_index=True)
+
+    return collection, left, pd.Series(dtype=object)
+
+
+def _early_cancel_partition(amounts: pd.Series, assigned: pd.DataFrame, balance: pd.DataFrame, date: pd.Timestamp):
+    """
+    Applies the `collection_w_early_cancel` rules to the payments of one partition.
+
+    Each payment runs `_early_cancel` on its own slice of the balance; a payment that fails is
+    reported with its error instead of stopping the partition.
+
+    Args:
+        amounts (pd.Series): Paid amount of each payment, indexed by its position in the file.
+        assigned (pd.DataFrame): 'Pos' and 'ID_Op' of the credits each payment is applied to.
+        balance (pd.DataFrame): Balance of the involved credits, indexed by installment ID.
+        date (pd.Timestamp): Collection date.
+
+    Returns:
+        tuple: Same as `_charge_partition`.
+    """
+
+    collection_list, left, errors = [], {}, {}
+
+    for pos, id_credits in assigned.groupby('Pos')['ID_Op']:
+        try:
+            # ✅ Same balance `_prepare_balance` reads for these credits
+            df = balance.loc[balance['ID_Op'].isin(id_credits)].sort_values(by=['D_Due', 'ID_Op', 'Nro_Inst'])
+            df['Accumulated'] = df['Total'].cumsum()
+
+            collection, amount = _early_cancel(df, amounts[pos], date)
+        except Exception as e:
+            errors[pos] = str(e)
+            continue
+
+        if amount > 0.009:
+            left[pos] = amount
+        collection_list.append(collection.assign(Pos=pos, Step=0, Seq=np.arange(len(collection))))
+
+    collection = pd.concat(collection_list, ignore_index=True) if collection_list else pd.DataFrame(columns=COLLECTION_COLUMNS + ['Pos', 'Step', 'Seq'])
+
+    return collection.drop(columns='D_Emission'), pd.Series(left, dtype=float), pd.Series(errors, dtype=object)
+
+
+def _reversal_balance(id_credits) -> pd.DataFrame:
+    """
+    Reads the installments of the given credits with their amounts and what is outstanding on them.
+
+    Args:
+        id_credits (list): Credit IDs.
+
+    Returns:
+        pd.DataFrame: 'ID_Op', 'Nro_Inst', 'D_Due', the amounts of each installment and the outstanding
+        ones (with a '_Balance' suffix), indexed by installment ID.
+    """
+
+    numeric_cols = ['Capital', 'Interest', 'IVA', 'Total']
+    id_credits = sorted({int(id_credit) for id_credit in id_credits})
+
+    installments = pd.read_sql(
+        text("SELECT ID, ID_Op, Nro_Inst, D_Due, Capital, Interest, IVA, Total FROM installments WHERE ID_Op IN :ids")
+        .bindparams(bindparam('ids', expanding=True)),
+        engine, params={'ids': id_credits or [0]}, index_col='ID', parse_dates=['D_Due']
+    )
+    installments[numeric_cols] = installments[numeric_cols].astype(float)
+
+    balance = credits_balance(id_credits=id_credits or [0], columns=numeric_cols)
+
+    return installments.join(balance[numeric_cols].astype(float), rsuffix='_Balance', how='inner')
+
+
+def _reverse_partition(amounts: pd.Series, assigned: pd.DataFrame, installments: pd.DataFrame, date: pd.Timestamp):
+    """
+    Applies the `reverse` rules to a batch of reversals at once.
+
+    Args:
+        amounts (pd.Series): Amount to reverse of each payment, indexed by its position in the file.
+        assigned (pd.DataFrame): 'Pos' and 'ID_Op' of the credits each reversal applies to.
+        installments (pd.DataFrame): Installments of the involved credits, as returned by `_reversal_balance`.
+        date (pd.Timestamp): Reversal date.
+
+    Returns:
+        tuple: Same as `_charge_partition` (nothing is ever left for a penalty).
+    """
+
+    numeric_cols = ['Capital', 'Interest', 'IVA', 'Total']
+
+    # ✅ Step 1: Lay out the installments of each reversal, latest due first, skipping the ones without collections
+    rows = assigned[['Pos', 'ID_Op']].merge(installments.reset_index(), on='ID_Op', how='inner')
+    rows = rows.sort_values(['Pos', 'D_Due', 'ID_Op', 'Nro_Inst'], ascending=[True, False, False, False], kind='stable')
+    rows = rows.loc[rows['Total_Balance'] != rows['Total']].reset_index(drop=True)
+
+    # A fully collected installment is reversed with its own amounts; otherwise, what was collected
+    settled = rows['Total_Balance'] == 0.0
+    for col in numeric_cols:
+        rows[f'{col}_Paid'] = np.where(settled, rows[col], rows[col] - rows[f'{col}_Balance'])
+    rows['Amount'] = amounts.loc[rows['Pos']].values
+
+    # ✅ Step 2: Reverse in full while the amount covers the installment (10 cents short for settled ones)
+    after = (rows['Amount'] - _sequential_cumsum(rows, 'Total_Paid')).round(2)
+    before = (after + rows['Total_Paid']).round(2)
+    regular = (rows['Total_Balance'] >= 0.0) & (rows['Total_Balance'] < rows['Total'])
+
+    fits = regular & (after >= np.where(settled, -0.1, 0.0))
+    full = fits.astype(int).groupby(rows['Pos']).cummin().astype(bool)
+
+    # ✅ Step 3: The first installment not covered takes what is left: capital first, then interest and IVA
+    stop = ~full & full.groupby(rows['Pos']).shift(1, fill_value=True) & (before >= 0.1)
+    partial = rows.loc[stop & regular]
+
+    capital = np.minimum(partial['Capital_Paid'], before.loc[partial.index])
+    rest = before.loc[partial.index] - capital
+
+    # ✅ Step 4: Installments that cannot be reversed stop their whole reversal
+    invalid = rows.loc[stop & ~regular]
+    errors = pd.Series(
+        [f"amount: $ {before[i]:,.2f} cannot be reversed on installment {rows.loc[i, 'ID']} "
+         f"(balance $ {rows.loc[i, 'Total_Balance']:,.2f} of $ {rows.loc[i, 'Total']:,.2f})." for i in invalid.index],
+        index=invalid['Pos'].values, dtype=object
+    )
+
+    # ✅ Step 5: Build the REVERSA rows in installment order
+    collection = pd.concat([
+        pd.DataFrame({'Pos': rows.loc[full, 'Pos'], 'ID_Inst': rows.loc[full, 'ID'],
+                      **{col: -rows.loc[full, f'{col}_Paid'] for col in numeric_cols}}),
+        pd.DataFrame({'Pos': partial['Pos'], 'ID_Inst': partial['ID'], 'Capital': -capital,
+                      'Interest': -rest / 1.21, 'IVA': -rest / 1.21 * 0.21, 'Total': -(capital + rest)})
+    ]).sort_index(kind='stable')
+
+    collection = collection.loc[~collection['Pos'].isin(errors.index)]
+    collection = collection.assign(Type_Collection='REVERSA', Step=0, Seq=collection.index)
+    collection[numeric_cols] = collection[numeric_cols].astype(float).round(2)
+    collection = collection.loc[collection['Total'] != 0].reset_index(drop=True)
+
+    return collection, pd.Series(dtype=float), errors
+
+
+# Balance each worker process receives once, through the pool initializer
+_worker_balance = None
+
+
+def _init_batch_worker(balance: pd.DataFrame) -> None:
+    """Stores the read-only balance snapshot in the worker process."""
+
+    global _worker_balance
+    _worker_balance = balance
+
+
+def _run_partition(task: tuple):
+    """Runs a partition function on a worker process, over the balance stored by `_init_batch_worker`."""
+
+    partition, amounts, assigned, date = task
+    return partition(amounts, assigned, _worker_balance, date)
+
+
+def _batch_collect(payments: pd.DataFrame, type_data: TypeDataCollection, id_supplier: int,
+                   date: pd.Timestamp, snapshot: dict, workers: int, partition):
+    """
+    Resolves the payments of a file, charges them by customer partitions and merges the results.
+
+    Workers never see the database nor assign IDs: the penalty installments and credits are
+    numbered after all partitions finish, in the order of the payments in the file, so the output
+    does not depend on the number of workers.
+
+    Args:
+        payments (pd.DataFrame): Identifiers in the first column and the paid 'Amount'.
+        type_data (TypeDataCollection): Type of the identifiers.
+        id_supplier (int): Supplier ID used to filter the credits of DNI/CUIL identifiers.
+        date (pd.Timestamp): Collection date.
+        snapshot (dict): Snapshot returned by `load_collection_snapshot`, or None to load it.
+        workers (int): Number of worker processes, or None to use every core.
+        partition (callable): `_charge_partition` or `_early_cancel_partition`.
+
+    Returns:
+        tuple: (collection, error, penalty, inst), like `batch_charging`.
+    """
+
+    if snapshot is None:
+        snapshot = load_collection_snapshot()
+
+    amounts = payments['Amount'].astype(float)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+
+    # ✅ Step 1: Resolve identifiers; non-positive amounts are not charged
+    assigned, errors, clients = _resolve_payments(payments, type_data, id_supplier, snapshot)
+
+    # ✅ Step 2: Read the outstanding installments of the involved credits once
+    balance = credits_balance(
+        id_credits=list(assigned['ID_Op']), mode=BalanceEngine.TABLE,
+        columns=['ID_Op', 'Nro_Inst', 'D_Due', 'Capital', 'Interest', 'IVA', 'Total']
+    )
+
+    # ✅ Step 3: Partition the payments by customer (the owner of their first credit)
+    n_parts = max(1, min(workers, len(clients) // _PARALLEL_MIN_PAYMENTS))
+    parts = [assigned.loc[assigned['Pos'].isin(clients.index[clients % n_parts == k])] for k in range(n_parts)]
+
+    # ✅ Step 4: Charge the partitions, on worker processes if there is more than one
+    if n_parts == 1:
+        results = [partition(amounts, assigned, balance, date)]
+    else:
+        tasks = [(partition, amounts.loc[part['Pos'].unique()], part, date) for part in parts if not part.empty]
+        with ProcessPoolExecutor(max_workers=n_parts, initializer=_init_batch_worker, initargs=(balance,)) as pool:
+            results = list(pool.map(_run_partition, tasks))
+
+    # ✅ Step 5: Merge the partitions in file order and number the penalties
+    return _merge_results(results, payments, errors, clients, date, snapshot)
+
+
+def _resolve_payments(payments: pd.DataFrame, type_data: TypeDataCollection, id_supplier: int, snapshot: dict,
+                      recourse: bool = False):
+    """
+    Resolves the identifiers of a batch of payments and rejects the non-positive amounts.
+
+    Args:
+        payments (pd.DataFrame): Identifiers in the first column and the paid 'Amount'.
+        type_data (TypeDataCollection): Type of the identifiers.
+        id_supplier (int): Supplier ID used to filter the credits of DNI/CUIL identifiers.
+        snapshot (dict): Snapshot returned by `load_collection_snapshot`.
+        recourse (bool, optional): If True, keeps the credits bought with recourse.
+
+    Returns:
+        tuple:
+            - pd.DataFrame: 'Pos', 'ID_Op' and 'ID_Client' of the credits of each valid payment.
+            - pd.Series: Error message of the rejected payments, indexed by position.
+            - pd.Series: Customer of each valid payment (the owner of its first credit), by position.
+    """
+
+    credits = snapshot['credits']
+    amounts = payments['Amount'].astype(float)
+
+    assigned, errors = _resolve_identifiers(payments.iloc[:, 0], type_data, id_supplier, snapshot, recourse)
+    not_positive = amounts.index[amounts <= 0.0].difference(errors.index)
+    errors = pd.concat([errors, pd.Series("The amount must be positive.", index=not_positive, dtype=object)])
+    assigned = assigned.loc[~assigned['Pos'].isin(errors.index)]
+
+    clients = assigned.assign(Row=credits.index.get_indexer(assigned['ID_Op']))
+    clients = clients.sort_values('Row').drop_duplicates('Pos').set_index('Pos')['ID_Client'].sort_index()
+
+    return assigned, errors, clients
+
+
+def _merge_results(results: list, payments: pd.DataFrame, errors: pd.Series, clients: pd.Series, date, snapshot: dict):
+    """
+    Merges the output of the partition functions in the order of the payments.
+
+    The penalty installments and credits are numbered after the highest IDs of the snapshot, in
+    the order of the payments, so the result does not depend on how the payments were split.
+
+    Args:
+        results (list): Tuples returned by `_charge_partition` / `_early_cancel_partition`.
+        payments (pd.DataFrame): Identifiers in the first column and the paid 'Amount'.
+        errors (pd.Series): Errors found while resolving the payments.
+        clients (pd.Series): Customer of each valid payment, as returned by `_resolve_payments`.
+        date (pd.Timestamp | pd.Series): Collection date, or the date of each payment by position.
+        snapshot (dict): Snapshot the payments were resolved on.
+
+    Returns:
+        tuple: (collection, error, penalty, inst), like `batch_charging`.
+    """
+
+    credits = snapshot['credits']
+    identifiers = payments.iloc[:, 0]
+    amounts = payments['Amount'].astype(float)
+
+    def on(positions):
+        # Date of the payments at `positions` (the same for all if a single date was given)
+        return date.loc[positions].values if isinstance(date, pd.Series) else date
+
+    # ✅ Step 1: Concatenate the rows and errors in file order
+    collection = pd.concat([result[0] for result in results], ignore_index=True)
+    collection = collection.sort_values(['Pos', 'Step', 'Seq'], kind='stable').reset_index(drop=True)
+    left = pd.concat([result[1] for result in results]).sort_index()
+    errors = pd.concat([errors] + [result[2] for result in results if not result[2].empty]).sort_index()
+
+    error = pd.DataFrame({'Amount': amounts.loc[errors.index].values, 'Error': errors.values},
+                         index=pd.Index(identifiers.loc[errors.index].values, name=identifiers.name))
+
+    # ✅ Step 2: Number the penalty installments and credits, in file order
+    is_penalty = collection['Type_Collection'] == 'PENALTY'
+    collection.loc[is_penalty, 'ID_Inst'] = snapshot['max_inst_id'] + 1 + np.arange(is_penalty.sum())
+    collection['ID_Inst'] = collection['ID_Inst'].astype(int)
+    collection['D_Emission'] = on(collection['Pos'])
+    collection = collection[COLLECTION_COLUMNS]
+
+    penalty = pd.DataFrame(columns=credits.columns, index=range(len(left)))
+    penalty = penalty.assign(
+        ID_Client=clients.loc[left.index].values, Date_Settlement=on(left.index), ID_BP=1, Cap_Requested=0.0,
+        Cap_Grant=0.0, N_Inst=1, TEM_W_IVA=0.0, V_Inst=left.values, D_F_Due=on(left.index)
+    )
+    inst = pd.DataFrame({
+        'ID_Op': snapshot['max_credit_id'] + 1 + np.arange(len(left)),
+        'Nro_Inst': 1,
+        'D_Due': on(left.index),
+        'Capital': 0.0,
+        'Interest': left.values / 1.21,
+        'IVA': left.values / 1.21 * 0.21,
+        'Total': left.values,
+        'ID_Owner': 1
+    }, columns=INSTALLMENT_COLUMNS)
+
+    return collection, error, penalty, inst
+
+
+def batch_charging(
+        payments: pd.DataFrame,
+        type_data: TypeDataCollection,
+        id_supplier: int,
+        date: pd.Timestamp,
+        snapshot: dict = None,
+        workers: int = 1):
+    """
+    Applies `charging` to every payment of a file at once.
+
+    The snapshot and the balance of the involved credits are read once, and the COMUN, ANTICIPADA,
+    PENALTY and REDONDEO steps run for all identifiers with grouped operations. Each payment is
+    applied to the balance as it is before the file, like `massive_collection` always did, and the
+    rows are the same (values, order and types of collection) that calling `charging` for each
+    identifier and concatenating the results produces.
+
+    Args:
+        payments (pd.DataFrame): Identifiers in the first column and the paid 'Amount' (as returned
+            by `read_collection_file`).
+        type_data (TypeDataCollection): Type of the identifiers.
+        id_supplier (int): Supplier ID used to filter the credits of DNI/CUIL identifiers.
+        date (pd.Timestamp): Collection date.
+        snapshot (dict, optional): Snapshot returned by `load_collection_snapshot`. Loaded if omitted.
+        workers (int, optional): Worker processes to split the customers across (None uses every
+            core). Files under `_PARALLEL_MIN_PAYMENTS` payments per worker use fewer. Defaults to 1.
+
+    Returns:
+        tuple:
+            - pd.DataFrame: Collection rows, with the PENALTY rows pointing to the new installments.
+            - pd.DataFrame: Payments that could not be charged, with their 'Amount' and the 'Error'.
+            - pd.DataFrame: Penalty credits to insert.
+            - pd.DataFrame: Penalty installments to insert (one per penalty credit).
+    """
+
+    return _batch_collect(payments, type_data, id_supplier, date, snapshot, workers, _charge_partition)
+
+
+def batch_early_collection(
+        payments: pd.DataFrame,
+        type_data: TypeDataCollection,
+        id_supplier: int,
+        date: pd.Timestamp,
+        snapshot: dict = None,
+        workers: int = 1):
+    """
+    Applies `collection_w_early_cancel` to every payment of a file.
+
+    Like `batch_charging`, identifiers are resolved on one snapshot and the balance is read once;
+    each payment is then cancelled in memory with `_early_cancel`, which is the costly part and
+    what the worker processes share.
+
+    Args:
+        payments (pd.DataFrame): Identifiers in the first column and the paid 'Amount'.
+        type_data (TypeDataCollection): Type of the identifiers.
+        id_supplier (int): Supplier ID used to filter the credits of DNI/CUIL identifiers.
+        date (pd.Timestamp): Collection date.
+        snapshot (dict, optional): Snapshot returned by `load_collection_snapshot`. Loaded if omitted.
+        workers (int, optional): Worker processes to split the customers across (None uses every
+            core). Defaults to 1.
+
+    Returns:
+        tuple: Same as `batch_charging`.
+    """
+
+    return _batch_collect(payments, type_data, id_supplier, date, snapshot, workers, _early_cancel_partition)
+
+
+def batch_reverse(
+        payments: pd.DataFrame,
+        type_data: TypeDataCollection,
+        id_supplier: int,
+        date: pd.Timestamp,
+        snapshot: dict = None):
+    """
+    Applies `reverse` to every row of a rejected-debit file at once.
+
+    Identifiers are resolved on one snapshot, the installments and balance of the involved credits
+    are read once, and the reversal rules run for all rows with grouped operations. Each reversal
+    is applied to the balance as it is before the file.
+
+    Args:
+        payments (pd.DataFrame): Identifiers in the first column and the 'Amount' to reverse.
+        type_data (TypeDataCollection): Type of the identifiers.
+        id_supplier (int): Supplier ID used to filter the credits of DNI/CUIL identifiers.
+        date (pd.Timestamp): Reversal date.
+        snapshot (dict, optional): Snapshot returned by `load_collection_snapshot`. Loaded if omitted.
+
+    Returns:
+        tuple:
+            - pd.DataFrame: REVERSA collection rows.
+            - pd.DataFrame: Rows that could not be reversed, with their 'Amount' and the 'Error'.
+    """
+
+    if snapshot is None:
+        snapshot = load_collection_snapshot()
+
+    # ✅ Step 1: Resolve identifiers; reversals also apply to credits bought with recourse
+    assigned, errors, clients = _resolve_payments(payments, type_data, id_supplier, snapshot, recourse=True)
+
+    # ✅ Step 2: Reverse every row over one read of the installments and their balance
+    result = _reverse_partition(
+        payments['Amount'].astype(float), assigned, _reversal_balance(assigned['ID_Op']), date
+    )
+
+    collection, error, _, _ = _merge_results([result], payments, errors, clients, date, snapshot)
+
+    return collection, error
+
+
+def massive_collection(
+        path: str,
+        id_supplier: int,
+        type_data: TypeDataCollection,
+        date: pd.Timestamp = pd.Timestamp.now(),
+        save: bool = False,
+        workers: int = None):
+    
+    '''
+    Description:
+        Processes a file containing financial records, groups the data
+        by a specific type of identifier, and generates a summarized 
+        collection report applying the `charging` rules to every
+        identifier at once (see `batch_charging`).
+
+    Parameters:
+        path (str): 
+            The file path to the input data file (.csv or .xlsx).
+        id_supplier (int): 
+            The identifier of the supplier.
+        type_data (TypeDataCollection): 
+            The type of data used to group records. It could be one of:
+            - TypeDataCollection.ID_Op
+            - TypeDataCollection.ID_Ext
+            - TypeDataCollection.DNI
+            - TypeDataCollection.CUIL
+        date (pd.Timestamp, optional): 
+            The date for the collection process (default is current date).
+        save (bool, optional): 
+            Flag to determine whether to save results (default is False).
+        workers (int, optional): 
+            Worker processes used to charge the customers of large files
+            (default is None, every core of the machine).
+
+    Returns:
+        tuple:
+            - df (pd.DataFrame): The grouped and summarized input data.
+            - collection (pd.DataFrame): The collection report.
+            - error (pd.DataFrame): Identifiers that could not be charged, with the reason.
+            - penalty (pd.DataFrame): Penalty credits created for the overpayments.
+            - inst (pd.DataFrame): Installments of the penalty credits.
+
+    Raises:
+        FileNotFoundError: If the file does not exist at the specified path.
+        ValueError: If the file type is unsupported or type_data is invalid.
+    '''
+
+    df = read_collection_file(path, type_data)
+
+    # ✅ Charge every payment of the file in a single pass over one snapshot
+    collection, error, penalty, inst = batch_charging(df, type_data, id_supplier, date, workers=workers)
+    print(f"✅ {len(df) - len(error):,} payments processed, {len(error):,} sent to the error DataFrame.")
+
+    # Set index names after creation
+    collection.index.name = 'ID'
+    penalty.index.name = 'ID'
+    inst.index.name = 'ID'
+
+    if save:
+        try:
+            collection, penalty, inst = post_collections(collection, penalty, inst)
+
+        except IntegrityError:
+            print(f"IntegrityError.\n Check the error Dataframe.")
+            return df, collection, error, penalty, inst
+
+
+    # Return the grouped input data and the final collection report
+    return df, collection, error, penalty, inst
+
+
+def massive_early_collection(
+        path: str,
+        id_supplier: int,
+        type_data: TypeDataCollection,
+        date: pd.Timestamp = pd.Timestamp.now(),
+        save: bool = False,
+        workers: int = None):
+    """
+    Processes a file for massive early collections and updates related data structures.
+
+    Every payment is cancelled with the `collection_w_early_cancel` rules (see `batch_early_collection`),
+    split by customer across worker processes for large files.
+
+    Args:
+        path (str): Path to the input file containing collection data.
+        id_supplier (int): ID of the supplier associated with the collections.
+        type_data (TypeDataCollection): Type of data used to process the collections (e.g., ID_Op, ID_Ext, DNI, CUIL).
         date (pd.Timestamp, optional): The date of the collection. Defaults to the current date and time.
         save (bool, optional): If True, saves the resulting DataFrames to the database. Defaults to False.
+        workers (int, optional): Worker processes used for large files. Defaults to None (every core).
 
     Returns:
         tuple: A tuple containing:
@@ -989,53 +1880,9 @@ def massive_early_collection(
     # ✅ Read and process input file
     df = read_collection_file(path, type_data)
 
-    # ✅ Print formatted DataFrame for debugging
-    print(df.map('${:,.2f}'.format))
-
-    # ✅ Initialize empty lists for collected data
-    collection_list, penalty_list, inst_list = [], [], []
-
-    # ✅ Initialize error DataFrame
-    error = pd.DataFrame(columns=['Amount'])
-    error.index.name = df.index.name
-
-    # ✅ Load `credits` once to avoid redundant queries in loop
-    credits = pd.read_sql('credits', engine, index_col='ID')
-
-    # ✅ Process early collections for each record
-    for i in df.index:
-        try:
-            collections, penalties, installments = collection_w_early_cancel(
-                type_data, i, df.at[i, 'Amount'], id_supplier, date
-            )
-
-            # Append results if they contain data
-            if not collections.empty:
-                collection_list.append(collections)
-            if not penalties.empty:
-                penalty_list.append(penalties)
-            if not installments.empty:
-                inst_list.append(installments)
-
-        except IdentifierError:
-            error.at[i, 'Amount'] = df.at[i, 'Amount']
-
-    # ✅ Combine collected DataFrames
-    collections = pd.concat(collection_list, ignore_index=True) if collection_list else pd.DataFrame()
-    penalties = pd.concat(penalty_list, ignore_index=True) if penalty_list else pd.DataFrame()
-    installments = pd.concat(inst_list, ignore_index=True) if inst_list else pd.DataFrame()
-
-    # ✅ Ensure valid IDs for installments and penalties
-    if not installments.empty:
-        new_penalty_ids = collections.query("Type_Collection == 'PENALTY'")['ID_Inst'].copy()
-        if not new_penalty_ids.empty:
-            collections.loc[new_penalty_ids.index, 'ID_Inst'] = range(
-                new_penalty_ids.max() + 1, new_penalty_ids.max() + 1 + len(new_penalty_ids)
-            )
-
-        # ✅ Assign new credit IDs to installments
-        last_credit_id = credits.index.max() if not credits.empty else 0
-        installments['ID_Op'] = range(last_credit_id + 1, last_credit_id + 1 + len(installments))
+    # ✅ Cancel every payment over one snapshot; penalty IDs are assigned after the workers finish
+    collections, error, penalties, installments = batch_early_collection(df, type_data, id_supplier, date, workers=workers)
+    print(f"✅ {len(df) - len(error):,} payments processed, {len(error):,} sent to the error DataFrame.")
 
     # ✅ Set index names for consistency
     collections.index.name, penalties.index.name, installments.index.name = 'ID', 'ID', 'ID'
@@ -1053,24 +1900,68 @@ def massive_early_collection(
     # ✅ Save data to the database if required
     if save:
         try:
-            if penalties.empty and installments.empty:
-                collections.to_sql('collection', engine, index=False, if_exists='append')
-            else:
-                penalties.to_sql('credits', engine, index=False, if_exists='append')
-                installments.to_sql('installments', engine, index=False, if_exists='append')
-                collections.to_sql('collection', engine, index=False, if_exists='append')
+            collections, penalties, installments = post_collections(collections, penalties, installments)
 
         except IntegrityError as e:
             print(f"⚠️ IntegrityError: {e}\nCheck the error DataFrame.")
-            return df, collections, error, penalties, installments
+            return collections, penalties, installments, error
 
     # ✅ Return processed DataFrames
     return collections, penalties, installments, error
 
 
+def massive_reverse(
+        path: str,
+        id_supplier: int,
+        type_data: TypeDataCollection,
+        date: pd.Timestamp = pd.Timestamp.now(),
+        save: bool = False):
+    """
+    Reverses the collections of a rejected-debit file in one pass (see `batch_reverse`).
+
+    Args:
+        path (str): Path to the input file (.csv or .xlsx) with the identifiers and the amounts to reverse.
+        id_supplier (int): ID of the supplier associated with the collections.
+        type_data (TypeDataCollection): Type of the identifiers (e.g., ID_Op, ID_Ext, DNI, CUIL).
+        date (pd.Timestamp, optional): The date of the reversal. Defaults to the current date and time.
+        save (bool, optional): If True, saves the reversal rows to the database. Defaults to False.
+
+    Returns:
+        tuple:
+            - df (pd.DataFrame): The grouped and summarized input data.
+            - collection (pd.DataFrame): The REVERSA collection rows.
+            - error (pd.DataFrame): Identifiers that could not be reversed, with the reason.
+
+    Raises:
+        FileNotFoundError: If the specified input file is not found.
+        ValueError: If the file type is unsupported or type_data is invalid.
+    """
+
+    # ✅ Validate file existence
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File '{path}' not found. Please check the path and try again.")
+
+    df = read_collection_file(path, type_data)
+
+    # ✅ Reverse every row of the file over one snapshot
+    collection, error = batch_reverse(df, type_data, id_supplier, date)
+    print(f"✅ {len(df) - len(error):,} reversals processed, {len(error):,} sent to the error DataFrame.")
+
+    collection.index.name = 'ID'
+
+    if save:
+        try:
+            collection, _, _ = post_collections(collection)
+
+        except IntegrityError as e:
+            print(f"⚠️ IntegrityError: {e}\nCheck the error DataFrame.")
+
+    return df, collection, error
+
+
 def calculate_accumulated_balance(id_supplier: int, date: pd.Timestamp) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
-    Calculates the accumulated balance of credits with resource type for a supplier up to a given date.
+    Calculates the accumulated balance of the credits bought with recourse from a supplier, due up to a given date.
 
     Parameters:
         id_supplier (int): The ID of the supplier company.
@@ -1078,7 +1969,7 @@ def calculate_accumulated_balance(id_supplier: int, date: pd.Timestamp) -> tuple
 
     Returns:
         tuple: 
-            - pd.DataFrame: Filtered balance DataFrame containing credit balances.
+            - pd.DataFrame: Outstanding installment balances due up to the given date.
             - pd.DataFrame: DataFrame with daily total balance and accumulated balance up to the given date.
     """
 
@@ -1090,20 +1981,20 @@ def calculate_accumulated_balance(id_supplier: int, date: pd.Timestamp) -> tuple
 
     advance = companies.at[id_supplier, 'Advance']
 
-    # ✅ Fetch credit balance and related tables
-    balance = credits_balance()  # Assumes this function fetches balance data
+    # ✅ Fetch the related tables
     credits = pd.read_sql('credits', engine, index_col='ID')
     pp = pd.read_sql('portfolio_purchases', engine, index_col='ID')
 
-    # ✅ Filter credits with resource type and due date before the cutoff date
-    resource_credits = credits.query("ID_Purch in @pp.query('Resource == 1').index").index
+    # ✅ Filter the credits bought with recourse from the supplier
+    recourse_purchases = pp.index[(pp['Resource'] == 1) & (pp['ID_Company'] == id_supplier)]
+    resource_credits = credits.index[credits['ID_Purch'].isin(recourse_purchases)]
+
+    # ✅ Fetch only their outstanding installments due up to the cutoff date (filtered in the database)
+    balance = credits_balance(id_credits=list(resource_credits), due_until=date, mode=BalanceEngine.TABLE)
 
     if resource_credits.empty:
         return balance.iloc[0:0].copy(), pd.DataFrame(columns=['Total', 'Accumulated'])
 
-    # ✅ Apply filtering to balance DataFrame
-    balance = balance.query("ID_Op in @resource_credits and D_Due <= @date").copy()
-
     if balance.empty:
         return balance, pd.DataFrame(columns=['Total', 'Accumulated'])
 
@@ -1119,27 +2010,164 @@ def calculate_accumulated_balance(id_supplier: int, date: pd.Timestamp) -> tuple
     return balance, balance_acum
 
 
+def _recourse_credits(suppliers: list) -> pd.Series:
+    """
+    Finds the credits bought with recourse from the given suppliers.
+
+    Returns:
+        pd.Series: Supplier ('ID_Company' of the purchase) of each credit, indexed by credit ID.
+    """
+
+    df = pd.read_sql(
+        text("""
+            SELECT c.ID, p.ID_Company
+            FROM credits c
+            JOIN portfolio_purchases p ON p.ID = c.ID_Purch
+            WHERE p.Resource = 1 AND p.ID_Company IN :suppliers
+        """).bindparams(bindparam('suppliers', expanding=True)),
+        engine, params={'suppliers': [int(supplier) for supplier in suppliers] or [0]}, index_col='ID'
+    )
+
+    return df['ID_Company'].astype(int)
+
+
+def batch_resource_collection(events, save: bool = False) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Applies `resource_collection` to a list of recourse payments, for any number of suppliers and dates.
+
+    The balance of the recourse credits is read once and the events of each supplier are applied in
+    date order, as if `resource_collection` had been called (and saved) for each of them: the amount
+    plus the supplier's advance settles the installments due up to the event date, in installment
+    order, and what is left becomes the new advance. Installments with nothing outstanding are skipped.
+    With `save`, every RECURSO row and the final advance of each supplier are written in one transaction.
+
+    Parameters:
+        events (pd.DataFrame | list): 'ID_Supplier', 'Amount' and 'Date' of each payment, or a list of
+            (supplier, amount, date) tuples.
+        save (bool): Whether to save the collections and the advances to the database.
+
+    Returns:
+        tuple:
+            - pd.DataFrame: The RECURSO collection rows.
+            - pd.DataFrame: The events in the order they were applied, with the amount 'Collected' and
+              the supplier's 'Advance' after each one.
+
+    Raises:
+        ValueError: If a supplier does not exist, or (on save) its advance changed while the batch ran.
+    """
+
+    numeric_cols = ['Capital', 'Interest', 'IVA', 'Total']
+
+    # ✅ Step 1: Normalize the events and apply them in date order per supplier
+    if not isinstance(events, pd.DataFrame):
+        events = pd.DataFrame(list(events), columns=['ID_Supplier', 'Amount', 'Date'])
+    events = events[['ID_Supplier', 'Amount', 'Date']].copy()
+    events['ID_Supplier'] = events['ID_Supplier'].astype(int)
+    events['Amount'] = events['Amount'].astype(float)
+    events['Date'] = pd.to_datetime(events['Date'])
+    events = events.sort_values(['ID_Supplier', 'Date'], kind='stable')
+
+    # ✅ Step 2: Read the suppliers, the tolerance and the balance of their recourse credits once
+    suppliers = list(events['ID_Supplier'].unique())
+    companies = pd.read_sql(
+        text("SELECT ID, Social_Reason, Advance FROM companies WHERE ID IN :ids").bindparams(bindparam('ids', expanding=True)),
+        engine, params={'ids': [int(supplier) for supplier in suppliers] or [0]}, index_col='ID'
+    )
+    missing = [supplier for supplier in suppliers if supplier not in companies.index]
+    if missing:
+        raise ValueError(f"❌ Supplier ID {missing[0]} does not exist in the database.")
+
+    setts = pd.read_sql("SELECT ID, Value FROM settings WHERE ID = 2", engine, index_col="ID")
+    tolerance_value = float(setts.loc[2, "Value"])
+
+    recourse = _recourse_credits(suppliers)
+    balance = credits_balance(
+        id_credits=list(recourse.index) or [0], due_until=events['Date'].max(), mode=BalanceEngine.TABLE,
+        columns=['ID_Op', 'D_Due'] + numeric_cols
+    )
+    balance[numeric_cols] = balance[numeric_cols].astype(float)
+
+    # ✅ Step 3: Apply the events of each supplier over its balance, carrying the advance
+    rows, collected, advances = [], [], []
+    for id_supplier, group in events.groupby('ID_Supplier', sort=False):
+        part = balance.loc[balance['ID_Op'].isin(recourse.index[recourse == id_supplier])]
+        due = part['D_Due'].to_numpy()
+        totals = part['Total'].to_numpy()
+        outstanding = totals != 0.0
+        advance = float(companies.at[id_supplier, 'Advance'])
+
+        for date, amount in zip(group['Date'], group['Amount']):
+            amount += advance
+            candidates = np.flatnonzero(outstanding & (due <= np.datetime64(date)))
+            accumulated = np.cumsum(totals[candidates])
+
+            chosen = candidates[:0]
+            if len(candidates):
+                chosen = candidates[(accumulated <= amount) | (abs(accumulated.max() - amount) <= tolerance_value)]
+
+            # The advance is stored with two decimals, like the column keeps it
+            advance = round(amount - totals[chosen].sum(), 2)
+            outstanding[chosen] = False
+
+            rows.append(part.iloc[chosen][numeric_cols].assign(D_Emission=date))
+            collected.append(totals[chosen].sum())
+            advances.append(advance)
+
+    events['Collected'] = collected
+    events['Advance'] = advances
+
+    collections = pd.concat(rows) if rows else pd.DataFrame(columns=numeric_cols + ['D_Emission'])
+    collections = collections.rename_axis('ID_Inst').reset_index().assign(Type_Collection='RECURSO')[COLLECTION_COLUMNS]
+
+    # ✅ Step 4: Save the collections and the advances in one transaction
+    if save:
+        final = events.groupby('ID_Supplier', sort=False)['Advance'].last()
+        with engine.begin() as connection:
+            for id_supplier, advance in final.items():
+                # Only if no one changed the advance since it was read
+                stmt = update(Company).where(
+                    Company.ID == int(id_supplier), Company.Advance == companies.at[id_supplier, 'Advance']
+                ).values(Advance=advance)
+                if connection.execute(stmt).rowcount != 1:
+                    raise ValueError(f"❌ The advance of supplier ID {id_supplier} changed while processing. Nothing was saved.")
+
+            collections.index = pd.Index(reserve_ids('collection', len(collections), connection), name='ID')
+            _insert_rows(connection, 'collection', collections.reset_index())
+            apply_collections(connection, collections)
+
+        print(f"✅ {len(events):,} resource collections recorded ({len(collections):,} installments).")
+
+    return collections, events.sort_index()
+
+
 def resource_collection(
     id_supplier: int,
     amount: float,
     date: pd.Timestamp = pd.Timestamp.now().strftime('%Y/%m/%d'),
-    save: bool = False) -> pd.DataFrame:
+    save: bool = False,
+    confirm: bool = True) -> pd.DataFrame:
     """
     Manages the resource collection process for a supplier, updating the advance balance and recording collections.
 
+    Runs `batch_resource_collection` with a single event; use that function directly for many
+    suppliers or dates.
+
     Parameters:
         id_supplier (int): The ID of the supplier company.
         amount (float): The amount available for collection.
         date (pd.Timestamp): The date of the collection (default is today).
         save (bool): Whether to save the updates and collection to the database.
+        confirm (bool): Whether to ask for confirmation before processing. Defaults to True.
 
     Returns:
         pd.DataFrame: A DataFrame with the details of the collections processed.
     """
 
     # ✅ Load supplier data
-    companies = pd.read_sql(f"SELECT * FROM companies WHERE ID = {id_supplier}", engine, index_col="ID")
-    
+    companies = pd.read_sql(
+        text("SELECT ID, Social_Reason FROM companies WHERE ID = :id"), engine, params={'id': int(id_supplier)}, index_col="ID"
+    )
+
     # ✅ Verify supplier existence
     if companies.empty:
         raise ValueError(f"❌ Supplier ID {id_supplier} does not exist in the database.")
@@ -1147,56 +2175,23 @@ def resource_collection(
     supplier_name = companies.loc[id_supplier, "Social_Reason"]
 
     # ✅ Confirm action with the user
-    confirmation = input(f"The customer is {supplier_name}. Shall we continue? (Yes/No) ").strip().lower()
-    if confirmation != "yes":
-        print("❌ Process cancelled.")
-        return pd.DataFrame()
-
-    # ✅ Adjust the amount using the supplier's advance balance
-    amount += companies.loc[id_supplier, "Advance"]
+    if confirm:
+        confirmation = input(f"The customer is {supplier_name}. Shall we continue? (Yes/No) ").strip().lower()
+        if confirmation != "yes":
+            print("❌ Process cancelled.")
+            return pd.DataFrame()
 
-    # ✅ Fetch accumulated balances
-    balance, balance_acum = calculate_accumulated_balance(id_supplier, date)
-    
-    # ✅ Fetch system settings and determine cutoff
-    setts = pd.read_sql("SELECT ID, Value FROM settings WHERE ID = 2", engine, index_col="ID")
-    tolerance_value = float(setts.loc[2, "Value"])
-
-    # ✅ Filter accumulated balances based on conditions
-    filter_condition = (balance["Accumulated"] <= amount) | (abs(balance["Accumulated"].max() - amount) <= tolerance_value)
-    balance = balance.loc[filter_condition]
-    amount -= balance["Total"].sum()
-    
-    # ✅ Initialize collections DataFrame
-    collections = pd.DataFrame(columns=["ID_Inst", "D_Emission", "Type_Collection", "Capital", "Interest", "IVA", "Total"])
-
-    # ✅ Process each balance entry
-    for i, (index, row) in enumerate(balance.iterrows()):
-        collections.loc[i] = {
-            "ID_Inst": index,
-            "D_Emission": date,
-            "Type_Collection": "RECURSO",
-            "Capital": row["Capital"],
-            "Interest": row["Interest"],
-            "IVA": row["IVA"],
-            "Total": row["Total"]
-        }
+    # ✅ Settle the installments with the amount plus the supplier's advance
+    try:
+        collections, _ = batch_resource_collection([(id_supplier, amount, date)], save=save)
+    except (ValueError, SQLAlchemyError) as e:
+        if not save:
+            raise
+        print(f"❌ Error saving resource collection: {e}")
+        return pd.DataFrame()
 
-    # ✅ Save to database if required
     if save:
-        try:
-            # ✅ Update supplier's advance balance
-            stmt = update(Company).where(Company.ID == id_supplier).values(Advance=amount)
-            with Session(engine) as session:
-                session.execute(stmt)
-                session.commit()
-
-            # ✅ Save collections to the database
-            collections.to_sql("collection", engine, index=False, if_exists="append")
-
-            print(f"✅ Resource collection for supplier {supplier_name} successfully recorded.")
-        except Exception as e:
-            print(f"❌ Error saving resource collection: {e}")
+        print(f"✅ Resource collection for supplier {supplier_name} successfully recorded.")
 
     return collections
 
@@ -1223,6 +2218,21 @@ def delete_collection_by_id(collection_id: int) -> None:
             collection_entry = session.query(Collection).filter_by(id=collection_id).first()
 
             if collection_entry:
+                # Give the amounts back to the installment balance in the same transaction
+                apply_collections(session.connection(), pd.DataFrame([{
+                    'ID_Inst': collection_entry.id_inst,
+                    'Capital': collection_entry.capital,
+                    'Interest': collection_entry.interest,
+                    'IVA': collection_entry.iva,
+                    'Total': collection_entry.total
+                }]), reverse=True)
+
+                # Discard the balance checkpoints that included it
+                drop_checkpoints(session.connection(), pd.DataFrame([{
+                    'ID': collection_entry.id,
+                    'D_Emission': collection_entry.d_emission
+                }]))
+
                 # Delete and commit
                 session.delete(collection_entry)
                 session.commit()
@@ -1,23 +1,59 @@
+import os
 import json
+import threading
+from pathlib import Path
 
-# Loading settings
-with open("docs/settings.json", "r") as file:
-    settings = json.load(file)
-
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-# Connection to MySQL
-user = settings['user']
-password = settings['password']
-host = settings['host']
-charset = settings['charset']
+# Settings file: FINANCIALAPP_SETTINGS if set, otherwise docs/settings.json of the project, wherever
+# the process was started from
+SETTINGS_PATH = Path(os.environ.get(
+    'FINANCIALAPP_SETTINGS',
+    Path(__file__).resolve().parents[3] / 'docs' / 'settings.json'
+))
 
-# Crea la cadena de conexión
 database = 'credit_portfolio'
-connection_string = f'mysql+pymysql://{user}:{password}@{host}/{database}?charset={charset}'
 
-# Crear un motor SQLAlchemy
-engine = create_engine(connection_string)
\ No newline at end of file
+_settings = None
+_settings_lock = threading.Lock()
+
+
+def load_settings() -> dict:
+    """
+    Loads the connection settings ('user', 'password', 'host' and 'charset') once per process.
+
+    Returns:
+        dict: The contents of `SETTINGS_PATH`.
+
+    Raises:
+        FileNotFoundError: If the settings file does not exist.
+    """
+    global _settings
+
+    with _settings_lock:
+        if _settings is None:
+            with open(SETTINGS_PATH, "r") as file:
+                _settings = json.load(file)
+        return _settings
+
+
+def _connect():
+    """
+    Opens a new DBAPI connection to MySQL with the settings, read the first time it is called.
+    """
+    import pymysql
+
+    settings = load_settings()
+    return pymysql.connect(
+        user=settings['user'],
+        password=settings['password'],
+        host=settings['host'],
+        database=database,
+        charset=settings['charset']
+    )
+
+
+# Crear un motor SQLAlchemy. Creating it does not connect nor read the settings: the first
+# connection checked out of the pool calls `_connect`, so importing any module is instant and
+# works without the settings file (e.g. in batch workers or tests that replace the engine).
+engine = create_engine('mysql+pymysql://', creator=_connect)
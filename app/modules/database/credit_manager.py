@@ -2,6 +2,9 @@ import pandas as pd
 
 # Import your module
 from app.modules.database.connection import engine
+from app.modules.database.balance_store import sync_installment_balance, latest_checkpoint
+from app.modules.database.id_reservations import reserve_ids
+from app.modules.database.amortization import amortization_schedule, SCHEDULE_COLUMNS
 
 import numpy_financial as npf
 from dateutil.relativedelta import relativedelta
@@ -9,6 +12,152 @@ from dateutil.relativedelta import relativedelta
 import pandas as pd
 import numpy_financial as npf
 from dateutil.relativedelta import relativedelta
+from enum import Enum
+
+import threading
+from collections import OrderedDict
+from sqlalchemy import event, text, bindparam
+
+
+class BalanceEngine(Enum):
+    """
+    Strategy used by `credits_balance` to compute installment balances.
+
+    PANDAS loads the full tables and aggregates in memory; SQL pushes the aggregation
+    and the company lookups to the database and only transfers the result; TABLE reads
+    the incrementally maintained `installment_balance` table instead of the collections, and
+    only its outstanding rows ('Total' other than zero), so its cost grows with the open
+    installments rather than with the collection history.
+    """
+    PANDAS = 'pandas'
+    SQL = 'sql'
+    TABLE = 'table'
+
+
+# Columns returned by `credits_balance`, besides the installment ID used as index
+BALANCE_OUTPUT_COLUMNS = ['ID_Op', 'Nro_Inst', 'D_Due', 'Capital', 'Interest', 'IVA', 'Total', 'Anchorer', 'Owner']
+_AMOUNT_COLUMNS = ['Capital', 'Interest', 'IVA', 'Total']
+
+# Installments with the requested columns; `i`, `cr` and `bp` are also available to the filters
+_BALANCE_QUERY = """
+    SELECT i.ID{columns}
+    FROM installments i
+    JOIN credits cr ON cr.ID = i.ID_Op
+    LEFT JOIN business_plan bp ON bp.ID = cr.ID_BP
+    {joins}
+    WHERE {where}
+    ORDER BY i.ID
+"""
+_COLUMN_EXPRESSIONS = {
+    'ID_Op': 'i.ID_Op',
+    'Nro_Inst': 'i.Nro_Inst',
+    'D_Due': 'i.D_Due',
+    'Anchorer': 'anc.Social_Reason AS Anchorer',
+    'Owner': 'own.Social_Reason AS Owner',
+}
+_COMPANY_JOINS = {
+    'Anchorer': 'LEFT JOIN companies anc ON anc.ID = bp.ID_Company',
+    'Owner': 'LEFT JOIN companies own ON own.ID = i.ID_Owner',
+}
+
+# Everything collected on each installment, summed by MySQL (only for the filtered installments
+# and, for as-of balances, only the collections dated up to that day)
+_COLLECTED_SOURCE = """
+    LEFT JOIN (
+        SELECT col.ID_Inst,
+               SUM(col.Capital) AS Capital, SUM(col.Interest) AS Interest,
+               SUM(col.IVA) AS IVA, SUM(col.Total) AS Total
+        FROM collection col
+        {joins}
+        WHERE {where}
+        GROUP BY col.ID_Inst
+    ) c ON c.ID_Inst = i.ID
+"""
+_COLLECTED_FILTER_JOINS = """JOIN installments i ON i.ID = col.ID_Inst
+        JOIN credits cr ON cr.ID = i.ID_Op
+        LEFT JOIN business_plan bp ON bp.ID = cr.ID_BP"""
+_COLLECTED_AMOUNT = "i.{col} - COALESCE(c.{col}, 0) AS {col}"
+
+# As-of balances starting from a checkpoint: `c` only holds the collections posted or dated after it
+_CHECKPOINT_SOURCE = "LEFT JOIN balance_checkpoint_rows cp ON cp.ID_Inst = i.ID AND cp.ID_Checkpoint = :checkpoint"
+_CHECKPOINT_AMOUNT = "i.{col} - COALESCE(cp.{col}, 0) - COALESCE(c.{col}, 0) AS {col}"
+_CHECKPOINT_REPLAY = "(col.D_Emission >= :checkpoint_end OR col.ID > :max_collection)"
+
+# Outstanding amounts kept up to date by the collection writers; only open installments are read
+_TABLE_SOURCE = "JOIN installment_balance b ON b.ID_Inst = i.ID"
+_TABLE_OUTSTANDING = "b.Total <> 0"
+_TABLE_AMOUNT = "b.{col} AS {col}"
+
+# Filters accepted by `credits_balance` and the column each one is pushed to
+_ID_FILTERS = {
+    'id_credits': 'cr.ID',
+    'id_customer': 'cr.ID_Client',
+    'id_owner': 'i.ID_Owner',
+    'id_supplier': 'bp.ID_Company',
+    'id_bp': 'cr.ID_BP',
+}
+
+
+# Values that change whenever the balance inputs change: new collections, installments or credits
+_WATERMARK_QUERY = """
+    SELECT (SELECT MAX(ID) FROM collection) AS Collection,
+           (SELECT MAX(ID) FROM installments) AS Installments,
+           (SELECT MAX(ID) FROM credits) AS Credits
+"""
+
+# Process-wide cache of computed balances, most recently used last
+_BALANCE_CACHE_SIZE = 8
+_balance_cache = OrderedDict()
+_balance_cache_lock = threading.Lock()
+_balance_cache_stats = {'hits': 0, 'misses': 0, 'writes': 0}
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_writes(conn, cursor, statement, parameters, context, executemany):
+    """
+    Bumps the write counter on every INSERT, UPDATE, DELETE or REPLACE sent through `engine`.
+
+    The counter is part of the cache key, so any write made by this package (including updates
+    and deletes that the ID watermarks cannot see) invalidates the cached balances.
+    """
+    if statement.lstrip()[:7].upper() in ('INSERT ', 'UPDATE ', 'DELETE ', 'REPLACE'):
+        conn.info['balance_write'] = True
+        _balance_cache_stats['writes'] += 1
+
+
+@event.listens_for(engine, "commit")
+def _count_commits(conn):
+    """
+    Bumps the write counter again when a transaction that wrote is committed.
+
+    A balance read by another connection while the transaction was open could have been cached
+    under the counter bumped by the statement; this second bump discards it.
+    """
+    if conn.info.pop('balance_write', False):
+        _balance_cache_stats['writes'] += 1
+
+
+def balance_cache_stats() -> dict:
+    """
+    Returns the usage statistics of the balance cache.
+
+    Returns:
+        dict: 'hits', 'misses', 'writes' (write statements and commits seen) and 'entries' (cached balances).
+    """
+    with _balance_cache_lock:
+        return {**_balance_cache_stats, 'entries': len(_balance_cache)}
+
+
+def clear_balance_cache() -> None:
+    """
+    Drops every cached balance.
+
+    Needed only after writes made outside this package that do not add collections, installments
+    or credits (e.g. manual UPDATEs or DELETEs run from a MySQL client).
+    """
+    with _balance_cache_lock:
+        _balance_cache.clear()
+
 
 def create_installments(id_credit: int, new_cr: pd.Series, save: bool = False) -> pd.DataFrame:
     """
@@ -23,50 +172,31 @@ def create_installments(id_credit: int, new_cr: pd.Series, save: bool = False) -
         pd.DataFrame: A DataFrame containing the installments for the specified credit.
     """
 
-    # ✅ Step 1: Retrieve the last installment ID from the database
-    last_inst_id = pd.read_sql("SELECT MAX(ID) FROM installments", engine).iloc[0, 0]
-    last_inst_id = 0 if pd.isna(last_inst_id) else int(last_inst_id)
-
-    # ✅ Step 2: Prepare credit data
-    cr = new_cr.copy()
-    cr["D_F_Due"] = pd.Period(cr["D_F_Due"], freq="D")
-
-    # ✅ Step 3: Generate installment details
-    v_inst = -npf.pmt(cr["TEM_W_IVA"], cr["N_Inst"], cr["Cap_Grant"])
-    installment_data = []
-
-    for i in range(int(cr["N_Inst"])):
-        last_inst_id += 1
-
-        # Calculate the interest portion using the IPMT formula
-        interest = -npf.ipmt(cr["TEM_W_IVA"], i + 1, cr["N_Inst"], cr["Cap_Grant"])
-        d_due = cr["D_F_Due"].asfreq("M") + i
+    # ✅ Step 1: Reserve the installment IDs (only previewed from the last ID when not saving)
+    n_inst = int(new_cr["N_Inst"])
+    if save:
+        ids = reserve_ids('installments', n_inst)
+    else:
+        last_inst_id = pd.read_sql("SELECT MAX(ID) FROM installments", engine).iloc[0, 0]
+        last_inst_id = 0 if pd.isna(last_inst_id) else int(last_inst_id)
+        ids = range(last_inst_id + 1, last_inst_id + 1 + n_inst)
 
-        # Append installment data
-        installment_data.append({
-            "ID": last_inst_id,
-            "ID_Op": id_credit,  # Credit operation ID
-            "Nro_Inst": i + 1,  # Installment number
-            "D_Due": pd.Timestamp(year=d_due.year, month=d_due.month, day=cr["D_F_Due"].day),  # Due date
-            "Capital": v_inst - interest,  # Principal portion
-            "Interest": interest / 1.21,  # Interest portion (excluding VAT)
-            "IVA": interest / 1.21 * 0.21,  # VAT on interest
-            "Total": v_inst,  # Total installment value
-            "ID_Owner": 1  # Owner ID (assumed fixed value)
-        })
+    # ✅ Step 2: Generate the installment schedule
+    df = amortization_schedule(new_cr[SCHEDULE_COLUMNS].to_frame(id_credit).T)
 
-    # ✅ Step 4: Convert to DataFrame
-    df = pd.DataFrame(installment_data)
-    df.set_index('ID', inplace=True)
+    # ✅ Step 3: Assign the installment IDs
+    df.index = pd.Index(ids, name='ID')
 
-    # ✅ Step 5: Save to database if required
+    # ✅ Step 4: Save to database if required
     if save:
         try:
-            df.to_sql("installments", engine, index=False, if_exists="append")
+            with engine.begin() as connection:
+                df.to_sql("installments", connection, index=True, if_exists="append")
+                sync_installment_balance(connection, ids)
         except Exception as e:
             print(f"❌ Error saving installments: {e}")
 
-    # ✅ Step 6: Return only installments related to the given credit ID
+    # ✅ Step 5: Return only installments related to the given credit ID
     return df[df["ID_Op"] == id_credit]
 
 
@@ -120,9 +250,14 @@ def new_credit(
     elif D_F_Due < next_due:
         raise ValueError("The first due date cannot be earlier than the settlement date.")
 
-    # ✅ Step 5: Determine the next credit ID
-    id = pd.read_sql("SELECT MAX(ID) FROM credits", engine).iloc[0, 0]
-    id = massive if massive else (1 if pd.isna(id) else int(id) + 1)
+    # ✅ Step 5: Determine the credit ID: given by the batch, reserved when saving, or previewed
+    if massive:
+        id = massive
+    elif save:
+        id = reserve_ids('credits', 1)[0]
+    else:
+        id = pd.read_sql("SELECT MAX(ID) FROM credits", engine).iloc[0, 0]
+        id = 1 if pd.isna(id) else int(id) + 1
 
     # ✅ Step 6: Prepare the credit record
     new_cr = pd.DataFrame([{
@@ -147,7 +282,7 @@ def new_credit(
     # ✅ Step 7: Save the new credit record to the database
     if save:
         try:
-            new_cr.to_sql('credits', engine, if_exists='append', index=False)
+            new_cr.to_sql('credits', engine, if_exists='append', index=True)
         except Exception as e:
             print(f"❌ Error saving credit record: {e}")
 
@@ -157,25 +292,438 @@ def new_credit(
     return new_cr, installments
 
 
-def credits_balance(date: pd.Timestamp = pd.Timestamp.now()) -> pd.DataFrame:
+# Columns of a credit record, in the order `new_credit` builds it
+CREDIT_COLUMNS = [
+    'ID_External', 'ID_Client', 'Date_Settlement', 'ID_BP', 'Cap_Requested', 'Cap_Grant', 'N_Inst',
+    'First_Inst_Purch', 'TEM_W_IVA', 'V_Inst', 'First_Inst_Sold', 'D_F_Due', 'ID_Purch', 'ID_Sale'
+]
+
+
+def new_credits(
+        df: pd.DataFrame,
+        iva: bool = True,
+        save: bool = False,
+        connection=None
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Creates many credits and their installment schedules at once, with the rules of `new_credit`.
+
+    The settings are read once, the installment values are checked against the PMT of every row
+    together, the credit and installment IDs are allocated in two blocks, and the schedules come from
+    a single `amortization_schedule` call. The result is the same as calling `new_credit` row by row
+    and concatenating its output.
+
+    Parameters:
+        df (pd.DataFrame): One row per credit with 'ID_Client', 'Date_Settlement', 'ID_BP',
+            'Cap_Requested', 'Cap_Grant', 'N_Inst' and 'TEM_W_IVA'. Optional columns: 'V_Inst' and
+            'D_F_Due' (computed when missing or empty, like in `new_credit`), 'ID_External', 'ID_Purch',
+            'First_Inst_Purch', 'ID_Sale' and 'First_Inst_Sold'.
+        iva (bool, optional): If False, the installments carry no IVA and their 'Total' is
+            'Capital' + 'Interest'. Defaults to True.
+        save (bool, optional): If True, reserves the IDs and saves credits and installments in one
+            transaction. Otherwise the IDs are only previewed from the last ones. Defaults to False.
+        connection (sqlalchemy.engine.Connection, optional): Open transaction to reserve the IDs and
+            write into when saving, so the caller can add its own rows (e.g. collections) to it.
+
+    Returns:
+        tuple:
+            - pd.DataFrame: New credits indexed by their ID.
+            - pd.DataFrame: Their installments indexed by their ID.
+
+    Raises:
+        ValueError: If a required column is missing, an installment value does not match the rate and
+        term, or a first due date is earlier than the settlement.
+
+    Example:
+        >>> credits, installments = new_credits(df, save=True)
+    """
+
+    required = ['ID_Client', 'Date_Settlement', 'ID_BP', 'Cap_Requested', 'Cap_Grant', 'N_Inst', 'TEM_W_IVA']
+    missing = [column for column in required if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns to create the credits: {', '.join(missing)}.")
+
+    def optional(column, default=None) -> pd.Series:
+        return df[column] if column in df.columns else pd.Series(default, index=df.index, dtype=object)
+
+    # ✅ Step 1: Check the installment values against the PMT of every credit
+    value_inst = -npf.pmt(df['TEM_W_IVA'].astype(float), df['N_Inst'].astype(int), df['Cap_Grant'].astype(float))
+    value_inst = pd.Series(value_inst, index=df.index)
+    v_inst = pd.to_numeric(optional('V_Inst'), errors='coerce')
+    wrong = v_inst.notna() & ((value_inst - v_inst).abs() > 1)
+    if wrong.any():
+        rows = ', '.join(str(i) for i in df.index[wrong][:10])
+        raise ValueError(
+            f"The rate and the number of installments don't match the installment value of {wrong.sum():,} "
+            f"credits (rows: {rows})."
+        )
+    v_inst = v_inst.fillna(value_inst)
+
+    # ✅ Step 2: Retrieve the global settings once
+    df_set = pd.read_sql("SELECT ID, Value FROM settings WHERE ID IN (1, 2)", engine).set_index("ID")["Value"]
+    due_day, grace_periods = int(df_set[1]), int(df_set[2])
+
+    # ✅ Step 3: Compute the first due dates
+    settlement = pd.to_datetime(df['Date_Settlement'])
+    next_due = settlement.dt.to_period('M').dt.to_timestamp() + pd.Timedelta(days=due_day - 1)
+    d_f_due = pd.to_datetime(optional('D_F_Due'))
+    early = d_f_due.notna() & (d_f_due < next_due)
+    if early.any():
+        rows = ', '.join(str(i) for i in df.index[early][:10])
+        raise ValueError(f"The first due date cannot be earlier than the settlement date (rows: {rows}).")
+    d_f_due = d_f_due.fillna(next_due + pd.DateOffset(months=grace_periods))
+
+    # ✅ Step 4: Allocate the credit IDs in one block
+    n_credits = len(df)
+    if save:
+        credit_ids = reserve_ids('credits', n_credits, connection)
+    else:
+        last_credit = pd.read_sql("SELECT MAX(ID) FROM credits", engine).iloc[0, 0]
+        last_credit = 0 if pd.isna(last_credit) else int(last_credit)
+        credit_ids = range(last_credit + 1, last_credit + 1 + n_credits)
+
+    # ✅ Step 5: Prepare the credit records
+    def integers(column, default=None) -> list:
+        return [int(value) if pd.notna(value) else None for value in optional(column, default)]
+
+    credits = pd.DataFrame({
+        'ID_External': integers('ID_External'),
+        'ID_Client': df['ID_Client'].astype(int).to_numpy(),
+        'Date_Settlement': settlement.to_numpy(),
+        'ID_BP': df['ID_BP'].astype(int).to_numpy(),
+        'Cap_Requested': df['Cap_Requested'].astype(float).to_numpy(),
+        'Cap_Grant': df['Cap_Grant'].astype(float).to_numpy(),
+        'N_Inst': df['N_Inst'].astype(int).to_numpy(),
+        'First_Inst_Purch': optional('First_Inst_Purch', 0).fillna(0).astype(int).to_numpy(),
+        'TEM_W_IVA': df['TEM_W_IVA'].astype(float).to_numpy(),
+        'V_Inst': v_inst.astype(float).to_numpy(),
+        'First_Inst_Sold': integers('First_Inst_Sold', 0),
+        'D_F_Due': d_f_due.to_numpy(),
+        'ID_Purch': integers('ID_Purch'),
+        'ID_Sale': integers('ID_Sale')
+    }, index=pd.Index(credit_ids, name='ID'))[CREDIT_COLUMNS]
+
+    # ✅ Step 6: Generate all the installment schedules at once
+    installments = amortization_schedule(credits)
+    if not iva:
+        installments['IVA'] = 0.0
+        installments['Total'] = installments['Capital'] + installments['Interest']
+
+    # ✅ Step 7: Allocate the installment IDs in one block
+    if save:
+        inst_ids = reserve_ids('installments', len(installments), connection)
+    else:
+        last_inst = pd.read_sql("SELECT MAX(ID) FROM installments", engine).iloc[0, 0]
+        last_inst = 0 if pd.isna(last_inst) else int(last_inst)
+        inst_ids = range(last_inst + 1, last_inst + 1 + len(installments))
+    installments.index = pd.Index(inst_ids, name='ID')
+
+    # ✅ Step 8: Save credits and installments together
+    if save:
+        def write(conn):
+            credits.to_sql('credits', conn, index=True, if_exists='append')
+            installments.to_sql('installments', conn, index=True, if_exists='append')
+            sync_installment_balance(conn, inst_ids)
+
+        if connection is not None:
+            write(connection)
+        else:
+            with engine.begin() as conn:
+                write(conn)
+        print(f"✅ {n_credits:,} credits and {len(installments):,} installments created.")
+
+    return credits, installments
+
+
+def credits_balance(
+        date: pd.Timestamp = None,
+        mode: BalanceEngine = BalanceEngine.SQL,
+        use_cache: bool = True,
+        id_credits=None,
+        id_customer=None,
+        id_owner=None,
+        id_supplier=None,
+        id_bp=None,
+        due_from: pd.Timestamp = None,
+        due_until: pd.Timestamp = None,
+        columns: list = None
+    ) -> pd.DataFrame:
     """
     Calculates the balance of credits by adjusting installment amounts based on recorded collections.
 
-    This function retrieves data from the `collection` and `installments` tables, adjusts the values in 
-    installments to account for the amounts already collected, and returns the updated installment data.
+    Both engines return the same DataFrame: one row per installment (indexed by its ID) with the
+    outstanding 'Capital', 'Interest', 'IVA' and 'Total', plus the 'Anchorer' and 'Owner' names.
+    The TABLE engine leaves out the installments with nothing outstanding ('Total' of zero) for
+    current balances; callers that only act on open installments should use it.
+
+    Without `date`, every posted collection is applied. With `date`, the balance is computed as of
+    the end of that day: only credits settled and collections emitted up to that day are taken into
+    account. The SQL engine then starts from the nearest month-end checkpoint at or before `date`
+    (see `create_balance_checkpoints`) and only replays the collections posted or dated after it;
+    the TABLE engine, which only knows current balances, behaves like the SQL one for as-of dates.
+
+    The filters are pushed into the SQL (SQL and TABLE engines), so only the matching installments
+    and their collections are read: the cost of a single-customer balance does not grow with the
+    portfolio. Filters are combined with AND; each ID filter accepts a single ID or a list of IDs.
+
+    Results are cached for the whole process. The cache key holds the arguments, MAX(ID) of
+    `collection`, `installments` and `credits`, and a counter bumped by every write sent through
+    `engine`, so a cached balance is only reused while none of them changed. Each call returns
+    its own copy. See `balance_cache_stats` and `clear_balance_cache`.
 
     Parameters:
-        date (pd.Timestamp, optional): The reference date for balance calculations. Defaults to the current date.
+        date (pd.Timestamp | pd.Period, optional): As-of date (day precision; a Period uses its last day).
+            Defaults to None, which applies every posted collection.
+        mode (BalanceEngine, optional): Aggregate in MySQL (SQL, default), in pandas (PANDAS) or
+            read the outstanding rows of the maintained `installment_balance` table (TABLE).
+        use_cache (bool, optional): If False, always recomputes the balance (and does not cache it).
+        id_credits (int | list, optional): Only these credits.
+        id_customer (int | list, optional): Only the credits of these customers.
+        id_owner (int | list, optional): Only the installments owned by these companies.
+        id_supplier (int | list, optional): Only the credits whose business plan belongs to these companies.
+        id_bp (int | list, optional): Only the credits of these business plans.
+        due_from (pd.Timestamp, optional): Only installments due on or after this date.
+        due_until (pd.Timestamp, optional): Only installments due on or before this date.
+        columns (list, optional): Subset of `BALANCE_OUTPUT_COLUMNS` to return, in that order.
+            Defaults to all of them.
 
     Returns:
         pd.DataFrame: Updated installment balances with columns for 'Capital', 'Interest', 'IVA', and 'Total'.
+
+    Raises:
+        ValueError: If the engine or any of the requested columns is not valid.
+    """
+
+    if not isinstance(mode, BalanceEngine):
+        raise ValueError(f"Invalid balance engine: {mode}")
+
+    # ✅ Step 1: Normalize the filters and the requested columns
+    filters = {
+        name: _as_id_list(value)
+        for name, value in [('id_credits', id_credits), ('id_customer', id_customer), ('id_owner', id_owner),
+                            ('id_supplier', id_supplier), ('id_bp', id_bp)]
+        if value is not None
+    }
+    if due_from is not None:
+        filters['due_from'] = pd.Timestamp(due_from)
+    if due_until is not None:
+        filters['due_until'] = pd.Timestamp(due_until)
+
+    if columns is None:
+        columns = list(BALANCE_OUTPUT_COLUMNS)
+    else:
+        invalid = [col for col in columns if col not in BALANCE_OUTPUT_COLUMNS]
+        if invalid:
+            raise ValueError(f"Invalid balance columns: {invalid}. Valid columns: {BALANCE_OUTPUT_COLUMNS}")
+        columns = [col for col in BALANCE_OUTPUT_COLUMNS if col in columns]
+
+    as_of = _as_of(date)
+
+    if not use_cache:
+        return _compute_credits_balance(as_of, mode, filters, columns)
+
+    # ✅ Step 2: Build the key from the arguments, the watermarks and the write counter
+    writes = _balance_cache_stats['writes']
+    watermarks = tuple(pd.read_sql(_WATERMARK_QUERY, engine).iloc[0].fillna(0).astype(int))
+    key = (mode, as_of, tuple(sorted(filters.items())), tuple(columns), watermarks, writes)
+
+    # ✅ Step 3: Reuse the cached balance if nothing changed
+    with _balance_cache_lock:
+        if key in _balance_cache:
+            _balance_cache.move_to_end(key)
+            _balance_cache_stats['hits'] += 1
+            return _balance_cache[key].copy()
+        _balance_cache_stats['misses'] += 1
+
+    # ✅ Step 4: Compute it and keep only the most recent balances
+    df = _compute_credits_balance(as_of, mode, filters, columns)
+
+    with _balance_cache_lock:
+        # Balances computed before the last change can never be reused
+        for stale in [k for k in _balance_cache if k[-2:] != key[-2:]]:
+            del _balance_cache[stale]
+        _balance_cache[key] = df.copy()
+        while len(_balance_cache) > _BALANCE_CACHE_SIZE:
+            _balance_cache.popitem(last=False)
+
+    return df
+
+
+def _as_of(date) -> pd.Timestamp:
+    """
+    Normalizes the as-of date to the start of its day (the last day for a Period), or None.
+    """
+
+    if date is None:
+        return None
+    if isinstance(date, pd.Period):
+        return date.end_time.normalize()
+
+    return pd.Timestamp(date).normalize()
+
+
+def _as_id_list(value) -> tuple:
+    """
+    Converts a single ID or an iterable of IDs into a sorted tuple of unique ints.
+    """
+
+    if isinstance(value, (int, float, str)) or not hasattr(value, '__iter__'):
+        value = [value]
+
+    return tuple(sorted({int(v) for v in value}))
+
+
+def _balance_filters(filters: dict, as_of: pd.Timestamp = None) -> tuple[str, dict]:
+    """
+    Translates the `credits_balance` filters into a WHERE clause with bound parameters.
+
+    With an as-of date, only credits settled up to that day are kept, and the ':as_of_end'
+    parameter (start of the next day) is added for the collection conditions.
+
+    The clause only references the `i` (installments), `cr` (credits) and `bp` (business_plan)
+    aliases, so it can be used both in the main query and in the collection subquery.
+
+    Returns:
+        tuple:
+            - str: The conditions joined with AND ('1 = 1' if there are none).
+            - dict: The parameters to bind.
+    """
+
+    conditions, params = [], {}
+
+    for name, column in _ID_FILTERS.items():
+        if name in filters:
+            conditions.append(f"{column} IN :{name}")
+            params[name] = list(filters[name])
+
+    if 'due_from' in filters:
+        conditions.append("i.D_Due >= :due_from")
+        params['due_from'] = filters['due_from'].to_pydatetime()
+    if 'due_until' in filters:
+        conditions.append("i.D_Due <= :due_until")
+        params['due_until'] = filters['due_until'].to_pydatetime()
+    if as_of is not None:
+        conditions.append("cr.Date_Settlement < :as_of_end")
+        params['as_of_end'] = (as_of + pd.Timedelta(days=1)).to_pydatetime()
+
+    return (" AND ".join(conditions) if conditions else "1 = 1"), params
+
+
+def _balance_statement(query: str, params: dict):
+    """
+    Wraps a balance query in a `text` clause, expanding the list parameters of the IN filters.
+    """
+
+    expanding = [bindparam(name, expanding=True) for name in params if name in _ID_FILTERS]
+
+    return text(query).bindparams(*expanding) if expanding else text(query)
+
+
+def _compute_credits_balance(as_of: pd.Timestamp, mode: BalanceEngine, filters: dict, columns: list) -> pd.DataFrame:
+    """
+    Dispatches the balance computation to the selected engine, without caching.
+    """
+
+    if mode == BalanceEngine.PANDAS:
+        df = _credits_balance_pandas(as_of)
+
+        # The pandas engine always computes the whole portfolio; the filters are applied afterwards
+        if filters:
+            where, params = _balance_filters(filters)
+            ids = pd.read_sql(
+                _balance_statement(_BALANCE_QUERY.format(columns='', joins='', where=where), params),
+                engine, params=params
+            )['ID']
+            df = df.loc[df.index.isin(ids)]
+
+        return df[columns]
+
+    where, params = _balance_filters(filters, as_of)
+
+    # ✅ Select the requested columns, joining the company names only when needed
+    amounts = [col for col in columns if col in _AMOUNT_COLUMNS]
+    joins = [_COMPANY_JOINS[col] for col in columns if col in _COMPANY_JOINS]
+
+    if mode == BalanceEngine.TABLE and as_of is None:
+        expression = _TABLE_AMOUNT
+        joins.append(_TABLE_SOURCE)
+        where = f"{where} AND {_TABLE_OUTSTANDING}"
+    elif mode in (BalanceEngine.SQL, BalanceEngine.TABLE):
+        expression = _COLLECTED_AMOUNT
+        collected_where = [where]
+
+        # ✅ As of a date: start from the nearest checkpoint and replay the later collections
+        if as_of is not None:
+            collected_where.append("col.D_Emission < :as_of_end")
+            checkpoint = latest_checkpoint(as_of) if amounts else None
+
+            if checkpoint is not None:
+                expression = _CHECKPOINT_AMOUNT
+                joins.append(_CHECKPOINT_SOURCE)
+                collected_where.append(_CHECKPOINT_REPLAY)
+                params.update({
+                    'checkpoint': int(checkpoint['ID']),
+                    'checkpoint_end': (checkpoint['Date'] + pd.Timedelta(days=1)).to_pydatetime(),
+                    'max_collection': int(checkpoint['Max_Collection_ID'])
+                })
+
+        if amounts:
+            joins.append(_COLLECTED_SOURCE.format(
+                joins=_COLLECTED_FILTER_JOINS if where != '1 = 1' else '',
+                where=' AND '.join(collected_where)
+            ).strip())
+    else:
+        raise ValueError(f"Invalid balance engine: {mode}")
+
+    select = [
+        expression.format(col=col) if col in _AMOUNT_COLUMNS else _COLUMN_EXPRESSIONS[col]
+        for col in columns
+    ]
+    query = _BALANCE_QUERY.format(
+        columns=''.join(f",\n           {expr}" for expr in select),
+        joins='\n    '.join(joins),
+        where=where
+    )
+
+    return _credits_balance_sql(_balance_statement(query, params), params)
+
+
+def _credits_balance_sql(query, params: dict = None) -> pd.DataFrame:
+    """
+    Computes the installment balances with a single joined query.
+
+    The outstanding amounts come either from the collections summed per installment inside
+    MySQL or from `installment_balance`, and the anchorer/owner names are resolved with joins,
+    so only one row per installment travels to pandas. As-of balances subtract a checkpoint
+    plus the collections replayed after it, or every collection up to the date if there is none.
+    """
+
+    # ✅ Step 1: Run the query in the database
+    df_its = pd.read_sql(query, engine, index_col='ID', params=params)
+
+    # ✅ Step 2: Convert dates and DECIMAL results, and round like the pandas engine
+    if 'D_Due' in df_its.columns:
+        df_its['D_Due'] = pd.to_datetime(df_its['D_Due'])
+
+    numeric_cols = [col for col in _AMOUNT_COLUMNS if col in df_its.columns]
+    df_its[numeric_cols] = df_its[numeric_cols].astype(float).round(2)
+
+    return df_its
+
+
+def _credits_balance_pandas(as_of: pd.Timestamp = None) -> pd.DataFrame:
+    """
+    Computes the installment balances by loading the tables and aggregating them with pandas.
     """
     
-    # ✅ Step 1: Ensure correct date format
-    date = pd.Timestamp(date)
+    # ✅ Step 1: Bound the as-of date to the start of the next day
+    params = None if as_of is None else {'end': (as_of + pd.Timedelta(days=1)).to_pydatetime()}
 
     # ✅ Step 2: Load collections and filter by date
-    df_clt = pd.read_sql(f"SELECT * FROM collection WHERE 'D_Emission' <= {pd.Period(date, freq='D')}", engine, index_col="ID")
+    if params is None:
+        df_clt = pd.read_sql("SELECT * FROM collection", engine, index_col="ID")
+    else:
+        df_clt = pd.read_sql(text("SELECT * FROM collection WHERE D_Emission < :end"), engine, index_col="ID", params=params)
     
     # ✅ Step 3: Convert financial columns to float for calculations
     numeric_cols = ["Capital", "Interest", "IVA", "Total"]
@@ -183,7 +731,10 @@ def credits_balance(date: pd.Timestamp = pd.Timestamp.now()) -> pd.DataFrame:
 
     # ✅ Step 4: Load installments and filter only relevant credits
     df_its = pd.read_sql("SELECT * FROM installments", engine, index_col="ID")
-    credits = pd.read_sql(f"SELECT ID FROM credits WHERE 'Date_Settlement' <= {pd.Period(date, freq='D')}", engine, index_col="ID")
+    if params is None:
+        credits = pd.read_sql("SELECT ID FROM credits", engine, index_col="ID")
+    else:
+        credits = pd.read_sql(text("SELECT ID FROM credits WHERE Date_Settlement < :end"), engine, index_col="ID", params=params)
     
     df_its = df_its[df_its["ID_Op"].isin(credits.index)]
 
@@ -4,9 +4,39 @@ import numpy as np
 # Import your module
 from app.modules.database.connection import engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import update
+from sqlalchemy import update, insert, text, func, MetaData, Table, Column, Integer
 
 from app.modules.database.structur_databases import Customer, MaritalStatus
+from app.modules.database.identifier_index import invalidate_identifier_index
+
+
+# Province names as keys, with their possible aliases as values (list of strings)
+PROVINCE_ALIASES = {
+    'Buenos Aires': ["Buenos Aires", "Bs. As.", "Ba"],
+    'Chubut': ['Chubut', 'Chub'],
+    'Ciudad Autónoma de Buenos Aires': ['Ciudad Autónoma de Buenos Aires', 'CABA', 'Capital Federal', 'Ciudad de Buenos Aires', 'Ciudad Autónoma De Buenos Aires', 'Ciudad Autónoma De Bs. As.', 'Ciudad Autónoma De Bs. As.'],
+    'Catamarca': ['Catamarca', 'Cat'],
+    'Chaco': ['Chaco', 'Cha'],
+    'Córdoba': ['Córdoba', 'Cordoba', 'Cba'],
+    'Corrientes': ['Corrientes', 'Corr'],
+    'Entre Ríos': ['Entre Ríos', 'Entre Rios', 'ER'],
+    'Formosa': ['Formosa', 'For'],
+    'Jujuy': ['Jujuy', 'Juj'],
+    'La Pampa': ['La Pampa', 'LP'],
+    'La Rioja': ['La Rioja', 'LR'],
+    'Mendoza': ['Mendoza', 'Mdz'],
+    'Misiones': ['Misiones', 'Mis'],
+    'Neuquén': ['Neuquén', 'Neuquen', 'Neu'],
+    'Río Negro': ['Río Negro', 'Rio Negro', 'RN'],
+    'Salta': ['Salta', 'Sal'],
+    'San Juan': ['San Juan', 'SJ'],
+    'San Luis': ['San Luis', 'SL'],
+    'Santa Cruz': ['Santa Cruz', 'SC'],
+    'Santa Fe': ['Santa Fe', 'SF'],
+    'Santiago del Estero': ['Santiago del Estero', 'Santiago', 'SE'],
+    'Tierra del Fuego': ['Tierra del Fuego', 'TDF'],
+    'Tucumán': ['Tucumán', 'Tucuman', 'Tuc']
+}
 
 
 # Function to convert a full gender label to its corresponding abbreviation
@@ -193,6 +223,9 @@ def add_customer(CUIL: int = None,
                 session.commit()  # Commit each change
         
         session.close()
+
+        # The DNI of an existing customer may have changed
+        invalidate_identifier_index()
         
     return new_customer
 
@@ -216,48 +249,20 @@ def id_province(prov: str) -> int:
     # Read the database table containing provinces into a pandas DataFrame
     df = pd.read_sql("provinces", engine, index_col="ID")
 
-    # Dictionary of province names as keys, with their possible aliases as values (list of strings)
-    alias = {
-        'Buenos Aires': ["Buenos Aires", "Bs. As.", "Ba"],
-        'Chubut': ['Chubut', 'Chub'],
-        'Ciudad Autónoma de Buenos Aires': ['Ciudad Autónoma de Buenos Aires', 'CABA', 'Capital Federal', 'Ciudad de Buenos Aires', 'Ciudad Autónoma De Buenos Aires', 'Ciudad Autónoma De Bs. As.', 'Ciudad Autónoma De Bs. As.'],
-        'Catamarca': ['Catamarca', 'Cat'],
-        'Chaco': ['Chaco', 'Cha'],
-        'Córdoba': ['Córdoba', 'Cordoba', 'Cba'],
-        'Corrientes': ['Corrientes', 'Corr'],
-        'Entre Ríos': ['Entre Ríos', 'Entre Rios', 'ER'],
-        'Formosa': ['Formosa', 'For'],
-        'Jujuy': ['Jujuy', 'Juj'],
-        'La Pampa': ['La Pampa', 'LP'],
-        'La Rioja': ['La Rioja', 'LR'],
-        'Mendoza': ['Mendoza', 'Mdz'],
-        'Misiones': ['Misiones', 'Mis'],
-        'Neuquén': ['Neuquén', 'Neuquen', 'Neu'],
-        'Río Negro': ['Río Negro', 'Rio Negro', 'RN'],
-        'Salta': ['Salta', 'Sal'],
-        'San Juan': ['San Juan', 'SJ'],
-        'San Luis': ['San Luis', 'SL'],
-        'Santa Cruz': ['Santa Cruz', 'SC'],
-        'Santa Fe': ['Santa Fe', 'SF'],
-        'Santiago del Estero': ['Santiago del Estero', 'Santiago', 'SE'],
-        'Tierra del Fuego': ['Tierra del Fuego', 'TDF'],
-        'Tucumán': ['Tucumán', 'Tucuman', 'Tuc']
-    }
-
     # Clean the input province string (remove extra spaces and capitalize the first letter of each word)
     try:
         prov = prov.strip()
         prov = prov.title()
 
         # If the province name is not directly in the alias dictionary, try to match it with an alias
-        if prov not in alias.keys():
-            for p, a in alias.items():
+        if prov not in PROVINCE_ALIASES.keys():
+            for p, a in PROVINCE_ALIASES.items():
                 if prov in a:
                     prov = p  # Set the province to the correct name found in the alias
                     break
 
         # If the province is still not found, raise an exception
-        if prov not in alias.keys():
+        if prov not in PROVINCE_ALIASES.keys():
             raise KeyError(f"{prov} no es una provincia de Argentina.")
 
         # If found, retrieve the province ID from the DataFrame and return it as an integer
@@ -269,3 +274,160 @@ def id_province(prov: str) -> int:
     return int(id)
 
 
+
+
+def province_ids(provinces: pd.Series) -> pd.Series:
+    """
+    Vectorized `id_province`: returns the province ID of every name or alias of `provinces`, reading
+    the 'provinces' table once.
+
+    Parameters:
+        provinces (pd.Series): Names or aliases of Argentine provinces.
+
+    Returns:
+        pd.Series: Province IDs (None where the value is not a string), with the index of `provinces`.
+
+    Raises:
+        KeyError: If any name or alias does not correspond to a valid Argentine province.
+    """
+
+    # ✅ Step 1: Name of each alias, and ID of each name
+    names = {alias: name for name, aliases in PROVINCE_ALIASES.items() for alias in [name] + aliases}
+    ids = pd.read_sql("provinces", engine, index_col="ID").reset_index().drop_duplicates('Name').set_index('Name')['ID']
+
+    # ✅ Step 2: Clean the strings like `id_province` and resolve them
+    is_text = provinces.map(lambda p: isinstance(p, str))
+    cleaned = provinces.loc[is_text].astype(str).str.strip().str.title()
+    resolved = cleaned.map(names)
+
+    unknown = cleaned.loc[resolved.isna()].unique()
+    if len(unknown):
+        raise KeyError(f"{', '.join(unknown)} no es una provincia de Argentina.")
+
+    result = resolved.map(ids).astype(int).astype(object).reindex(provinces.index)
+    return result.where(result.notna(), None)
+
+
+def gender_codes(genders: pd.Series) -> pd.Series:
+    """
+    Vectorized `categorical_gender`: converts full gender labels (case insensitive) to their
+    abbreviations. Values that already are an abbreviation are kept.
+
+    Parameters:
+        genders (pd.Series): Gender labels or abbreviations.
+
+    Returns:
+        pd.Series: Abbreviations, None where the value is missing or not recognized (the latter are
+        reported).
+    """
+
+    gender_map = {
+        'male': 'M',
+        'female': 'F',
+        'other': 'O',
+        'non-binary': 'NB',
+        'transgender': 'T',
+        'genderfluid': 'F',
+        'agender': 'A'
+    }
+    codes = {'M', 'F', 'NB', 'T', 'G', 'A', 'O'}
+
+    cleaned = genders.map(lambda g: g.strip() if isinstance(g, str) else None).astype(object)
+    mapped, abbreviated = cleaned.str.lower().map(gender_map), cleaned.str.upper()
+    result = mapped.where(mapped.notna(), abbreviated.where(abbreviated.isin(codes)))
+
+    unknown = cleaned.loc[cleaned.notna() & result.isna()].unique()
+    if len(unknown):
+        print(f"⚠️ Genders not recognized, left empty: {', '.join(unknown)}.")
+
+    return result.astype(object).where(result.notna(), None)
+
+
+def _differs(new: pd.Series, old: pd.Series) -> pd.Series:
+    """
+    Compares a column of new values with the stored one, as numbers if either is numeric (a file may
+    bring as integers what is stored as text), as dates if either is a date, and as text otherwise.
+    """
+
+    if pd.api.types.is_numeric_dtype(new) or pd.api.types.is_numeric_dtype(old):
+        new_num, old_num = pd.to_numeric(new, errors='coerce'), pd.to_numeric(old, errors='coerce')
+        if new_num.notna().equals(new.notna()) and old_num.notna().equals(old.notna()):
+            return new_num.ne(old_num)
+
+    if pd.api.types.is_datetime64_any_dtype(new) or pd.api.types.is_datetime64_any_dtype(old):
+        return pd.to_datetime(new, errors='coerce').ne(pd.to_datetime(old, errors='coerce'))
+
+    return new.astype(str).ne(old.astype(str)) | old.isna()
+
+
+def upsert_customers(df: pd.DataFrame, customers: pd.DataFrame = None) -> tuple:
+    """
+    Inserts the customers of `df` whose CUIL is not in the 'customers' table and updates the others,
+    in a single transaction.
+
+    Like `add_customer`, the non-null values of an existing customer overwrite the stored ones and
+    the null ones keep them; 'Last_Update' is left to the database. Only the values that differ are
+    written: they are staged in a temporary table and applied with one join-UPDATE.
+
+    Parameters:
+        df (pd.DataFrame): Customer data with 'CUIL' and columns of the 'customers' table. If a CUIL
+            is repeated, its last row is used.
+        customers (pd.DataFrame, optional): The 'customers' table indexed by ID, if already loaded.
+
+    Returns:
+        tuple: Number of customers inserted and number of customers updated.
+    """
+
+    # ✅ Step 1: Match the rows to the existing customers by CUIL
+    if customers is None:
+        customers = pd.read_sql('customers', engine, index_col='ID')
+
+    rows = df.drop_duplicates('CUIL', keep='last')
+    id_by_cuil = customers.reset_index().drop_duplicates('CUIL').set_index('CUIL')['ID']
+    found = rows['CUIL'].map(id_by_cuil)
+
+    new_customers = rows.loc[found.isna()]
+    existing = rows.loc[found.notna()].set_axis(pd.Index(found.dropna().astype(int), name='ID'))
+
+    # ✅ Step 2: Detect the changed, non-null values column-wise
+    columns = [c for c in existing.columns if c in customers.columns and c not in ('CUIL', 'Last_Update')]
+    stored = customers.loc[existing.index, columns]
+    changed = pd.DataFrame({c: existing[c].notna() & _differs(existing[c], stored[c]) for c in columns}, index=existing.index)
+    values = existing[columns].astype(object)
+
+    changed = changed.loc[changed.any(axis=1), changed.any(axis=0)]
+    changes = values.loc[changed.index, changed.columns].where(changed, None)
+
+    # ✅ Step 3: Insert the new customers and apply the changes in one transaction
+    with engine.connect() as connection:
+        try:
+            with connection.begin():
+                if not new_customers.empty:
+                    new_customers.to_sql('customers', connection, index=False, if_exists='append')
+
+                if not changes.empty:
+                    table = Table('customers', MetaData(), autoload_with=connection)
+                    staged = Table(
+                        '_customer_changes', MetaData(),
+                        Column('ID', Integer, primary_key=True),
+                        *[Column(c, table.c[c].type) for c in changes.columns],
+                        prefixes=['TEMPORARY']
+                    )
+                    staged.create(connection)
+                    connection.execute(insert(staged), changes.reset_index().to_dict('records'))
+                    connection.execute(
+                        table.update().where(table.c.ID == staged.c.ID)
+                        .values({c: func.coalesce(staged.c[c], table.c[c]) for c in changes.columns})
+                    )
+        finally:
+            # Drop the staging table after the commit or the rollback, so the pooled connection does not keep it
+            if not changes.empty:
+                connection.execute(text("DROP TEMPORARY TABLE IF EXISTS _customer_changes"))
+                connection.commit()
+
+    # The DNI of an existing customer may have changed
+    if not changes.empty:
+        invalidate_identifier_index()
+
+    print(f"✅ Customers: {len(new_customers):,} inserted, {len(changes):,} updated.")
+    return len(new_customers), len(changes)
@@ -0,0 +1,119 @@
+import threading
+
+# Import your module
+from app.modules.database.connection import engine
+
+from sqlalchemy import select, update, insert, text, inspect
+from sqlalchemy.exc import IntegrityError
+from app.modules.database.structur_databases import Base, IdReservation
+
+
+# Tables whose IDs are reserved before inserting; their writers insert explicit IDs
+RESERVABLE_TABLES = ['credits', 'installments', 'collection', 'portfolio_purchases', 'portfolio_sales', 'portfolio_sales_generated']
+
+_reservations = IdReservation.__table__
+_table_ready = threading.Event()
+_registered = set()
+
+
+def _ensure_reservations_table() -> None:
+    """
+    Creates `id_reservations` once per process if the database predates it.
+
+    The DDL runs on its own connection: MySQL commits the open transaction before any CREATE TABLE,
+    so running it on the writer's connection would commit the rows written so far.
+    """
+
+    if _table_ready.is_set():
+        return
+
+    with engine.begin() as connection:
+        if not inspect(connection).has_table('id_reservations'):
+            Base.metadata.create_all(connection, tables=[_reservations])
+    _table_ready.set()
+
+
+def _ensure_counter(table: str) -> None:
+    """
+    Registers the counter of `table`, starting after its highest ID, if it does not exist yet.
+
+    The row is committed on its own connection, so a writer whose transaction rolls back does not
+    take it away while the process still considers the table registered. The writer's locking read
+    of the counter (SELECT ... FOR UPDATE) sees it even inside an older snapshot.
+    """
+
+    if table in _registered:
+        return
+
+    try:
+        with engine.begin() as connection:
+            exists = connection.execute(
+                select(_reservations.c.Table_Name).where(_reservations.c.Table_Name == table)
+            ).first()
+            if not exists:
+                max_id = connection.execute(text(f"SELECT COALESCE(MAX(ID), 0) FROM {table}")).scalar()
+                connection.execute(insert(_reservations).values(Table_Name=table, Next_ID=int(max_id) + 1))
+    except IntegrityError:
+        # Another process registered it first
+        pass
+    _registered.add(table)
+
+
+def reserve_ids(table: str, count: int, connection=None) -> range:
+    """
+    Reserves `count` consecutive IDs of `table`.
+
+    The counter row of the table is locked (SELECT ... FOR UPDATE) while the block is taken, so two
+    processes never receive overlapping blocks. The block also starts after the highest ID already
+    in the table, so rows inserted without a reservation (e.g. by a migration script) are never
+    reused. Reserved IDs that end up unused are simply skipped, like AUTO_INCREMENT gaps.
+
+    Parameters:
+        table (str): One of `RESERVABLE_TABLES`.
+        count (int): Number of IDs to reserve (0 returns an empty range).
+        connection (sqlalchemy.engine.Connection, optional): Open connection inside the writer's
+            transaction. The reservation then commits or rolls back with the rows, and other writers
+            of the table wait for it. Without it, the reservation is committed on its own.
+
+    Returns:
+        range: The reserved IDs.
+
+    Raises:
+        ValueError: If the table does not support reservations or `count` is negative.
+
+    Example:
+        >>> with engine.begin() as connection:
+        ...     ids = reserve_ids('installments', len(df), connection)
+        ...     df.index = ids
+    """
+
+    if table not in RESERVABLE_TABLES:
+        raise ValueError(f"IDs of '{table}' cannot be reserved. Use one of: {', '.join(RESERVABLE_TABLES)}.")
+    if count < 0:
+        raise ValueError("The number of IDs to reserve cannot be negative.")
+    if count == 0:
+        return range(0)
+
+    _ensure_reservations_table()
+    _ensure_counter(table)
+
+    def take(conn) -> range:
+        # ✅ Step 1: Lock the counter of the table
+        next_id = conn.execute(
+            select(_reservations.c.Next_ID).where(_reservations.c.Table_Name == table).with_for_update()
+        ).scalar()
+
+        # ✅ Step 2: Never hand out IDs that rows inserted without a reservation already use
+        max_id = conn.execute(text(f"SELECT COALESCE(MAX(ID), 0) FROM {table}")).scalar()
+        start = max(int(next_id), int(max_id) + 1)
+
+        # ✅ Step 3: Move the counter past the block
+        conn.execute(update(_reservations).where(_reservations.c.Table_Name == table).values(Next_ID=start + count))
+
+        return range(start, start + count)
+
+    if connection is not None:
+        return take(connection)
+
+    with engine.begin() as conn:
+        return take(conn)
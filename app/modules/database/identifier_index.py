@@ -0,0 +1,207 @@
+import threading
+
+# Import your module
+from app.modules.database.connection import engine
+
+from sqlalchemy import text
+
+
+# Rows read on each refresh: only the ones above the highest ID already indexed
+_INDEX_QUERIES = {
+    'customers': "SELECT ID, CUIL, DNI FROM customers WHERE ID > :after ORDER BY ID",
+    'credits': "SELECT ID, ID_External, ID_Client, ID_BP, ID_Purch FROM credits WHERE ID > :after ORDER BY ID",
+    'portfolio_purchases': "SELECT ID, Resource FROM portfolio_purchases WHERE ID > :after ORDER BY ID",
+    'business_plan': "SELECT ID, ID_Company FROM business_plan WHERE ID > :after ORDER BY ID",
+}
+
+_index_lock = threading.Lock()
+_index = {}
+
+
+def _empty_index() -> dict:
+    """Returns the structure of an index with nothing loaded."""
+
+    return {
+        'watermarks': {table: 0 for table in _INDEX_QUERIES},
+        'CUIL': {},              # CUIL -> first customer ID
+        'DNI': {},               # DNI -> first customer ID
+        'ID_External': {},       # external ID -> credit IDs
+        'customer_credits': {},  # customer ID -> credit IDs
+        'credits': {},           # credit ID -> (ID_Client, ID_BP, ID_Purch)
+        'resource': {},          # purchase ID -> Resource flag
+        'business_plan': {},     # business plan ID -> company ID
+        'stale': False,
+    }
+
+
+def _key(column: str, value):
+    """
+    Converts a looked up value to the type the index stores, or None if it cannot be converted.
+
+    'ID_External' is a VARCHAR column, so it is compared as a string; the other identifiers are integers.
+    """
+
+    if value is None:
+        return None
+
+    if column == 'ID_External':
+        return str(value).strip()
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+
+def refresh_identifier_index(full: bool = False) -> int:
+    """
+    Adds to the identifier index the customers, credits, purchases and business plans created since
+    the last refresh.
+
+    The index is built on the first lookup and refreshed automatically when a lookup misses, so
+    calling this function is only needed after changing identifiers of existing rows (use `full`).
+
+    Parameters:
+        full (bool, optional): If True, discards the index and rebuilds it from scratch. Defaults to False.
+
+    Returns:
+        int: Number of rows added to the index.
+    """
+
+    global _index
+
+    with _index_lock:
+        if full or not _index or _index['stale']:
+            _index = _empty_index()
+
+        added = 0
+        with engine.connect() as connection:
+            for table, query in _INDEX_QUERIES.items():
+                rows = connection.execute(text(query), {'after': _index['watermarks'][table]}).all()
+                if not rows:
+                    continue
+                added += len(rows)
+                _index['watermarks'][table] = int(rows[-1][0])
+
+                if table == 'customers':
+                    for id_customer, cuil, dni in rows:
+                        # The first customer with the document wins, like the table scan did
+                        _index['CUIL'].setdefault(_key('CUIL', cuil), int(id_customer))
+                        _index['DNI'].setdefault(_key('DNI', dni), int(id_customer))
+                elif table == 'credits':
+                    for id_credit, id_external, id_client, id_bp, id_purch in rows:
+                        id_credit = int(id_credit)
+                        _index['credits'][id_credit] = (
+                            int(id_client),
+                            None if id_bp is None else int(id_bp),
+                            None if id_purch is None else int(id_purch)
+                        )
+                        _index['customer_credits'].setdefault(int(id_client), []).append(id_credit)
+                        if id_external is not None:
+                            _index['ID_External'].setdefault(_key('ID_External', id_external), []).append(id_credit)
+                elif table == 'portfolio_purchases':
+                    for id_purch, resource in rows:
+                        _index['resource'][int(id_purch)] = int(resource)
+                else:
+                    for id_bp, id_company in rows:
+                        _index['business_plan'][int(id_bp)] = int(id_company)
+
+    return added
+
+
+def invalidate_identifier_index() -> None:
+    """
+    Marks the identifier index to be rebuilt on the next lookup.
+
+    Writers that change the identifiers of existing customers or credits call it; new rows do not
+    need it, since they are picked up by the incremental refresh.
+    """
+
+    with _index_lock:
+        if _index:
+            _index['stale'] = True
+
+
+def _lookup(section: str, key):
+    """Reads `key` from a section of the index, refreshing the index once if it is not there."""
+
+    if not _index or _index['stale']:
+        refresh_identifier_index()
+
+    if key in _index[section]:
+        return _index[section][key]
+
+    # A miss may be a row created after the last refresh
+    if refresh_identifier_index():
+        return _index[section].get(key)
+
+    return None
+
+
+def find_customer(column: str, value):
+    """
+    Finds the customer with the given document.
+
+    Parameters:
+        column (str): 'CUIL' or 'DNI'.
+        value (int | str): The document.
+
+    Returns:
+        int | None: ID of the first customer with the document, or None if there is none.
+    """
+
+    key = _key(column, value)
+    return None if key is None else _lookup(column, key)
+
+
+def find_credits(column: str, value, id_supplier: int = None) -> list:
+    """
+    Finds the credits of an identifier.
+
+    Parameters:
+        column (str): 'CUIL', 'DNI', 'ID_Op' or 'ID_External'.
+        value (int | str): The identifier.
+        id_supplier (int, optional): For CUIL/DNI, keeps only the credits of business plans of this company.
+
+    Returns:
+        list: Credit IDs in table order (empty if there are none).
+    """
+
+    key = _key('ID_External' if column == 'ID_External' else 'ID', value)
+    if key is None:
+        return []
+
+    if column in ['CUIL', 'DNI']:
+        id_customer = find_customer(column, value)
+        id_credits = [] if id_customer is None else list(_lookup('customer_credits', id_customer) or [])
+        if id_supplier:
+            id_credits = [cid for cid in id_credits if _index['credits'][cid][1] is not None
+                          and _lookup('business_plan', _index['credits'][cid][1]) == id_supplier]
+        return id_credits
+    elif column == 'ID_Op':
+        return [key] if _lookup('credits', key) is not None else []
+    elif column == 'ID_External':
+        return list(_lookup('ID_External', key) or [])
+
+    raise ValueError(f"Invalid identifier type: {column}")
+
+
+def has_recourse(id_credit: int) -> bool:
+    """
+    Tells whether a credit was bought with recourse ('Resource' flag of its portfolio purchase).
+
+    Parameters:
+        id_credit (int): Credit ID.
+
+    Returns:
+        bool: True if the credit was bought with recourse; False if not, or if it was not bought.
+    """
+
+    credit = _lookup('credits', _key('ID', id_credit))
+    if credit is None or credit[2] is None:
+        return False
+
+    return _lookup('resource', credit[2]) == 1
@@ -1,10 +1,26 @@
-from pdf2image import convert_from_path
-import pytesseract
 import numpy as np
-from ollama import Client
 import re
+import threading
+
+# Ollama client, created on the first embedding or question
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the Ollama client, creating it on the first call.
+
+    Importing this module therefore neither imports `ollama` nor needs the Ollama server.
+    """
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            from ollama import Client
+            _client = Client()
+        return _client
 
-client = Client()
 
 def extract_text_from_pdf_ocr(pdf_path: str, lang: str = "spa") -> str:
     """
@@ -17,6 +33,9 @@ def extract_text_from_pdf_ocr(pdf_path: str, lang: str = "spa") -> str:
     Returns:
     - str: Combined OCR text from all pages.
     """
+    from pdf2image import convert_from_path
+    import pytesseract
+
     pages = convert_from_path(pdf_path, dpi=300)
     all_text = []
 
@@ -50,7 +69,7 @@ def get_embedding(text: str) -> np.ndarray:
     """
     Generates an embedding vector for the given text using Mistral via Ollama.
     """
-    response = client.embeddings(model='mistral', prompt=text)
+    response = get_client().embeddings(model='mistral', prompt=text)
     return np.array(response['embedding'])
 
 def retrieve_relevant_chunk(question: str, chunks: list[str]) -> str:
@@ -79,7 +98,7 @@ def ask_question_about_pdf(pdf_path: str, question: str, lang: str = "spa") -> s
     chunks = split_text(cleaned_text)
     context = retrieve_relevant_chunk(question, chunks)
 
-    response = client.chat(
+    response = get_client().chat(
         model="mistral",
         messages=[
             {"role": "system", "content": f"Contexto extraído del documento:\n{context}"},
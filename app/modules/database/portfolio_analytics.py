@@ -0,0 +1,384 @@
+import numpy as np
+import pandas as pd
+
+from enum import Enum
+
+
+class SelectionObjective(Enum):
+    """
+    Criterion used by `select_credits` to pick the credits of a sale.
+
+    GREEDY keeps the historical cut of `portfolio_seller`: credits are taken in the sorted order until
+    the first one that does not fit. LEFTOVER gets as close as possible to the target value. YIELD
+    maximizes the current value weighted by the rate (TEM) of the credits sold, within the target.
+    """
+    GREEDY = 'greedy'
+    LEFTOVER = 'leftover'
+    YIELD = 'yield'
+
+
+# Cells (credits × value units) of the exact mode's table, about 50 MB of booleans
+_EXACT_MAX_CELLS = 50_000_000
+
+# Books up to this many credits are solved exactly by enumerating two halves (2^20 subsets each)
+_ENUMERATION_MAX_CREDITS = 40
+
+
+def credit_aggregates(full_inst: pd.DataFrame) -> pd.DataFrame:
+    """
+    Totals the candidate installments of each credit, keeping the order they were sorted in.
+
+    Parameters:
+        full_inst (pd.DataFrame): Candidate installments with 'ID_Op', 'Capital', 'Amount_Financed',
+            'Current_Values' and 'TEM', sorted by the seller's preference.
+
+    Returns:
+        pd.DataFrame: Indexed by 'ID_Op' in order of first appearance, with the 'Current_Value',
+        'Amount_Financed' and 'Capital' of the credit, its 'TEM' and its number of installments ('N_Inst').
+    """
+
+    grouped = full_inst.groupby('ID_Op', sort=False)
+    aggregates = grouped[['Current_Values', 'Amount_Financed', 'Capital']].sum()
+    aggregates.columns = ['Current_Value', 'Amount_Financed', 'Capital']
+    aggregates['TEM'] = grouped['TEM'].first()
+    aggregates['N_Inst'] = grouped.size()
+
+    return aggregates
+
+
+def _greedy_cut(values: np.ndarray, va: float) -> np.ndarray:
+    """Takes credits in order until the first one that does not fit (the historical rule)."""
+
+    return np.cumsum(values) <= va
+
+
+def _first_fit(values: np.ndarray, order: np.ndarray, va: float) -> np.ndarray:
+    """Walks the credits in `order` and takes every one that still fits in what is left of `va`."""
+
+    selected = np.zeros(len(values), dtype=bool)
+    left = va
+    for i in order:
+        if values[i] <= left:
+            selected[i] = True
+            left -= values[i]
+
+    return selected
+
+
+def _improve_by_swaps(values: np.ndarray, selected: np.ndarray, va: float, rounds: int = 50) -> np.ndarray:
+    """
+    Reduces the leftover by swapping one selected credit for a larger unselected one that still fits.
+
+    Each round finds, for every selected credit, the largest unselected credit that fits in its value
+    plus the leftover (a binary search on the sorted unselected values), and applies the best swap.
+    """
+
+    selected = selected.copy()
+    for _ in range(rounds):
+        left = va - values[selected].sum()
+        inside, outside = np.flatnonzero(selected), np.flatnonzero(~selected)
+        if len(inside) == 0 or len(outside) == 0 or left <= 0:
+            break
+
+        by_value = outside[np.argsort(values[outside], kind='stable')]
+        sorted_values = values[by_value]
+        fits = np.searchsorted(sorted_values, values[inside] + left, side='right') - 1
+        valid = fits >= 0
+        if not valid.any():
+            break
+
+        gains = np.where(valid, sorted_values[np.maximum(fits, 0)] - values[inside], -np.inf)
+        best = int(np.argmax(gains))
+        if gains[best] <= 1e-9:
+            break
+
+        selected[inside[best]] = False
+        selected[by_value[fits[best]]] = True
+
+    return selected
+
+
+def _subset_sums(values: np.ndarray, gains: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Value and gain of every subset; bit i of a subset's position says whether credit i is in it."""
+
+    sums, totals = np.zeros(1), np.zeros(1)
+    for value, gain in zip(values, gains):
+        sums, totals = np.concatenate([sums, sums + value]), np.concatenate([totals, totals + gain])
+
+    return sums, totals
+
+
+def _enumerated_selection(values: np.ndarray, gains: np.ndarray, va: float) -> np.ndarray:
+    """
+    Solves the 0/1 knapsack of a small book exactly by meeting in the middle.
+
+    Every subset of each half is enumerated; for each subset of the first half, the best subset of the
+    second half that still fits is found with a binary search over the second half sorted by value
+    (with the running best gain).
+    """
+
+    n = len(values)
+    half = n // 2
+
+    sums_a, gains_a = _subset_sums(values[:half], gains[:half])
+    sums_b, gains_b = _subset_sums(values[half:], gains[half:])
+
+    # ✅ Best gain of the second half for every value limit
+    order = np.argsort(sums_b, kind='stable')
+    best_b = np.maximum.accumulate(gains_b[order])
+    best_pos = order[np.maximum.accumulate(np.where(gains_b[order] >= best_b, np.arange(len(order)), 0))]
+
+    # ✅ Combine each subset of the first half with the best fitting one of the second
+    fits = np.searchsorted(sums_b[order], va - sums_a + 1e-9, side='right') - 1
+    total = np.where(fits >= 0, gains_a + best_b[np.maximum(fits, 0)], -np.inf)
+    a = int(np.argmax(total))
+    b = int(best_pos[fits[a]])
+
+    bits = [(a >> i) & 1 for i in range(half)] + [(b >> i) & 1 for i in range(n - half)]
+    return np.array(bits, dtype=bool)
+
+
+def _exact_selection(values: np.ndarray, gains: np.ndarray, va: float, max_cells: int) -> np.ndarray:
+    """
+    Solves the 0/1 knapsack of the credits with dynamic programming over value units.
+
+    Values are rounded up to units of `va / units`, so every selection found fits in `va`; the result is
+    exact at that resolution (one peso or finer for most books). The table keeps, for every credit and
+    capacity, whether the credit is taken, so the selection can be read back.
+
+    Raises:
+        ValueError: If the book is too large for the table.
+    """
+
+    n = len(values)
+    units = int(min(200_000, max_cells // max(n, 1)))
+    if units < 100:
+        raise ValueError(f"❌ {n:,} credits are too many for the exact selection. Use the heuristic (exact=False).")
+
+    resolution = max(va / units, 0.01)
+    capacity = int(np.floor(va / resolution))
+    weights = np.ceil(values / resolution - 1e-9).astype(int)
+
+    best = np.zeros(capacity + 1)
+    taken = np.zeros((n, capacity + 1), dtype=bool)
+
+    for i in range(n):
+        w = weights[i]
+        if w > capacity:
+            continue
+        candidate = best[:capacity + 1 - w] + gains[i]
+        better = candidate > best[w:] + 1e-12
+        taken[i, w:] = better
+        best[w:] = np.where(better, candidate, best[w:])
+
+    # ✅ Read the selection back from the last capacity
+    selected = np.zeros(n, dtype=bool)
+    c = capacity
+    for i in range(n - 1, -1, -1):
+        if taken[i, c]:
+            selected[i] = True
+            c -= weights[i]
+
+    return selected
+
+
+def select_credits(
+        aggregates: pd.DataFrame,
+        va: float,
+        objective: SelectionObjective = SelectionObjective.LEFTOVER,
+        exact: bool = False,
+        max_cells: int = _EXACT_MAX_CELLS) -> tuple[pd.Index, dict]:
+    """
+    Picks whole credits whose current value adds up to at most `va`.
+
+    The heuristic fills the target with a first-fit pass (in the seller's order for LEFTOVER, by rate
+    for YIELD) and, for LEFTOVER, then swaps credits to close the remaining gap. Both steps work on
+    per-credit totals, so a book of 500,000 installments is solved well within a second. `exact` solves
+    the knapsack instead: books of up to 40 credits by enumerating both halves (exact to the cent), and
+    books of up to a few hundred credits by dynamic programming over value units of `va` / 200,000 or finer.
+
+    Parameters:
+        aggregates (pd.DataFrame): Output of `credit_aggregates`.
+        va (float): Target value of the sale (the most the buyer pays).
+        objective (SelectionObjective, optional): What to optimize. Defaults to LEFTOVER.
+        exact (bool, optional): If True, solves the selection exactly (see above). Defaults to False.
+        max_cells (int, optional): Largest table (credits × value units) the exact mode may build.
+
+    Returns:
+        tuple:
+            - pd.Index: IDs of the selected credits, in the seller's order.
+            - dict: Comparison with the greedy cut: 'method', 'n_credits', 'value', 'leftover' and 'yield'
+              (value-weighted TEM) of the selection, the same for the greedy cut ('greedy_n_credits',
+              'greedy_value', 'greedy_leftover', 'greedy_yield') and the improvement ('leftover_saved',
+              'yield_gain').
+
+    Raises:
+        ValueError: If `exact` is requested for a book too large for the table.
+
+    Example:
+        >>> aggregates = credit_aggregates(full_inst)
+        >>> ids, report = select_credits(aggregates, 25_000_000.0)
+        >>> report['leftover_saved']
+    """
+
+    values = aggregates['Current_Value'].to_numpy(dtype=float)
+    tem = aggregates['TEM'].to_numpy(dtype=float)
+
+    # ✅ Step 1: Historical greedy cut, the baseline to beat
+    greedy = _greedy_cut(values, va)
+
+    # ✅ Step 2: Selection for the requested objective
+    if objective == SelectionObjective.GREEDY:
+        selected, method = greedy, 'greedy'
+    elif exact:
+        gains = values if objective == SelectionObjective.LEFTOVER else values * tem
+        if len(values) <= _ENUMERATION_MAX_CREDITS:
+            selected, method = _enumerated_selection(values, gains, va), 'exact'
+        else:
+            selected, method = _exact_selection(values, gains, va, max_cells), 'exact (value units)'
+            if objective == SelectionObjective.LEFTOVER:
+                selected = _improve_by_swaps(values, selected, va)
+    elif objective == SelectionObjective.LEFTOVER:
+        selected = _improve_by_swaps(values, _first_fit(values, np.arange(len(values)), va), va)
+        method = 'first fit + swaps'
+    else:
+        selected = _first_fit(values, np.argsort(-tem, kind='stable'), va)
+        method = 'first fit by rate'
+
+    # ✅ Step 3: Keep whichever is better, the greedy cut is always a valid answer
+    def summary(mask):
+        value = values[mask].sum()
+        return {
+            'n_credits': int(mask.sum()),
+            'value': round(value, 2),
+            'leftover': round(va - value, 2),
+            'yield': float((values[mask] * tem[mask]).sum() / value) if value else 0.0
+        }
+
+    chosen, baseline = summary(selected), summary(greedy)
+    if objective == SelectionObjective.LEFTOVER and chosen['leftover'] > baseline['leftover']:
+        selected, chosen, method = greedy, baseline, 'greedy'
+    elif objective == SelectionObjective.YIELD and (values[selected] * tem[selected]).sum() < (values[greedy] * tem[greedy]).sum():
+        selected, chosen, method = greedy, baseline, 'greedy'
+
+    report = {'method': method, **chosen, **{f'greedy_{key}': value for key, value in baseline.items()}}
+    report['leftover_saved'] = round(baseline['leftover'] - chosen['leftover'], 2)
+    report['yield_gain'] = chosen['yield'] - baseline['yield']
+
+    return aggregates.index[selected], report
+
+
+def present_values(amounts, days, tna: float) -> np.ndarray:
+    """
+    Discounts amounts due in `days` days at a nominal annual rate with daily compounding.
+
+    Parameters:
+        amounts (array-like): Amounts to discount.
+        days (array-like): Days from the valuation date to each amount.
+        tna (float): Nominal annual rate (TNA), compounded daily over 365 days.
+
+    Returns:
+        np.ndarray: Present value of each amount.
+    """
+
+    return np.asarray(amounts, dtype=float) / (1.0 + tna / 365.0) ** np.asarray(days, dtype=float)
+
+
+def _day_numbers(dates) -> np.ndarray:
+    """Days since the epoch of timestamps or daily periods."""
+
+    dates = pd.Series(dates)
+    if isinstance(dates.dtype, pd.PeriodDtype):
+        dates = dates.dt.to_timestamp()
+
+    return pd.to_datetime(dates).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+def daily_flows(dates, amounts) -> tuple[pd.Timestamp, np.ndarray]:
+    """
+    Nets cash flows by day into a dense daily array, with a single `bincount`.
+
+    Parameters:
+        dates (array-like): Date of each flow (timestamps or daily periods).
+        amounts (array-like): Amount of each flow (negative for outflows).
+
+    Returns:
+        tuple:
+            - pd.Timestamp: Date of the first day of the array.
+            - np.ndarray: Net flow of every day from the first to the last one with flows.
+    """
+
+    days = _day_numbers(dates)
+    first = days.min()
+    flows = np.bincount(days - first, weights=np.asarray(amounts, dtype=float))
+
+    return pd.Timestamp(np.datetime64(int(first), 'D')), flows
+
+
+def _npv(rate: float, periods: np.ndarray, amounts: np.ndarray) -> tuple[float, float]:
+    """Net present value of the flows at `rate` per period, and its derivative."""
+
+    discount = (1.0 + rate) ** -periods
+    return (amounts * discount).sum(), (-periods * amounts * discount / (1.0 + rate)).sum()
+
+
+def irr(flows, guess: float = 0.001, tol: float = 1e-12, max_iter: int = 100) -> float:
+    """
+    Internal rate of return per period of evenly spaced flows (e.g. the output of `daily_flows`).
+
+    Only the periods with a flow are evaluated, so years of daily periods cost as much as the dates
+    that actually have flows. Newton's method runs first; if it leaves the range or does not converge,
+    the rate is bisected on the first sign change of the NPV found on a grid of rates in (-0.99, 10).
+
+    Parameters:
+        flows (array-like): Net flow of each period (negative for outflows), in order.
+        guess (float, optional): Starting rate of Newton's method. Defaults to 0.001 (per day).
+        tol (float, optional): Convergence tolerance on the rate. Defaults to 1e-12.
+        max_iter (int, optional): Maximum Newton iterations and bisection halvings. Defaults to 100.
+
+    Returns:
+        float: Rate per period, or NaN if the flows have no rate (e.g. all of the same sign).
+
+    Example:
+        >>> start, flows = daily_flows(dates, amounts)
+        >>> irr(flows) * 30  # approximate monthly rate
+    """
+
+    flows = np.asarray(flows, dtype=float)
+    periods = np.flatnonzero(flows).astype(float)
+    amounts = flows[flows != 0.0]
+    if len(amounts) == 0 or (amounts > 0).all() or (amounts < 0).all():
+        return np.nan
+
+    # ✅ Step 1: Newton's method
+    rate = guess
+    with np.errstate(all='ignore'):
+        for _ in range(max_iter):
+            value, slope = _npv(rate, periods, amounts)
+            step = value / slope
+            if not np.isfinite(step) or rate - step <= -0.99:
+                break
+            rate -= step
+            if abs(step) < tol:
+                return rate
+
+        # ✅ Step 2: Bisection on the first bracket with a sign change
+        grid = np.concatenate([-np.logspace(np.log10(0.99), -8, 60), [0.0], np.logspace(-8, 1, 120)])
+        values = np.array([_npv(r, periods, amounts)[0] for r in grid])
+        change = np.flatnonzero(np.isfinite(values[:-1]) & np.isfinite(values[1:]) & (np.sign(values[:-1]) != np.sign(values[1:])))
+        if len(change) == 0:
+            return np.nan
+
+        low, high = grid[change[0]], grid[change[0] + 1]
+        value_low = values[change[0]]
+        for _ in range(max_iter):
+            mid = (low + high) / 2.0
+            value_mid = _npv(mid, periods, amounts)[0]
+            if np.sign(value_mid) == np.sign(value_low):
+                low, value_low = mid, value_mid
+            else:
+                high = mid
+            if high - low < tol:
+                break
+
+    return (low + high) / 2.0
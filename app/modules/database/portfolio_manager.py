@@ -1,18 +1,52 @@
 import os, sys
+import numpy as np
 import pandas as pd
-import numpy_financial as npf
-from sqlalchemy import MetaData, Table
-from sqlalchemy.orm import Session
-from PyQt6.QtWidgets import QApplication, QFileDialog
+import threading
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import MetaData, Table, Column, Integer, insert, inspect, text
 
 
 # Import your module
 from app.modules.database.connection import engine
-from app.modules.database.customers import id_province, categorical_gender, add_customer, MaritalStatus
-from app.modules.database.credit_manager import new_credit, credits_balance
+from app.modules.database.customers import province_ids, gender_codes, upsert_customers, MaritalStatus
+from app.modules.database.credit_manager import new_credits as create_credits, credits_balance, BalanceEngine
+from app.modules.database.balance_store import apply_collections
+from app.modules.database.id_reservations import reserve_ids
+from app.modules.database.structur_databases import Base, SaleScenario
+from app.modules.database.amortization import solve_rates
+from app.modules.database.portfolio_analytics import (
+    SelectionObjective,
+    credit_aggregates,
+    select_credits,
+    present_values,
+    daily_flows,
+    irr
+)
+
+
+# Qt application, created on the first folder dialog
+_qt_app = None
+
+# 'credits' and 'installments' as reflected by the first sale
+_sale_metadata = None
+_sale_metadata_lock = threading.Lock()
+
+
+def _select_folder(title: str = "Select a Folder") -> str:
+    """
+    Asks the user for a folder with a Qt dialog.
+
+    PyQt6 is imported and the `QApplication` created on the first call, so importing this module
+    does not need a GUI stack (batch workers and headless servers never reach this function).
+    """
+    global _qt_app
+    from PyQt6.QtWidgets import QApplication, QFileDialog
 
+    if QApplication.instance() is None:
+        _qt_app = QApplication(sys.argv)
 
-app = QApplication(sys.argv)
+    return QFileDialog.getExistingDirectory(None, title)
 
 
 def validate_supplier_and_business_plan(id_supplier: int, id_bp: int):
@@ -249,10 +283,10 @@ def update_customers(df: pd.DataFrame, date, save: bool = True):
     customers = pd.read_sql('customers', engine, index_col='ID')
 
     # ✅ Step 2: Process required fields
-    df['ID_Province'] = df['Province'].apply(id_province)
-    df['ID_Empl_Prov'] = df['Empl_Prov'].apply(id_province)
+    df['ID_Province'] = province_ids(df['Province'])
+    df['ID_Empl_Prov'] = province_ids(df['Empl_Prov'])
     df['Last_Update'] = date
-    df['Gender'] = df['Gender'].apply(categorical_gender)
+    df['Gender'] = gender_codes(df['Gender'])
     df['Country'] = df['Country'].fillna('Argentina')
 
     # ✅ Step 3: Keep only columns that exist in the customers table
@@ -265,14 +299,8 @@ def update_customers(df: pd.DataFrame, date, save: bool = True):
 
     # ✅ Step 5: Save data if `save=True`
     if save:
-        # Save new customers to the database
-        if not new_customers.empty:
-            new_customers.to_sql('customers', engine, index=False, if_exists='append')
-
-        # Update existing customers
-        if not existing_customers.empty:
-            for _, row in existing_customers.iterrows():
-                add_customer(customer=row.to_frame().T)
+        # Insert the new customers and update the existing ones in one transaction
+        upsert_customers(pd.concat([existing_customers, new_customers]), customers)
 
         # Reload updated customers table
         customers = pd.read_sql('customers', engine, index_col='ID')
@@ -280,7 +308,8 @@ def update_customers(df: pd.DataFrame, date, save: bool = True):
 
     else:
         # ✅ Step 6: Update indices for local changes
-        existing_customers.index = existing_customers['CUIL'].apply(lambda cuil: customers.index[customers['CUIL'] == cuil].tolist()[0])
+        id_by_cuil = customers.reset_index().drop_duplicates('CUIL').set_index('CUIL')['ID']
+        existing_customers.index = existing_customers['CUIL'].map(id_by_cuil)
         new_customers.index = range(customers.index.max() + 1, customers.index.max() + 1 + len(new_customers))
         
         # Merge existing and new customers
@@ -300,8 +329,12 @@ def add_portfolio_purchase(date, id_supplier, tna, buyback, resource, iva, save=
     Returns:
         int: The new portfolio purchase ID.
     """
-    id_purch = pd.read_sql("SELECT MAX(ID) FROM portfolio_purchases", engine).iloc[0, 0]
-    id_purch = 1 if pd.isna(id_purch) else int(id_purch) + 1
+    # ✅ Reserve the purchase ID when saving; otherwise only preview it
+    if save:
+        id_purch = reserve_ids('portfolio_purchases', 1)[0]
+    else:
+        id_purch = pd.read_sql("SELECT MAX(ID) FROM portfolio_purchases", engine).iloc[0, 0]
+        id_purch = 1 if pd.isna(id_purch) else int(id_purch) + 1
 
     new_purchase = pd.DataFrame([{
         'ID': id_purch,
@@ -341,96 +374,73 @@ def process_portfolio(df, new_customers, id_bp, id_purch, iva, date, save=True):
             - new_credits (pd.DataFrame): Newly generated credits.
             - installments (pd.DataFrame): Newly generated installments.
             - collections (pd.DataFrame): Collections data based on installment conditions.
+
+    Raises:
+        Exception: Any error saving the data, after the transaction is rolled back.
     """
 
-    # ✅ Step 1: Calculate TEM_W_IVA where necessary
+    # ✅ Step 1: Calculate TEM_W_IVA where necessary, solving all the missing rates at once
     filter = df['TEM_W_IVA'].isna() | (df['TEM_W_IVA'] == 0)
-    df.loc[filter, 'TEM_W_IVA'] = df.loc[filter].apply(
-        lambda row: npf.rate(row['N_Inst'], row['V_Inst'], -row['Cap_Grant'], 0.0, guess=0.1), axis=1
-    )
-
-    # ✅ Step 2: Get last credit ID to ensure unique IDs for new credits
-    last_credit = pd.read_sql("SELECT MAX(ID) FROM credits", engine).iloc[0, 0]
-    last_credit = 0 if pd.isna(last_credit) else int(last_credit)
-
-    # ✅ Step 3: Generate new credits and installments
-    new_credits = []
-    installments = []
-
-    for _, row in df.iterrows():
-        last_credit += 1
-        nc, insts = new_credit(
-            id_customer=new_customers.loc[new_customers['CUIL'] == row['CUIL']].index[0],
-            Date_Settlement=row['Date_Settlement'],
-            ID_BP=id_bp,
-            Cap_Requested=row['Cap_Requested'],
-            Cap_Grant=row['Cap_Grant'],
-            N_Inst=row['N_Inst'],
-            TEM_W_IVA=row['TEM_W_IVA'],
-            V_Inst=row['V_Inst'],
-            D_F_Due=row['D_F_Due'],
-            ID_Purch=id_purch,
-            First_Inst_Purch=row['First_Inst_Purch'],
-            ID_Sale=None,
-            First_Inst_Sold=0,
-            id_external=row.name,
-            massive=last_credit
-        )
-        new_credits.append(nc)
-        installments.append(insts)
-
-    # ✅ Step 4: Concatenate all new credits and installments
-    new_credits = pd.concat(new_credits, ignore_index=False)
-    new_credits['First_Inst_Purch'] = new_credits['First_Inst_Purch'].astype(int)
-
-    installments = pd.concat(installments, ignore_index=False, join='outer')
-
-    # ✅ Step 5: Get last installment ID from the database
-    last_inst = pd.read_sql("SELECT MAX(ID) FROM installments", engine).iloc[0, 0]
-    last_inst = 0 if pd.isna(last_inst) else int(last_inst)
-
-    # ✅ Step 6: Assign new unique IDs to installments
-    installments.reset_index(drop=True, inplace=True)
-    installments.index = range(last_inst + 1, last_inst + 1 + len(installments))
-
-    # ✅ Step 7: Handle IVA (set to 0 if not applicable)
-    if not iva:
-        installments['IVA'] = 0.0
-        installments['Total'] = installments['Capital'] + installments['Interest']
-
-    # ✅ Step 8: Ensure correct data types
-    installments['ID_Op'] = installments['ID_Op'].astype(int)
-    installments['Nro_Inst'] = installments['Nro_Inst'].astype(int)
-
-    # ✅ Step 9: Process collections
-    collections = pd.DataFrame(columns=['ID_Inst', 'D_Emission', 'Type_Collection', 'Capital', 'Interest', 'IVA', 'Total'])
-    collections.index.name = 'ID'
-    
-    j = 0 
-    for i in installments.index:
-        f_inst_purch = new_credits.loc[installments.loc[i, 'ID_Op'], 'First_Inst_Purch']
-        if installments.loc[i, 'Nro_Inst'] < f_inst_purch:
-            j += 1
-            collections.loc[j] = {
-                'ID_Inst': i,
-                'D_Emission': date,
-                'Type_Collection': 'NO COMPRADA',
-                'Capital': installments.loc[i, 'Capital'],
-                'Interest': installments.loc[i, 'Interest'],
-                'IVA': installments.loc[i, 'IVA'],
-                'Total': installments.loc[i, 'Total']
-            }
-
-    # ✅ Step 10: Save data if `save=True`
+    if filter.any():
+        rates, failed = solve_rates(df.loc[filter, 'N_Inst'], df.loc[filter, 'V_Inst'], df.loc[filter, 'Cap_Grant'])
+        if failed.any():
+            rows = ', '.join(str(i) for i in df.index[filter][failed][:10])
+            raise ValueError(f"❌ No monthly rate matches the installment value of {failed.sum():,} credits (rows: {rows}).")
+        df.loc[filter, 'TEM_W_IVA'] = rates
+
+    # ✅ Step 2: Prepare the credits of the file, one row each
+    id_clients = pd.Series(new_customers.index, index=new_customers['CUIL'])
+    id_clients = id_clients.loc[~id_clients.index.duplicated()]
+    credits_data = pd.DataFrame({
+        'ID_External': df.index,
+        'ID_Client': df['CUIL'].map(id_clients).to_numpy(),
+        'Date_Settlement': df['Date_Settlement'].to_numpy(),
+        'ID_BP': id_bp,
+        'Cap_Requested': df['Cap_Requested'].to_numpy(),
+        'Cap_Grant': df['Cap_Grant'].to_numpy(),
+        'N_Inst': df['N_Inst'].to_numpy(),
+        'TEM_W_IVA': df['TEM_W_IVA'].to_numpy(),
+        'V_Inst': df['V_Inst'].to_numpy(),
+        'D_F_Due': df['D_F_Due'].to_numpy(),
+        'ID_Purch': id_purch,
+        'First_Inst_Purch': df['First_Inst_Purch'].to_numpy(),
+        'First_Inst_Sold': 0
+    })
+
+    def not_purchased(credits, installments):
+        # Installments before the first purchased one are collected as 'NO COMPRADA'
+        first_purch = installments['ID_Op'].map(credits['First_Inst_Purch'])
+        rows = installments.loc[installments['Nro_Inst'] < first_purch]
+        collections = pd.DataFrame({
+            'ID_Inst': rows.index,
+            'D_Emission': pd.Timestamp(date).as_unit('ns'),
+            'Type_Collection': 'NO COMPRADA',
+            'Capital': rows['Capital'].to_numpy(),
+            'Interest': rows['Interest'].to_numpy(),
+            'IVA': rows['IVA'].to_numpy(),
+            'Total': rows['Total'].to_numpy()
+        }, index=pd.RangeIndex(1, len(rows) + 1, name='ID'))
+        return collections
+
+    # ✅ Step 3: Generate credits, installments and collections, saving them in one transaction if required
     if save:
         try:
-            new_credits.to_sql('credits', engine, index=False, if_exists='append')
-            installments.to_sql('installments', engine, index=False, if_exists='append')
-            collections.to_sql('collection', engine, index=False, if_exists='append')
+            with engine.begin() as connection:
+                new_credits, installments = create_credits(credits_data, iva=iva, save=True, connection=connection)
+                collections = not_purchased(new_credits, installments)
+                collections.index = pd.Index(reserve_ids('collection', len(collections), connection), name='ID')
+                collections.to_sql('collection', connection, index=True, if_exists='append')
+                apply_collections(connection, collections)
 
             print("✅ Portfolio processing completed successfully.")
+            return new_credits, installments, collections
         except Exception as e:
+            # Nothing was written: do not hand back an unsaved preview as if it were
             print(f"❌ Error saving portfolio data: {e}")
+            raise
+
+    new_credits, installments = create_credits(credits_data, iva=iva)
+    collections = not_purchased(new_credits, installments)
 
     return new_credits, installments, collections
 
@@ -597,58 +607,92 @@ def translate_seller(full_inst, credits, customers, sheet_names):
     customers['Estado Civil'] = customers['Estado Civil'].map(marital_status_translations)
 
 
-def sell_to_sql(ps, full_inst, id_company, id_sale):
+def _sale_tables():
+    """
+    Returns the 'credits' and 'installments' tables, reflected from the database the first time
+    and cached for the life of the process.
+    """
+    global _sale_metadata
+
+    with _sale_metadata_lock:
+        if _sale_metadata is None:
+            metadata = MetaData()
+            metadata.reflect(bind=engine, only=['credits', 'installments'])
+            _sale_metadata = metadata
+        return _sale_metadata.tables['credits'], _sale_metadata.tables['installments']
+
+
+def sell_to_sql(ps, full_inst, id_company):
     """
     Sells a portfolio of credits and updates related tables in a SQL database.
 
+    The sold installments and the first installment sold of each credit are staged in temporary
+    tables and the owners are transferred with two join-UPDATEs, all in one transaction with the
+    insert of the sale.
+
     Parameters:
     - ps (pd.DataFrame): DataFrame containing portfolio sales data.
-    - full_inst (pd.DataFrame): DataFrame containing installment data.
-    - id_company (int): ID of the company owning the portfolio.
-    - id_sale (int): ID of the sale transaction.
+    - full_inst (pd.DataFrame): DataFrame containing installment data, indexed by installment ID.
+    - id_company (int): ID of the company buying the portfolio.
 
     Returns:
-    - id_sale (int): The ID of the sale transaction after updating the database.
+    - id_sale (int): The ID of the sale transaction.
     """
 
-    # Append the portfolio sales data to the 'portfolio_sales' table in the database
-    ps.to_sql('portfolio_sales', engine, index=False, if_exists='append')
-
-    # Retrieve the maximum ID from the 'portfolio_sales' table to update the sale ID
-    id_sale = pd.read_sql('portfolio_sales', engine, index_col='ID').index.max()
-    ps.index = [id_sale]  # Update the index of the portfolio sales DataFrame
-
-    # Reflect the database schema and load the 'credits' and 'installments' tables
-    metadata = MetaData()
-    metadata.reflect(bind=engine)
-    crts = Table('credits', metadata, autoload_with=engine)
-    insts = Table('installments', metadata, autoload_with=engine)
-
-    # Use a database session to update the 'credits' and 'installments' tables
-    with Session(engine) as session:
-        # Group installment data by operation ID and find the minimum installment number
-        funded_credits = full_inst.groupby('ID_Op')['Nro_Inst'].min()
+    crts, insts = _sale_tables()
 
-        # Update the 'credits' table with the sale ID and first installment sold
-        for i in funded_credits.index:
-            stmt = crts.update().where(crts.c.ID == i).values(
-                ID_Sale=id_sale, First_Inst_Sold=funded_credits[i]
-            )
-            session.execute(stmt)
-
-        # Update the 'installments' table with the company ID as the new owner
-        for i in full_inst.index:
-            stmt = insts.update().where(insts.c.ID == i).values(ID_Owner=id_company)
-            session.execute(stmt)
+    # Staging tables, private to the connection that creates them
+    staging = MetaData()
+    sold_insts = Table(
+        '_sold_installments', staging,
+        Column('ID', Integer, primary_key=True),
+        prefixes=['TEMPORARY']
+    )
+    sold_crts = Table(
+        '_sold_credits', staging,
+        Column('ID', Integer, primary_key=True),
+        Column('First_Inst_Sold', Integer),
+        prefixes=['TEMPORARY']
+    )
 
-        # Commit the changes to the database
-        session.commit()
+    # First installment sold of each credit
+    funded_credits = full_inst.groupby('ID_Op')['Nro_Inst'].min()
 
-    # Return the updated sale ID
+    with engine.connect() as connection:
+        try:
+            with connection.begin():
+                # ✅ Step 1: Reserve the sale ID and append the portfolio sales data with it
+                id_sale = reserve_ids('portfolio_sales', 1, connection=connection)[0]
+                ps.index = pd.Index([id_sale], name='ID')
+                ps.drop(columns=['ID'], errors='ignore').to_sql('portfolio_sales', connection, index=True, if_exists='append')
+
+                # ✅ Step 2: Stage the sold installments and credits
+                staging.create_all(connection)
+                connection.execute(insert(sold_insts), [{'ID': int(i)} for i in full_inst.index])
+                connection.execute(insert(sold_crts), [
+                    {'ID': int(i), 'First_Inst_Sold': int(n)} for i, n in funded_credits.items()
+                ])
+
+                # ✅ Step 3: Transfer the installments and mark the credits as sold
+                connection.execute(
+                    insts.update().where(insts.c.ID == sold_insts.c.ID).values(ID_Owner=id_company)
+                )
+                connection.execute(
+                    crts.update().where(crts.c.ID == sold_crts.c.ID)
+                    .values(ID_Sale=id_sale, First_Inst_Sold=sold_crts.c.First_Inst_Sold)
+                )
+        finally:
+            # ✅ Step 4: Drop the staging tables after the commit or the rollback, so the pooled connection does not keep them
+            connection.execute(text("DROP TEMPORARY TABLE IF EXISTS _sold_installments, _sold_credits"))
+            connection.commit()
+
+    print(f"✅ Sale {id_sale}: {len(full_inst):,} installments of {len(funded_credits):,} credits transferred to company {id_company}.")
+
+    # Return the sale ID
     return id_sale
 
 
-def export_sell(customers, sheet_names, full_inst, credits, date, id_sale):
+def export_sell(customers, sheet_names, full_inst, credits, date, id_sale, folder=None):
     """
     Exports customer, credit, and installment data to an Excel file in a selected folder.
 
@@ -659,13 +703,14 @@ def export_sell(customers, sheet_names, full_inst, credits, date, id_sale):
     - credits (pd.DataFrame): DataFrame containing credit data.
     - date (str): Date of the sale transaction, used in the file name.
     - id_sale (int): ID of the sale transaction, used in the file name.
+    - folder (str, optional): Export folder. If omitted, a folder selection dialog is opened.
 
     Returns:
     None (exports data to an Excel file in the selected folder).
     """
 
-    # Open a folder selection dialog for the user to choose the export location
-    folder_selected = QFileDialog.getExistingDirectory(None, "Select a Folder")
+    # Open a folder selection dialog for the user to choose the export location, unless one was given
+    folder_selected = folder if folder is not None else _select_folder()
     
     # Raise an error if no folder is selected
     if folder_selected == '':
@@ -683,6 +728,99 @@ def export_sell(customers, sheet_names, full_inst, credits, date, id_sale):
         full_inst.to_excel(writer, sheet_name=sheet_names[2], index=True)
 
 
+def load_sale_candidates(date: pd.Period):
+    """
+    Loads the installments the company can sell at `date`: those it still owns and that have no
+    collections, past due ones included, with the columns every sale scenario needs.
+
+    Parameters:
+        date (pd.Period): Reference date of the sale.
+
+    Returns:
+        tuple:
+            - pd.DataFrame: Candidate installments with the days from `date` to the due date (column
+              named after `date`), 'TEM', 'D_Emission' and 'Amount_Financed'.
+            - pd.DataFrame: The 'credits' table.
+    """
+
+    # ✅ Step 1: Installments without collections still owned by the company
+    installments = pd.read_sql('installments', engine, index_col='ID')
+    installments['D_Due'] = installments['D_Due'].dt.to_period('D')
+    balance = credits_balance(mode=BalanceEngine.TABLE, id_owner=1, columns=['Total'])
+
+    # Outstanding installments whose balance is still their full amount
+    untouched = balance.index[balance['Total'] == installments['Total'].reindex(balance.index)]
+    pool = installments.loc[installments.index.isin(untouched)].copy()
+
+    # ✅ Step 2: Days to the due date, TEM and emission date of each installment
+    pool[f'{date}'] = pd.PeriodIndex(pool['D_Due']).asi8 - date.ordinal
+    credits = pd.read_sql('credits', engine, index_col='ID')
+    pool['TEM'] = pool['ID_Op'].map(credits['TEM_W_IVA'])
+    pool['D_Emission'] = pool['ID_Op'].map(credits['Date_Settlement'])
+    pool['Amount_Financed'] = pool['Capital'] + pool['Interest']
+
+    return pool, credits
+
+
+def _sort_columns(sort_by_tem: bool, sort_by_emission: bool, sort_tem_emission: bool) -> list:
+    """Returns the columns the candidate installments are sorted by."""
+
+    if sort_tem_emission and sort_by_tem and sort_by_emission:
+        return ['TEM', 'D_Emission', 'ID_Op', 'Nro_Inst']
+    elif sort_by_tem and not sort_by_emission:
+        return ['TEM', 'ID_Op', 'Nro_Inst']
+    elif sort_by_emission:
+        return ['D_Emission', 'ID_Op', 'Nro_Inst']
+    return ['ID_Op', 'Nro_Inst']
+
+
+def _scenario_installments(pool, date, tna, va, sort_by_tem=False, sort_by_emission=False, sort_tem_emission=False,
+                           asc=True, default=False, iva=False, selection=SelectionObjective.GREEDY, exact=False):
+    """
+    Prices one sale over the candidates of `load_sale_candidates`, without reading the database.
+
+    Returns:
+        tuple: The installments sold, with 'Current_Values' and 'Accumulated_CV', and the report of
+        `select_credits`.
+    """
+
+    # ✅ Step 1: Past due installments are only sold with `default`
+    full_inst = pool.copy() if default else pool.loc[pool['D_Due'] >= date].copy()
+
+    # ✅ Step 2: Adjust for IVA if applicable
+    if iva:
+        full_inst['IVA'] = 0.0
+        full_inst['Total'] = full_inst['Capital'] + full_inst['Interest']
+
+    # ✅ Step 3: Sort and discount the installments at the TNA
+    full_inst.sort_values(by=_sort_columns(sort_by_tem, sort_by_emission, sort_tem_emission), ascending=asc, inplace=True)
+    full_inst['Current_Values'] = present_values(full_inst['Amount_Financed'], full_inst[f'{date}'], tna)
+
+    # ✅ Step 4: Select whole credits that fit in the available funds (va)
+    selected, report = select_credits(credit_aggregates(full_inst), va, selection, exact)
+    full_inst = full_inst.loc[full_inst['ID_Op'].isin(selected)].copy()
+    full_inst['Accumulated_CV'] = full_inst['Current_Values'].cumsum()
+
+    return full_inst, report
+
+
+def _sale_irr(full_inst: pd.DataFrame) -> float:
+    """
+    Returns the monthly IRR (30 days) of the installments sold: their capital goes out at the emission
+    date and their amount financed comes in at the due date.
+    """
+
+    fall_inst = full_inst.groupby(['D_Emission', 'D_Due'])[['Capital', 'Amount_Financed']].sum()
+    emissions = pd.to_datetime(fall_inst.index.get_level_values('D_Emission'))
+    dues = fall_inst.index.get_level_values('D_Due').to_timestamp()
+    _, flow = daily_flows(
+        emissions.append(dues),
+        np.concatenate([-fall_inst['Capital'].to_numpy(), fall_inst['Amount_Financed'].to_numpy()])
+    )
+
+    return irr(flow) * 30
+
+
 def portfolio_seller(
         date: pd.Period,
         tna: float,
@@ -697,7 +835,10 @@ def portfolio_seller(
         iva: bool = False,
         save: bool = False,
         es: bool = False,
-        export: bool = False):
+        export: bool = False,
+        folder: str = None,
+        selection: SelectionObjective = SelectionObjective.GREEDY,
+        exact: bool = False):
     """
     Perform portfolio analysis for salle, filter installments, calculate financial values, and optionally save results.
 
@@ -716,89 +857,29 @@ def portfolio_seller(
         save (bool): If True, save the results to the database.
         es (bool): If True, translate field names to Spanish.
         export (bool): If True, export results to an Excel file.
+        folder (str, optional): Folder of the Excel export. If omitted, a folder selection dialog is opened.
+        selection (SelectionObjective): How whole credits are picked to reach `va` (see `select_credits`).
+            GREEDY (default) keeps the sorted cut; LEFTOVER and YIELD optimize and print the gain over it.
+        exact (bool): If True, solves the selection exactly (small books only).
 
     Returns:
         tuple: Filtered installments (`full_inst`), credits (`credits`), customers (`customers`), and portfolio sales (`ps`).
     """
 
-    # Step 1: Filter Installments based on balance, default status, and due date
-    installments = pd.read_sql('installments', engine, index_col='ID')
-    installments['D_Due'] = installments['D_Due'].dt.to_period('D')
-    balance = credits_balance()
-    balance['D_Due'] = balance['D_Due'].dt.to_period('D')
-
-    if default:
-        full_inst = installments.loc[(balance['Total'] == installments['Total'])].copy()
-    else:
-        full_inst = installments.loc[
-            (balance['Total'] == installments['Total']) & (installments['D_Due'] >= date)
-        ].copy()
-    
-    # Step 2: Adjust for IVA if applicable
-    if iva:
-        full_inst['IVA'] = 0.0
-        full_inst['Total'] = full_inst['Capital'] + full_inst['Interest']
-    
-    # Step 3: Filter by owner ID and create time difference column
-    full_inst = installments.loc[
-        (full_inst['ID_Owner'] == 1) &
-        (balance['Total'] == installments['Total']) &
-        (installments['D_Due'] >= date)
-    ].copy()
-
-    # Step 4: Retrieve credit details and assign TEM and emission date    
-    full_inst[f'{date}'] = full_inst['D_Due'].apply(lambda x: (x - date).n)
-    credits = pd.read_sql('credits', engine, index_col='ID')
-    full_inst['TEM'] = full_inst['ID_Op'].apply(lambda x: credits.loc[x, 'TEM_W_IVA'])
-    full_inst['D_Emission'] = full_inst['ID_Op'].apply(lambda x: credits.loc[x, 'Date_Settlement'])
-    
-    # Step 5: Sort installments based on provided criteria
-    if sort_tem_emission and sort_by_tem and sort_by_emission:
-        sort = ['TEM', 'D_Emission', 'ID_Op', 'Nro_Inst']
-    elif not sort_by_emission and sort_by_emission:
-        sort = ['TEM', 'ID_Op', 'Nro_Inst']
-    elif sort_by_emission:
-        sort = ['D_Emission', 'ID_Op', 'Nro_Inst']
-    else:
-        sort = ['ID_Op', 'Nro_Inst']
-    
-    full_inst.sort_values(by=sort, ascending=asc, inplace=True)
+    # Steps 1 to 4: Candidate installments of the company, with their TEM and emission date
+    pool, credits = load_sale_candidates(date)
 
-    # Step 6: Compute financial values (Present Value, Cumulative Value)
-    full_inst['Amount_Financed'] = full_inst['Capital'] + full_inst['Interest']
-    full_inst['Current_Values'] = full_inst.apply(
-        lambda row: row['Amount_Financed'] / (1 + (tna / 365))**row[f'{date}'], axis=1
+    # Steps 5 to 7: Filter, sort, discount and select whole credits that fit in the available funds (va)
+    full_inst, report = _scenario_installments(
+        pool, date, tna, va, sort_by_tem, sort_by_emission, sort_tem_emission, asc, default, iva, selection, exact
     )
-    full_inst['Accumulated_CV'] = full_inst['Current_Values'].cumsum()
-    
-    # Step 7: Select viable installments based on available funds (va)
-    not_inst = full_inst.loc[full_inst['Accumulated_CV'] > va]
-    full_inst = full_inst.loc[full_inst['Accumulated_CV'] <= va]
-    last_op = full_inst.iloc[-1]['ID_Op']
-    
-    if not not_inst.loc[not_inst['ID_Op'] == last_op].empty:
-        full_inst.drop(
-            index=full_inst.loc[full_inst['ID_Op'] == full_inst.iloc[-1]['ID_Op']].index.values, inplace=True
-        )
-    
-    fall_inst = full_inst.groupby(['D_Emission', 'D_Due'])[['Capital', 'Amount_Financed', 'Current_Values']].sum()
 
-    # Step 8: Generate cash flow and calculate IRR
-    flow = pd.DataFrame(columns=['Amount'])
-    flow.index.name = 'Period'
-    
-    start_date = fall_inst.index.get_level_values(0).min()
-    end_date = fall_inst.index.get_level_values(1).unique().max()
-    all_dates = pd.period_range(start=start_date, end=end_date, freq='D')
-    
-    for p in all_dates:
-        flow.loc[p, 'Amount'] = 0.0
-    
-    for e, d in fall_inst.index:
-        flow.loc[e, 'Amount'] -= fall_inst.loc[(e, d), 'Capital']
-        flow.loc[d, 'Amount'] += fall_inst.loc[(e, d), 'Amount_Financed']
-    
-    print(f"TIR: {npf.irr(flow['Amount'])*30:,.2%}")
+    if selection != SelectionObjective.GREEDY:
+        print(f"✅ {report['n_credits']:,} credits selected ({report['method']}): $ {report['value']:,.2f}, "
+              f"$ {report['leftover_saved']:,.2f} less left over and {report['yield_gain']:+.4%} TEM vs the greedy cut.")
+
+    # Step 8: Calculate the IRR of the daily cash flow
+    print(f"TIR: {_sale_irr(full_inst):,.2%}")
 
     # Step 9: Retrieve credits and customers information
     credits = credits.loc[credits.index.isin(full_inst['ID_Op'].unique())]
@@ -839,6 +920,177 @@ def portfolio_seller(
     if es: translate_seller(full_inst, credits, customers, sheet_names)
     
     # Step 15: Export results to Excel if required        
-    if export: export_sell(customers, sheet_names, full_inst, credits, date, id_sale)
+    if export: export_sell(customers, sheet_names, full_inst, credits, date, id_sale, folder)
 
     return full_inst, credits, customers, ps
+
+
+# Options of a sale scenario and their defaults (those of `portfolio_seller`); 'tna' and 'va' are required
+SCENARIO_OPTIONS = {
+    'tna': None,
+    'va': None,
+    'sort_by_tem': False,
+    'sort_by_emission': False,
+    'sort_tem_emission': False,
+    'asc': True,
+    'default': False,
+    'iva': False,
+    'selection': SelectionObjective.GREEDY,
+    'exact': False
+}
+
+# Minimum scenarios per worker process; fewer do not pay for starting the processes
+_PARALLEL_MIN_SCENARIOS = 8
+
+# Candidates and date each worker process receives once, through the pool initializer
+_worker_sale = None
+
+
+def scenario_grid(**options) -> pd.DataFrame:
+    """
+    Builds every combination of the given sale options.
+
+    Parameters:
+        **options: Options of `SCENARIO_OPTIONS`, each a single value or a list of values.
+
+    Returns:
+        pd.DataFrame: One row per scenario, one column per option given.
+
+    Example:
+        scenario_grid(tna=[0.55, 0.6, 0.65], va=[1_000_000, 2_000_000], sort_by_emission=[False, True])
+    """
+
+    values = {name: value if isinstance(value, (list, tuple)) else [value] for name, value in options.items()}
+    return pd.DataFrame(list(product(*values.values())), columns=list(values))
+
+
+def _init_scenario_worker(pool: pd.DataFrame, date: pd.Period) -> None:
+    """Stores the read-only candidates in the worker process."""
+
+    global _worker_sale
+    _worker_sale = (pool, date)
+
+
+def _price_scenario(params: dict) -> dict:
+    """Prices a scenario on a worker process, over the candidates stored by `_init_scenario_worker`."""
+
+    pool, date = _worker_sale
+    return _scenario_result(pool, date, params)
+
+
+def _scenario_result(pool: pd.DataFrame, date: pd.Period, params: dict) -> dict:
+    """Prices a scenario and summarizes the installments it would sell."""
+
+    full_inst, report = _scenario_installments(pool, date, **params)
+
+    return {
+        'N_Credits': report['n_credits'],
+        'N_Inst': len(full_inst),
+        'Capital': round(full_inst['Capital'].sum(), 2),
+        'Amount_Financed': round(full_inst['Amount_Financed'].sum(), 2),
+        'Current_Value': round(full_inst['Current_Values'].sum(), 2),
+        'Leftover': round(report['leftover'], 2),
+        'TIR': _sale_irr(full_inst) if not full_inst.empty else np.nan
+    }
+
+
+def _ensure_scenarios_table() -> None:
+    """
+    Creates 'portfolio_sales_generated' if needed, adds the columns older versions of it lack and
+    widens the text columns they declared narrower than the model.
+    """
+
+    Base.metadata.create_all(engine, tables=[SaleScenario.__table__])
+
+    with engine.begin() as connection:
+        existing = {column['name']: column['type'] for column in inspect(connection).get_columns('portfolio_sales_generated')}
+        for column in SaleScenario.__table__.columns:
+            definition = f"{column.name} {column.type.compile(dialect=connection.dialect)}"
+            length = getattr(column.type, 'length', None)
+            if column.name not in existing:
+                connection.execute(text(f"ALTER TABLE portfolio_sales_generated ADD COLUMN {definition}"))
+            elif length and (getattr(existing[column.name], 'length', None) or length) < length:
+                connection.execute(text(f"ALTER TABLE portfolio_sales_generated MODIFY COLUMN {definition}"))
+
+
+def evaluate_sale_scenarios(date: pd.Period, scenarios, workers: int = None, save: bool = False) -> pd.DataFrame:
+    """
+    Prices many sale offers over the same candidates, to compare them before selling.
+
+    The installments, credits and balance are read once; each scenario then only filters, sorts,
+    discounts and selects (like `portfolio_seller` with `save=False`), on worker processes when
+    there are several scenarios.
+
+    Parameters:
+        date (pd.Period): Reference date of the sale.
+        scenarios (pd.DataFrame | list): One row (or dict) per scenario with the options of
+            `SCENARIO_OPTIONS`; 'tna' and 'va' are required, the rest default to those of
+            `portfolio_seller`. See `scenario_grid`.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        save (bool): If True, stores the comparison in 'portfolio_sales_generated'.
+
+    Returns:
+        pd.DataFrame: One row per scenario (indexed by its ID in 'portfolio_sales_generated' when
+        saved) with its options ('TNA', 'VA', 'Sort', 'Ascending', 'Default_Inst', 'IVA',
+        'Selection') and results: credits and installments selected ('N_Credits', 'N_Inst'), their
+        'Capital', 'Amount_Financed' and present value ('Current_Value'), the funds left over
+        ('Leftover') and the monthly IRR ('TIR').
+
+    Raises:
+        ValueError: If a scenario has an unknown option or lacks 'tna' or 'va'.
+    """
+
+    # ✅ Step 1: Validate the scenarios and complete them with the default options
+    scenarios = pd.DataFrame(scenarios)
+    unknown = scenarios.columns.difference(list(SCENARIO_OPTIONS))
+    if not unknown.empty:
+        raise ValueError(f"❌ Unknown scenario options: {', '.join(unknown)}.")
+    if not {'tna', 'va'}.issubset(scenarios.columns) or scenarios[['tna', 'va']].isna().any().any():
+        raise ValueError("❌ Every scenario needs 'tna' and 'va'.")
+
+    params = [
+        {**SCENARIO_OPTIONS, **{name: value for name, value in row.items() if not pd.isna(value)}}
+        for row in scenarios.to_dict('records')
+    ]
+    for p in params:
+        if isinstance(p['selection'], str):
+            p['selection'] = SelectionObjective[p['selection']]
+
+    # ✅ Step 2: Read the candidates once
+    pool, _ = load_sale_candidates(date)
+
+    # ✅ Step 3: Price the scenarios, on worker processes if there is more than one
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    n_workers = max(1, min(workers, len(params) // _PARALLEL_MIN_SCENARIOS))
+
+    if n_workers == 1:
+        results = [_scenario_result(pool, date, p) for p in params]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_scenario_worker, initargs=(pool, date)) as executor:
+            results = list(executor.map(_price_scenario, params))
+
+    # ✅ Step 4: Build the comparison table
+    table = pd.DataFrame({
+        'TNA': [p['tna'] for p in params],
+        'VA': [p['va'] for p in params],
+        'Sort': [', '.join(_sort_columns(p['sort_by_tem'], p['sort_by_emission'], p['sort_tem_emission'])) for p in params],
+        'Ascending': [int(p['asc']) for p in params],
+        'Default_Inst': [int(p['default']) for p in params],
+        'IVA': [int(p['iva']) for p in params],
+        'Selection': [p['selection'].name for p in params],
+        'Exact': [int(p['exact']) for p in params]
+    }).join(pd.DataFrame(results))
+
+    print(f"✅ {len(table):,} sale scenarios evaluated over {len(pool):,} candidate installments.")
+
+    # ✅ Step 5: Store the comparison if required
+    if save:
+        _ensure_scenarios_table()
+        with engine.begin() as connection:
+            ids = reserve_ids('portfolio_sales_generated', len(table), connection=connection)
+            table.index = pd.Index(ids, name='ID')
+            table.assign(Created=pd.Timestamp.now().floor('s'), Date=date.to_timestamp()).to_sql(
+                'portfolio_sales_generated', connection, index=True, if_exists='append'
+            )
+
+    return table
@@ -1,26 +1,61 @@
 import pandas as pd
+import threading
 
 # Import your module
 from app.modules.database.connection import engine
 from app.modules.database.credit_manager import credits_balance
 
-pp = pd.read_sql('portfolio_purchases', engine, index_col='ID')
+# Tables used by the reports, read on the first report instead of at import
+REPORT_DATASETS = ['pp', 'customers', 'companies', 'bp', 'credits', 'installments', 'collections']
 
-customers = pd.read_sql('customers', engine, index_col='ID')
+_report_data = {}
+_report_data_lock = threading.Lock()
 
-companies = pd.read_sql('companies', engine, index_col='ID')
 
-bp = pd.read_sql('business_plan', engine, index_col='ID')
+def load_report_data(refresh: bool = False) -> dict:
+    """
+    Reads the tables the reports work on, once per process.
+
+    Parameters:
+        refresh (bool, optional): If True, reads them again (e.g. after new collections were posted).
+
+    Returns:
+        dict: DataFrames keyed by the names in `REPORT_DATASETS`, with dates as daily periods and the
+        credit of each collection in 'ID_Op'.
+    """
+
+    with _report_data_lock:
+        if _report_data and not refresh:
+            return _report_data
+
+        pp = pd.read_sql('portfolio_purchases', engine, index_col='ID')
 
-credits = pd.read_sql('credits', engine, index_col='ID')
-credits['Date_Settlement'] = credits['Date_Settlement'].dt.to_period('D')
+        customers = pd.read_sql('customers', engine, index_col='ID')
 
-installments = pd.read_sql('installments', engine, index_col='ID')
-installments['D_Due'] = installments['D_Due'].dt.to_period('D')
+        companies = pd.read_sql('companies', engine, index_col='ID')
 
-collections = pd.read_sql('collection', engine, index_col='ID')
-collections['ID_Op'] = collections['ID_Inst'].apply(lambda x: installments.loc[x, 'ID_Op'])
-collections['D_Emission'] = collections['D_Emission'].dt.to_period('D')
+        bp = pd.read_sql('business_plan', engine, index_col='ID')
+
+        credits = pd.read_sql('credits', engine, index_col='ID')
+        credits['Date_Settlement'] = credits['Date_Settlement'].dt.to_period('D')
+
+        installments = pd.read_sql('installments', engine, index_col='ID')
+        installments['D_Due'] = installments['D_Due'].dt.to_period('D')
+
+        collections = pd.read_sql('collection', engine, index_col='ID')
+        collections['ID_Op'] = collections['ID_Inst'].map(installments['ID_Op'])
+        collections['D_Emission'] = collections['D_Emission'].dt.to_period('D')
+
+        _report_data.update(pp=pp, customers=customers, companies=companies, bp=bp, credits=credits,
+                            installments=installments, collections=collections)
+        return _report_data
+
+
+def __getattr__(name):
+    # Keeps `reports.credits` and the other module-level tables working, loading them on first access
+    if name in REPORT_DATASETS:
+        return load_report_data()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def portfolio_inventory(date: pd.Period = pd.Period.now('D'), save: bool = False, es: bool = False):
@@ -35,12 +70,21 @@ def portfolio_inventory(date: pd.Period = pd.Period.now('D'), save: bool = False
     Returns:
     - pd.DataFrame: A DataFrame containing the portfolio inventory with detailed financial information.
     """
+    data = load_report_data()
+    credits, customers, bp, companies, collections = (
+        data['credits'], data['customers'], data['bp'], data['companies'], data['collections']
+    )
+
     # Merge data from credits, customers, and companies
     df = credits.merge(customers, how='inner', left_on='ID_Client', right_on='ID')
     df = df.merge(bp.drop(columns=['Detail', 'Date']), how='inner', left_on='ID_BP', right_on='ID')
     df = df.merge(companies['Social_Reason'], how='inner', left_on='ID_Company', right_on='ID')
     df.index = credits.index
 
+    # Only the credits settled and the collections emitted up to `date`
+    df = df.loc[df['Date_Settlement'] <= date]
+    collections = collections.loc[collections['D_Emission'] <= date]
+
     # Select and order relevant columns
     df = df[['ID_External', 'ID_Company', 'Social_Reason',
              'ID_Client', 'CUIL', 'DNI', 'Last_Name', 'Name', 'Gender', 'Date_Birth', 'Marital_Status', 'Age_at_Discharge',
@@ -53,7 +97,7 @@ def portfolio_inventory(date: pd.Period = pd.Period.now('D'), save: bool = False
     balance = credits_balance(pd.Period.to_timestamp(date))
     balance['D_Due'] = balance['D_Due'].dt.to_period('D')
     balance['Days_in_Default'] = balance.apply(lambda row: (date - row['D_Due']).n if ((date - row['D_Due']).n > 0) and (row['Total'] > 0.009) else 0, axis=1)
-    df['Days_in_Default'] = balance.groupby('ID_Op')['Days_in_Default'].max().values
+    df['Days_in_Default'] = balance.groupby('ID_Op')['Days_in_Default'].max().reindex(df.index, fill_value=0)
 
     # Determine the last collection date for each operation
     df.loc[df.index.isin(collections['ID_Op'].values), 'Last_Collection'] = collections.groupby('ID_Op')['D_Emission'].max()
@@ -120,13 +164,17 @@ def fall_inst(emission_from: pd.Period = pd.Period("1900/01/01"),
     - pd.DataFrame: A DataFrame containing the grouped summary of outstanding installments.
     """
 
-    # Retrieve the balance of credits up to the specified end date
-    balance = credits_balance(emission_until)
+    # Retrieve the current balance of credits (the dates filter the emission, not the collections)
+    balance = credits_balance()
+    data = load_report_data()
+    bp, companies = data['bp'], data['companies']
 
     # Load credits data and filter based on the specified emission range
     credits = pd.read_sql('credits', engine, index_col='ID')
     credits['Date_Settlement'] = credits['Date_Settlement'].dt.to_period('D')
-    credits_filter = credits.loc[credits['Date_Settlement'] >= emission_from].index.values
+    credits_filter = credits.loc[
+        (credits['Date_Settlement'] >= emission_from) & (credits['Date_Settlement'] <= emission_until)
+    ].index.values
     balance = balance.loc[balance['ID_Op'].isin(credits_filter)]
 
     # Convert due dates to monthly periods for aggregation
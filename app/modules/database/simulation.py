@@ -0,0 +1,205 @@
+import pandas as pd
+
+from app.modules.database.credit_manager import credits_balance
+from app.modules.database.balance_store import BALANCE_COLUMNS
+from app.modules.database.collection import (
+    TypeDataCollection,
+    load_collection_snapshot,
+    _resolve_payments,
+    _merge_results,
+    _charge_partition,
+    _early_cancel_partition
+)
+
+
+def load_simulation_snapshot(id_supplier: int = None) -> dict:
+    """
+    Loads once everything a simulation needs: the identifiers and the balance of the portfolio.
+
+    The snapshot can be reused by any number of `simulate_payments` calls; none of them reads the
+    database nor changes the snapshot.
+
+    Parameters:
+        id_supplier (int, optional): Only load the balance of the credits of this supplier. Payments
+            on credits outside the snapshot balance are simulated as if the credits had no installments.
+
+    Returns:
+        dict: The tables of `load_collection_snapshot` plus 'balance', the outstanding amounts of every
+        installment indexed by its ID.
+    """
+
+    snapshot = load_collection_snapshot()
+    snapshot['balance'] = credits_balance(
+        id_supplier=id_supplier,
+        columns=['ID_Op', 'Nro_Inst', 'D_Due'] + BALANCE_COLUMNS
+    )
+
+    print(f"✅ Simulation snapshot loaded: {len(snapshot['credits']):,} credits, {len(snapshot['balance']):,} installments.")
+    return snapshot
+
+
+def _payment_waves(assigned: pd.DataFrame) -> pd.Series:
+    """
+    Groups the payments into waves that can be charged at once.
+
+    A payment goes to the wave after the last one that touched any of its credits, so payments on
+    the same credits are applied one after the other, in the order they were given, while payments
+    on unrelated credits share a wave.
+
+    Returns:
+        pd.Series: Wave number of each payment, indexed by its position.
+    """
+
+    last_wave, waves = {}, {}
+
+    for pos, id_credits in assigned.groupby('Pos', sort=True)['ID_Op']:
+        wave = 1 + max((last_wave.get(id_credit, -1) for id_credit in id_credits), default=-1)
+        for id_credit in id_credits:
+            last_wave[id_credit] = wave
+        waves[pos] = wave
+
+    return pd.Series(waves, dtype=int)
+
+
+def simulate_payments(
+        payments: pd.DataFrame,
+        type_data: TypeDataCollection,
+        id_supplier: int = None,
+        date: pd.Timestamp = None,
+        snapshot: dict = None,
+        early: bool = False):
+    """
+    Applies hypothetical payments to a portfolio snapshot in memory, without writing anything.
+
+    Payments are applied in the order given, each against the balance left by the previous ones, with
+    the rules of `charging` (or `collection_w_early_cancel` if `early`). A single payment gives the
+    same rows as `charging(..., save=False)`; several payments of the same customer give the rows that
+    posting them one after the other would. PENALTY rows point to provisional installment IDs above the
+    highest one in the snapshot, and the penalty credits are not added to the simulated balance.
+
+    Args:
+        payments (pd.DataFrame): Identifiers in the first column, the paid 'Amount' and, optionally, the
+            'Date' of each payment.
+        type_data (TypeDataCollection): Type of the identifiers.
+        id_supplier (int, optional): Supplier ID used to filter the credits of DNI/CUIL identifiers.
+        date (pd.Timestamp, optional): Date of the payments without a 'Date'. Defaults to today.
+        snapshot (dict, optional): Snapshot returned by `load_simulation_snapshot`. Loaded if omitted,
+            which is only worth it for a single run.
+        early (bool, optional): If True, applies the early cancellation rules. Defaults to False.
+
+    Returns:
+        tuple:
+            - pd.DataFrame: Would-be collection rows.
+            - pd.DataFrame: Payments that could not be applied, with their 'Amount' and the 'Error'.
+            - pd.DataFrame: Resulting balance of the credits the payments were applied to.
+
+    Example:
+        >>> snapshot = load_simulation_snapshot()
+        >>> payments = pd.DataFrame({'ID_Op': [1520, 1520], 'Amount': [50000.0, 20000.0],
+        ...                          'Date': pd.to_datetime(['2024-03-01', '2024-04-01'])})
+        >>> collection, error, balance = simulate_payments(payments, TypeDataCollection.ID_Op, snapshot=snapshot)
+    """
+
+    if snapshot is None:
+        snapshot = load_simulation_snapshot()
+
+    partition = _early_cancel_partition if early else _charge_partition
+    payments = payments.reset_index(drop=True)
+    amounts = payments['Amount'].astype(float)
+    default = pd.Timestamp.now() if date is None else pd.Timestamp(date)
+    dates = pd.to_datetime(payments['Date']).fillna(default) if 'Date' in payments else pd.Series(default, index=payments.index)
+
+    # ✅ Step 1: Resolve identifiers on the snapshot
+    assigned, errors, clients = _resolve_payments(payments[[payments.columns[0], 'Amount']], type_data, id_supplier, snapshot)
+
+    # ✅ Step 2: Work on a copy of the balance of the involved credits
+    balance = snapshot['balance']
+    balance = balance.loc[balance['ID_Op'].isin(assigned['ID_Op'])].copy()
+
+    # ✅ Step 3: Apply the payments wave by wave, updating the balance after each one
+    results = []
+    waves = _payment_waves(assigned)
+    for wave in sorted(waves.unique()):
+        positions = waves.index[waves == wave]
+        for day in dates.loc[positions].unique():
+            batch = assigned.loc[assigned['Pos'].isin(positions[dates.loc[positions].values == day])]
+            result = partition(amounts.loc[batch['Pos'].unique()], batch, balance, pd.Timestamp(day))
+            results.append(result)
+
+            # Collected amounts are rounded per row, like the DECIMAL columns store them
+            collected = result[0].loc[result[0]['Type_Collection'] != 'PENALTY']
+            if not collected.empty:
+                totals = collected[BALANCE_COLUMNS].astype(float).round(2).groupby(collected['ID_Inst'].astype(int)).sum()
+                balance.loc[totals.index, BALANCE_COLUMNS] = (balance.loc[totals.index, BALANCE_COLUMNS] - totals).round(2)
+
+    if not results:
+        results = [partition(amounts.iloc[0:0], assigned, balance, default)]
+
+    # ✅ Step 4: Merge the rows in payment order
+    collection, error, _, _ = _merge_results(results, payments, errors, clients, dates, snapshot)
+
+    print(f"✅ {len(payments) - len(error):,} payments simulated, {len(error):,} sent to the error DataFrame.")
+    return collection, error, balance.sort_index()
+
+
+def payoff_quotes(
+        date: pd.Timestamp = None,
+        id_credits=None,
+        id_customer=None,
+        id_supplier=None,
+        balance: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Quotes the early cancellation of every credit in one pass over the balance, without writing anything.
+
+    Uses the rules of `collection_w_early_cancel`: the installments due up to `date` are paid in full
+    (overdue part) and the future ones only by their capital (CAN. ANT.), with their interest and IVA
+    forgiven (BON. CAN. ANT.).
+
+    Parameters:
+        date (pd.Timestamp, optional): Date of the quote. Defaults to now.
+        id_credits (int | list, optional): Only these credits.
+        id_customer (int | list, optional): Only the credits of these customers.
+        id_supplier (int | list, optional): Only the credits whose business plan belongs to these companies.
+        balance (pd.DataFrame, optional): Balance already read (e.g. the 'balance' of a simulation
+            snapshot) to quote instead of reading it; the filters are not applied to it.
+
+    Returns:
+        pd.DataFrame: Indexed by credit ID, with the 'Overdue' amount and number of installments
+        ('N_Overdue'), the future 'Capital', the 'Bonus_Interest', 'Bonus_IVA' and 'Bonus' forgiven, and
+        the 'Payoff' amount. Credits with nothing outstanding are left out.
+
+    Example:
+        >>> quotes = payoff_quotes(pd.Timestamp('2024-03-01'), id_supplier=2)
+        >>> quotes.loc[1520, 'Payoff']
+    """
+
+    date = pd.Timestamp.now() if date is None else pd.Timestamp(date)
+
+    # ✅ Step 1: Read the balance of the credits once
+    if balance is None:
+        balance = credits_balance(
+            id_credits=id_credits, id_customer=id_customer, id_supplier=id_supplier,
+            columns=['ID_Op', 'D_Due'] + BALANCE_COLUMNS
+        )
+    amounts = balance[BALANCE_COLUMNS].astype(float)
+
+    # ✅ Step 2: Split every installment into its overdue part and its cancellable part
+    due = (balance['D_Due'] <= date).to_numpy()
+    parts = pd.DataFrame({
+        'Overdue': amounts['Total'].where(due, 0.0),
+        'N_Overdue': (due & (amounts['Total'] != 0.0)).astype(int),
+        'Capital': amounts['Capital'].where(~due, 0.0),
+        'Bonus_Interest': amounts['Interest'].where(~due, 0.0),
+        'Bonus_IVA': amounts['IVA'].where(~due, 0.0),
+    })
+
+    # ✅ Step 3: Total them per credit
+    quotes = parts.groupby(balance['ID_Op'].astype(int)).sum()
+    quotes['Bonus'] = quotes['Bonus_Interest'] + quotes['Bonus_IVA']
+    quotes['Payoff'] = quotes['Overdue'] + quotes['Capital']
+
+    money = ['Overdue', 'Capital', 'Bonus_Interest', 'Bonus_IVA', 'Bonus', 'Payoff']
+    quotes[money] = quotes[money].round(2)
+    quotes.index.name = 'ID_Op'
+
+    return quotes.loc[(quotes['Payoff'] != 0.0) | (quotes['Bonus'] != 0.0)]
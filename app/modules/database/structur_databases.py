@@ -90,7 +90,7 @@ class Collection(Base):
 
     id = Column("ID", Integer, primary_key=True, autoincrement=True)
     id_inst = Column("ID_Inst", Integer, ForeignKey("installments.ID", onupdate="CASCADE"))
-    d_emission = Column("D_Emission", DateTime, nullable=False)
+    d_emission = Column("D_Emission", DateTime, nullable=False, index=True)
     type_collection = Column("Type_Collection", Enum('COMUN', 'ANTICIPADA', 'PARCIAL', 'REDONDEO', 
                                                      'PENALTY', 'CAN. ANT.', 'BON. CAN. ANT.', 
                                                      'REVERSA', 'NO COMPRADA', 'RECURSO'), nullable=True)
@@ -101,3 +101,63 @@ class Collection(Base):
 
     # Relationship with Installments
     installment = relationship("Installments", back_populates="collections")
+
+
+class InstallmentBalance(Base):
+    __tablename__ = 'installment_balance'
+
+    id_inst = Column("ID_Inst", Integer, ForeignKey("installments.ID", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
+    capital = Column("Capital", DECIMAL(15, 2), nullable=False)
+    interest = Column("Interest", DECIMAL(15, 2), nullable=False)
+    iva = Column("IVA", DECIMAL(15, 2), nullable=False)
+    total = Column("Total", DECIMAL(15, 2), nullable=False, index=True)
+
+
+class BalanceCheckpoint(Base):
+    __tablename__ = 'balance_checkpoints'
+
+    id = Column("ID", Integer, primary_key=True, autoincrement=True)
+    date = Column("Date", DateTime, nullable=False, unique=True)
+    max_collection_id = Column("Max_Collection_ID", Integer, nullable=False)
+    created = Column("Created", DateTime, nullable=False)
+
+
+class BalanceCheckpointRow(Base):
+    __tablename__ = 'balance_checkpoint_rows'
+
+    id_checkpoint = Column("ID_Checkpoint", Integer, ForeignKey("balance_checkpoints.ID", ondelete="CASCADE"), primary_key=True)
+    id_inst = Column("ID_Inst", Integer, ForeignKey("installments.ID", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
+    capital = Column("Capital", DECIMAL(15, 2), nullable=False)
+    interest = Column("Interest", DECIMAL(15, 2), nullable=False)
+    iva = Column("IVA", DECIMAL(15, 2), nullable=False)
+    total = Column("Total", DECIMAL(15, 2), nullable=False)
+
+
+class IdReservation(Base):
+    __tablename__ = 'id_reservations'
+
+    table_name = Column("Table_Name", String(64), primary_key=True)
+    next_id = Column("Next_ID", BigInteger, nullable=False)
+
+
+class SaleScenario(Base):
+    __tablename__ = 'portfolio_sales_generated'
+
+    id = Column("ID", Integer, primary_key=True, autoincrement=True)
+    tna = Column("TNA", DECIMAL(10, 8), nullable=False)
+    created = Column("Created", DateTime)
+    date = Column("Date", DateTime)
+    va = Column("VA", DECIMAL(15, 2))
+    sort = Column("Sort", String(40))
+    ascending = Column("Ascending", Integer)
+    default = Column("Default_Inst", Integer)
+    iva = Column("IVA", Integer)
+    selection = Column("Selection", String(10))
+    exact = Column("Exact", Integer)
+    n_credits = Column("N_Credits", Integer)
+    n_inst = Column("N_Inst", Integer)
+    capital = Column("Capital", DECIMAL(15, 2))
+    amount_financed = Column("Amount_Financed", DECIMAL(15, 2))
+    current_value = Column("Current_Value", DECIMAL(15, 2))
+    leftover = Column("Leftover", DECIMAL(15, 2))
+    tir = Column("TIR", DECIMAL(12, 8))
@@ -124,7 +124,38 @@ CREATE TABLE collection (
     Capital DECIMAL(15,2) NOT NULL,
     Interest DECIMAL(15,2) NOT NULL,
     IVA DECIMAL(15,2) NOT NULL,
-    Total DECIMAL(15,2) NOT NULL);
+    Total DECIMAL(15,2) NOT NULL,
+    INDEX (D_Emission));
+
+CREATE TABLE installment_balance (
+    ID_Inst INT PRIMARY KEY NOT NULL,
+    FOREIGN KEY (ID_Inst) REFERENCES installments(ID) ON UPDATE CASCADE ON DELETE CASCADE,
+    Capital DECIMAL(15,2) NOT NULL,
+    Interest DECIMAL(15,2) NOT NULL,
+    IVA DECIMAL(15,2) NOT NULL,
+    Total DECIMAL(15,2) NOT NULL,
+    INDEX (Total));
+
+CREATE TABLE balance_checkpoints (
+    ID INT PRIMARY KEY NOT NULL AUTO_INCREMENT,
+    Date DATETIME NOT NULL UNIQUE,
+    Max_Collection_ID INT NOT NULL,
+    Created DATETIME NOT NULL);
+
+CREATE TABLE balance_checkpoint_rows (
+    ID_Checkpoint INT NOT NULL,
+    FOREIGN KEY (ID_Checkpoint) REFERENCES balance_checkpoints(ID) ON DELETE CASCADE,
+    ID_Inst INT NOT NULL,
+    FOREIGN KEY (ID_Inst) REFERENCES installments(ID) ON UPDATE CASCADE ON DELETE CASCADE,
+    Capital DECIMAL(15,2) NOT NULL,
+    Interest DECIMAL(15,2) NOT NULL,
+    IVA DECIMAL(15,2) NOT NULL,
+    Total DECIMAL(15,2) NOT NULL,
+    PRIMARY KEY (ID_Checkpoint, ID_Inst));
+
+CREATE TABLE id_reservations (
+    Table_Name VARCHAR(64) PRIMARY KEY NOT NULL,
+    Next_ID BIGINT NOT NULL);
 
 CREATE TABLE settings (
     ID INT PRIMARY KEY NOT NULL AUTO_INCREMENT,
@@ -134,4 +165,20 @@ CREATE TABLE settings (
 
 CREATE TABLE portfolio_sales_generated (
     ID INT PRIMARY KEY NOT NULL AUTO_INCREMENT,
-    TNA DECIMAL(10,8) NOT NULL);
\ No newline at end of file
+    TNA DECIMAL(10,8) NOT NULL,
+    Created DATETIME,
+    Date DATETIME,
+    VA DECIMAL(15,2),
+    Sort VARCHAR(40),
+    Ascending INT,
+    Default_Inst INT,
+    IVA INT,
+    Selection VARCHAR(10),
+    Exact INT,
+    N_Credits INT,
+    N_Inst INT,
+    Capital DECIMAL(15,2),
+    Amount_Financed DECIMAL(15,2),
+    Current_Value DECIMAL(15,2),
+    Leftover DECIMAL(15,2),
+    TIR DECIMAL(12,8));
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Equivalence check of the credits_balance engines.
+
+Computes the balance with the SQL and PANDAS engines for the current balance and several as-of
+dates, with and without each filter, and reports every case where they differ. For the current
+balance the TABLE engine is also compared, against the PANDAS rows with an outstanding 'Total'.
+Every case is recomputed (use_cache=False), so the check does not depend on what was cached.
+
+Needs a reachable database with data: uses the settings of app.modules.database.connection.
+Exits with 0 when every case matches, 1 when any differs and 2 when the database is unreachable.
+
+Run from the project root:
+    python logs/balance_equivalence.py
+"""
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.modules.database.connection import engine
+from app.modules.database.credit_manager import credits_balance, BalanceEngine
+
+# Amounts are stored with 2 decimals; sums may differ in the last float digits between engines
+TOLERANCE = 0.005
+
+
+def _sample_cases() -> tuple[list, list]:
+    """
+    Picks the as-of dates and the filters to check from the data in the database.
+
+    Returns:
+        tuple:
+            - list: (label, date) pairs, starting with the current balance (date None).
+            - list: (label, kwargs) pairs, starting with no filter.
+    """
+
+    credits = pd.read_sql('SELECT ID, ID_Client, ID_BP, Date_Settlement FROM credits', engine, index_col='ID')
+    installments = pd.read_sql('SELECT ID_Op, D_Due, ID_Owner FROM installments', engine)
+    bp = pd.read_sql('SELECT ID, ID_Company FROM business_plan', engine, index_col='ID')
+    emissions = pd.read_sql('SELECT MIN(D_Emission) AS First, MAX(D_Emission) AS Last FROM collection', engine)
+
+    settlements = pd.to_datetime(credits['Date_Settlement']).sort_values()
+    dues = pd.to_datetime(installments['D_Due']).sort_values()
+
+    # ✅ Step 1: The current balance, a date with part of the credits settled and one after every collection
+    dates = [('current', None), ('middle', settlements.iloc[len(settlements) // 2])]
+    if pd.notna(emissions.at[0, 'Last']):
+        dates.append(('last collection', pd.Timestamp(emissions.at[0, 'Last'])))
+        dates.append(('period', pd.Timestamp(emissions.at[0, 'First']).to_period('M')))
+
+    # ✅ Step 2: One value of each filter, taken from a credit with a business plan when there is one
+    with_bp = credits.dropna(subset=['ID_BP'])
+    credit = with_bp.index[0] if not with_bp.empty else credits.index[0]
+    id_owner = int(installments['ID_Owner'].mode().iloc[0])
+    filters = [
+        ('no filter', {}),
+        ('id_credits', {'id_credits': list(credits.index[:25])}),
+        ('id_customer', {'id_customer': int(credits.at[credit, 'ID_Client'])}),
+        ('id_owner', {'id_owner': id_owner}),
+        ('due range', {'due_from': dues.iloc[len(dues) // 4], 'due_until': dues.iloc[3 * len(dues) // 4]}),
+    ]
+    if not with_bp.empty:
+        id_bp = int(with_bp.at[credit, 'ID_BP'])
+        filters.append(('id_bp', {'id_bp': id_bp}))
+        if id_bp in bp.index:
+            filters.append(('id_supplier', {'id_supplier': int(bp.at[id_bp, 'ID_Company'])}))
+    filters.append(('combined', {'id_owner': id_owner, 'due_until': dues.iloc[len(dues) // 2]}))
+
+    return dates, filters
+
+
+def _difference(left: pd.DataFrame, right: pd.DataFrame) -> str:
+    """
+    Compares two balances regardless of row and column order.
+
+    Returns:
+        str: Description of the first difference found, or an empty string if they match.
+    """
+
+    left = left.sort_index().sort_index(axis=1)
+    right = right.sort_index().sort_index(axis=1)
+
+    try:
+        pd.testing.assert_frame_equal(left, right, check_dtype=False, check_exact=False, atol=TOLERANCE, rtol=0)
+    except AssertionError as e:
+        return ' '.join(str(e).split())[:200]
+
+    return ''
+
+
+def main():
+    try:
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+    except Exception as e:
+        print(f"⚠️ Database unreachable, nothing checked: {e}")
+        return 2
+
+    dates, filters = _sample_cases()
+    failed = False
+
+    print(f"{'Date':<16} {'Filter':<12} {'Rows':>8}  Result")
+    for date_label, date in dates:
+        for filter_label, kwargs in filters:
+            pandas_balance = credits_balance(date, mode=BalanceEngine.PANDAS, use_cache=False, **kwargs)
+            compared = {'SQL': (credits_balance(date, mode=BalanceEngine.SQL, use_cache=False, **kwargs), pandas_balance)}
+
+            # TABLE only differs from SQL for the current balance, where it reads the outstanding rows
+            if date is None:
+                compared['TABLE'] = (
+                    credits_balance(mode=BalanceEngine.TABLE, use_cache=False, **kwargs),
+                    pandas_balance.loc[pandas_balance['Total'] != 0]
+                )
+
+            differences = [f"{name}: {d}" for name, pair in compared.items() if (d := _difference(*pair))]
+            failed |= bool(differences)
+
+            mark = '❌' if differences else '✅'
+            print(f"{mark} {date_label:<14} {filter_label:<12} {len(pandas_balance):>8,}  {'; '.join(differences) or 'equal'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Import-time benchmark of app.modules.database.
+
+Imports every module in a fresh interpreter and reports how long the import took (after numpy,
+pandas and SQLAlchemy, whose own import time is shown apart) and whether it read the settings,
+opened a database connection, created the Qt application, read the report tables or created the
+Ollama client. None of them should: those are created on first use.
+
+Run from the project root:
+    python logs/import_benchmark.py
+"""
+import os
+import sys
+import json
+import subprocess
+
+MODULES = [
+    'connection', 'structur_databases', 'id_reservations', 'amortization', 'balance_store',
+    'identifier_index', 'customers', 'companies', 'credit_manager', 'collection', 'simulation',
+    'portfolio_manager', 'reports', 'pdf_ocr_mistral'
+]
+
+# Code run in the child interpreter: time the import and inspect what it left initialized
+CHILD = """
+import sys, json, time, importlib
+start = time.perf_counter()
+import numpy, pandas, sqlalchemy
+libraries = time.perf_counter() - start
+
+start = time.perf_counter()
+importlib.import_module('app.modules.database.' + sys.argv[1])
+elapsed = time.perf_counter() - start
+
+connection = sys.modules.get('app.modules.database.connection')
+portfolio = sys.modules.get('app.modules.database.portfolio_manager')
+reports = sys.modules.get('app.modules.database.reports')
+ocr = sys.modules.get('app.modules.database.pdf_ocr_mistral')
+print(json.dumps({
+    'libraries_ms': libraries * 1000,
+    'ms': elapsed * 1000,
+    'settings': connection is not None and connection._settings is not None,
+    'connections': connection.engine.pool.checkedin() + connection.engine.pool.checkedout() if connection else 0,
+    'qt': portfolio is not None and portfolio._qt_app is not None,
+    'reports': reports is not None and bool(reports._report_data),
+    'ollama': ocr is not None and ocr._client is not None,
+}))
+"""
+
+
+def main():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, 'PYTHONPATH': root + os.pathsep + os.environ.get('PYTHONPATH', '')}
+
+    print(f"{'Module':<20} {'Libraries (ms)':>15} {'Import (ms)':>12}  Initialized at import")
+    failed = False
+
+    for module in MODULES:
+        result = subprocess.run([sys.executable, '-c', CHILD, module], cwd=root, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            # Optional dependencies (e.g. ollama, pdf2image) may not be installed everywhere
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'
+            print(f"⚠️ {module:<18} {'-':>15} {'-':>12}  {error}")
+            continue
+
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        eager = [name for name in ('settings', 'qt', 'reports', 'ollama') if stats[name]]
+        if stats['connections']:
+            eager.append('connection')
+        failed |= bool(eager)
+
+        mark = '❌' if eager else '✅'
+        print(f"{mark} {module:<18} {stats['libraries_ms']:>15,.1f} {stats['ms']:>12,.1f}  {', '.join(eager) if eager else '-'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
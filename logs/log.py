@@ -17,10 +17,12 @@ from app.modules.database.portfolio_manager import portfolio_buyer, add_portfoli
 
 # Import functions for credit management
 from app.modules.database.credit_manager import credits_balance
+from app.modules.database.balance_store import rebuild_installment_balance, check_installment_balance, create_balance_checkpoints
 
 # Import functions for collection management
 from app.modules.database.collection import (
     resource_collection,
+    batch_resource_collection,
     charging,
     collection_w_early_cancel,
     delete_collection_by_id,
@@ -162,10 +164,10 @@ fecha = balance['D_Due'].max()
 early_balance = balance[balance["D_Due"] <= fecha].groupby("D_Due")["Total"].sum()
 early_balance = early_balance[early_balance != 0]
 
-# Process each due date
-for due_date, total_amount in early_balance.items():
-    resource_collection(2, total_amount, date=due_date, save=True)
-    print(f"✅ Processed resource collection for due date {due_date}, Amount: $ {total_amount:,.2f}")
+# Process every due date in a single batch
+_, events = batch_resource_collection([(2, total_amount, due_date) for due_date, total_amount in early_balance.items()], save=True)
+for _, event in events.iterrows():
+    print(f"✅ Processed resource collection for due date {event['Date']}, Amount: $ {event['Amount']:,.2f}")
 
 # Confirm successful migration
 print("✅ Onoyen credit portfolio successfully migrated.")
@@ -446,3 +448,9 @@ coll = pd.concat([coll, inst_penalties], ignore_index=True)
 print("💾 Saving full collection data...")
 coll.to_sql('collection', engine, if_exists='append', index=False)
 print("✅ Collection process completed.")
+
+# The AMUF migration writes installments and collections directly, so rebuild the balances
+print("♻️ Rebuilding installment balances...")
+rebuild_installment_balance()
+check_installment_balance()
+create_balance_checkpoints()